@@ -3,6 +3,8 @@ import GPUtil
 import psutil
 import logging
 from peer_discovery import PORT, PORT
+from load_sampler import get_snapshot
+from offload_controller import get_thresholds
 
 logging.getLogger().setLevel(logging.CRITICAL)  # صامت
 
@@ -58,14 +60,16 @@ class DeviceManager:
     # ────────────── فحص الحمل ──────────────
     def get_device_load(self, device_type, index=0):
         try:
+            devices = get_snapshot().devices
             if device_type == "GPU" and self.devices["GPU"]:
-                return self.devices["GPU"][index].load * 100
+                gpu_loads = devices.get("GPU") or ()
+                return gpu_loads[index] if index < len(gpu_loads) else 0
             elif device_type == "DSP" and self.devices["DSP"]:
                 return 10  # افتراضي: ما في API للحمل
             elif device_type == "NIC" and self.devices["NIC"]:
-                return psutil.net_io_counters().bytes_sent / (1024 * 1024)  # مثال بسيط
+                return devices.get("NIC", 0)  # MB/s مُرسلة من العيّنة المشتركة
             elif device_type == "STORAGE" and self.devices["STORAGE"]:
-                return psutil.disk_usage('/').percent
+                return devices.get("STORAGE", 0)
             elif device_type == "CAPTURE" and self.devices["CAPTURE"]:
                 return 20  # افتراضي: حمل منخفض
             elif device_type == "ACCELERATOR" and self.devices["ACCELERATOR"]:
@@ -74,9 +78,9 @@ class DeviceManager:
         except:
             return 0
 
-    # ────────────── منطق 30% / 70% ──────────────
+    # ────────────── عتبات متكيّفة (تبدأ من 30% / 70%) ──────────────
     def can_receive(self, device_type, index=0):
-        return self.get_device_load(device_type, index) <= 30
+        return self.get_device_load(device_type, index) <= get_thresholds().device_receive
 
     def should_offload(self, device_type, index=0):
-        return self.get_device_load(device_type, index) >= 70
+        return self.get_device_load(device_type, index) >= get_thresholds().device_offload
@@ -3,6 +3,7 @@ import torch
 import GPUtil
 import psutil
 import logging
+from offload_controller import get_thresholds
 
 logging.getLogger().setLevel(logging.CRITICAL)  # صامت تمامًا
 
@@ -48,11 +49,11 @@ class AutoOffloadExecutor:
 
     def _should_offload(self, device_type, index=0):
         load = self.devices.get_device_load(device_type, index)
-        return load >= 70
+        return load >= get_thresholds().device_offload
 
     def _can_receive(self, device_type, index=0):
         load = self.devices.get_device_load(device_type, index)
-        return load <= 30
+        return load <= get_thresholds().device_receive
 
     def submit_auto(self, task_func, *args, task_type=None, **kwargs):
         """إرسال تلقائي حسب حالة الكروت"""
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# benchmark_security.py - قياس كلفة طبقة الأمان
+# ============================================================
+# startup: زمن تجهيز SecurityManager:
+#   • الإنشاء الفوري القديم (PBKDF2 150k + توليد RSA-2048 في __init__).
+#   • الإنشاء الكسول الآن (لا عمل قبل أول استخدام).
+#   • أول استخدام بمخزن مفاتيح فارغ (أول تشغيل للعقدة).
+#   • أول استخدام بعد إعادة التشغيل (المفاتيح من المخزن على القرص).
+# crypto: قياسات دقيقة لكل عملية في security_layer:
+#   • توقيع/تحقق في الثانية لكل خوارزمية (ed25519 / rsa) وحجم التوقيع
+#     المضاف للمهمة.
+#   • تشفير/فك في الثانية وبايتات الزيادة لأحجام حمولة نموذجية:
+#     Fernet القديم، ختم الجلسة، والتدفق المختوم (الفك يشمل إنشاء
+#     جلسة مستقبل جديدة: نفس الجلسة ترفض فك الرسالة نفسها مرتين).
+# الاستخدام: python benchmark_security.py [--suite startup|crypto|all] [--rounds N]
+# ============================================================
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from key_store import KeyStore
+from rpc_client import make_task
+from security_layer import SecurityManager, SIGNATURE_BACKENDS, Session
+
+SECRET = "my_shared_secret_123"
+PAYLOAD_SIZES = (256, 4 * 1024, 64 * 1024, 1024 * 1024)
+MIN_SECONDS = 0.2           # أقل مدة قياس لكل عملية
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def _first_use(manager: SecurityManager):
+    # ما يحتاجه الخادم لأول طلب: فك تشفير متماثل ومفتاح التوقيع للمصافحة
+    manager.decrypt_data(manager.encrypt_data(b"{}"))
+    manager.start_handshake()
+
+
+def run(rounds: int):
+    results = {"eager": [], "lazy_init": [], "cold_first_use": [], "warm_first_use": []}
+    for _ in range(rounds):
+        results["eager"].append(_timed(lambda: (SecurityManager._derive_key(SECRET),
+                                                SIGNATURE_BACKENDS["rsa"].new_key())))
+        with tempfile.TemporaryDirectory() as path:
+            store = KeyStore(path)
+            results["lazy_init"].append(_timed(lambda: SecurityManager(SECRET, store)))
+            cold = SecurityManager(SECRET, store)
+            results["cold_first_use"].append(_timed(lambda: _first_use(cold)))
+            # عملية جديدة بعد إعادة التشغيل: نفس المخزن، كائن جديد
+            warm = SecurityManager(SECRET, store)
+            results["warm_first_use"].append(_timed(lambda: _first_use(warm)))
+    return results
+
+
+def _rate(fn) -> float:
+    """عمليات في الثانية: يكرر fn حتى MIN_SECONDS على الأقل."""
+    count, start = 0, time.perf_counter()
+    while True:
+        fn()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return count / elapsed
+
+
+def _session_pair():
+    """(جلسة المرسل، مُنشئ جلسة مستقبل بنفس المفتاح).
+    الجلسة ترفض الرسالة المعادة، فكل فك يتم بجلسة مستقبل جديدة."""
+    key_id, key = os.urandom(12).hex(), os.urandom(32)
+    return Session(key_id, key, "bench"), lambda: Session(key_id, key, "bench")
+
+
+def run_crypto(store: KeyStore):
+    """{"sign": [...], "cipher": [...]} - صف لكل خوارزمية/حجم."""
+    rows = {"sign": [], "cipher": []}
+    task = make_task("matrix_multiply", [512], {}, sender_id="bench")
+    for name in SIGNATURE_BACKENDS:
+        manager = SecurityManager(SECRET, store, sig_alg=name)
+        signed = manager.sign_task(task)
+        assert manager.verify_task(signed)
+        plain_size = len(json.dumps(task, separators=(",", ":")))
+        signed_size = len(json.dumps(signed, separators=(",", ":")))
+        rows["sign"].append({
+            "alg": name,
+            "sign_per_s": _rate(lambda: manager.sign_task(task)),
+            "verify_per_s": _rate(lambda: manager.verify_task(signed)),
+            "overhead": signed_size - plain_size,
+        })
+
+    manager = SecurityManager(SECRET, store)
+    session, receiver = _session_pair()
+    for size in PAYLOAD_SIZES:
+        data = os.urandom(size)
+        timestamp = str(time.time())
+        fernet = manager.encrypt_data(data)
+        sealed = session.seal(data, timestamp)
+        stream = b"".join(session.seal_stream([data], timestamp))
+        modes = {
+            "fernet": (lambda: manager.encrypt_data(data), lambda: manager.decrypt_data(fernet), fernet),
+            "session": (lambda: session.seal(data, timestamp),
+                        lambda: receiver().open(sealed, timestamp), sealed),
+            "stream": (lambda: b"".join(session.seal_stream([data], timestamp)),
+                       lambda: b"".join(receiver().open_stream([stream], timestamp)), stream),
+        }
+        for mode, (encrypt, decrypt, output) in modes.items():
+            rows["cipher"].append({
+                "mode": mode,
+                "size": size,
+                "encrypt_per_s": _rate(encrypt),
+                "decrypt_per_s": _rate(decrypt),
+                "overhead": len(output) - size,
+            })
+    return rows
+
+
+def _print_startup(rounds: int):
+    results = run(rounds)
+    labels = {
+        "eager": "الإنشاء الفوري القديم (PBKDF2 + RSA)",
+        "lazy_init": "الإنشاء الكسول (SecurityManager())",
+        "cold_first_use": "أول استخدام - مخزن فارغ",
+        "warm_first_use": "أول استخدام - بعد إعادة التشغيل",
+    }
+    print(f"⏱️ زمن بدء طبقة الأمان (الوسيط من {rounds} جولات)")
+    print("-" * 56)
+    for name, samples in results.items():
+        print(f"{labels[name]:<40} {statistics.median(samples):9.2f} ms")
+    eager = statistics.median(results["eager"])
+    warm = statistics.median(results["warm_first_use"])
+    print("-" * 56)
+    print(f"🚀 التسريع عند إعادة التشغيل: {eager / max(warm, 1e-6):.0f}x")
+
+
+def _print_crypto():
+    with tempfile.TemporaryDirectory() as path:
+        rows = run_crypto(KeyStore(path))
+    print("✍️ التوقيع (sign_task / verify_task)")
+    print("-" * 64)
+    print(f"{'الخوارزمية':<12} {'توقيع/ث':>12} {'تحقق/ث':>12} {'زيادة المهمة (بايت)':>22}")
+    for row in rows["sign"]:
+        print(f"{row['alg']:<12} {row['sign_per_s']:12.0f} {row['verify_per_s']:12.0f} {row['overhead']:22d}")
+    print()
+    print("🔐 التشفير حسب حجم الحمولة")
+    print("-" * 64)
+    print(f"{'الوضع':<10} {'الحجم':>9} {'تشفير/ث':>12} {'فك/ث':>12} {'MB/s':>8} {'زيادة':>8}")
+    for row in rows["cipher"]:
+        throughput = row["encrypt_per_s"] * row["size"] / 1e6
+        print(f"{row['mode']:<10} {row['size']:9d} {row['encrypt_per_s']:12.0f} "
+              f"{row['decrypt_per_s']:12.0f} {throughput:8.0f} {row['overhead']:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس كلفة طبقة الأمان")
+    parser.add_argument("--suite", choices=("startup", "crypto", "all"), default="all")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.suite in ("startup", "all"):
+        _print_startup(args.rounds)
+    if args.suite == "all":
+        print()
+    if args.suite in ("crypto", "all"):
+        _print_crypto()
+
+
+if __name__ == "__main__":
+    main()
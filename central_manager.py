@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 # central_manager.py
 
+import asyncio
 import time
 import threading
 from typing import Dict, List
 
-import requests
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from peer_discovery import PORT, PORT
+from http_pool import POOL
+from rpc_client import CLIENT, make_task
+from peer_selection import PeerSelector
 
 # ---- إعداد FastAPI ----------------------------------------------------------
 app = FastAPI(title="Central Task Manager")
@@ -33,11 +36,16 @@ peers: Dict[str, Dict] = {}
 HEARTBEAT_TTL = 60      # ثواني قبل اعتبار العقدة متوقفة
 HEALTH_CHECK_FREQ = 30  # ثواني بين فحوص الصحة الداخلية
 
+# المهام التي وجّهناها ولم تكتمل لكل عقدة: تتحدث مع كل طلب لا مع كل تسجيل
+SELECTOR = PeerSelector()
+
 # ---- API للعقد لتسجيل نفسها -----------------------------------------------
 
 @app.post("/register")
 async def register_peer(req: RegisterRequest):
     """العقدة تستدعي هذه النقطة كلما انطلقت أو دورياً لتجديد ظهورها."""
+    if req.url not in peers:
+        POOL.warm(req.url)
     peers[req.url] = {"last_seen": time.time(), "load": req.load}
     return {"status": "ok", "peers_count": len(peers)}
 
@@ -60,28 +68,23 @@ async def dispatch_task(task: TaskRequest):
     if not available:
         raise HTTPException(503, "لا توجد عقد متاحة حاليّاً")
 
-    # خوارزمية بسيطة: الاختيار بناءً على أقل تحميل معلن
-    # أو تدوير دائري إذا لم يعلن أحد عن تحميله
-    best = None
-    best_load = 1.1
-    for url in available:
-        load = peers[url].get("load", None)
-        if load is None:
-            best = url
-            break
-        if load < best_load:
-            best, best_load = url, load
-
-    if not best:
-        best = available[0]
-
-    # إعادة توجيه الطلب
+    # قوة خيارين: الأخف من عقدتين عشوائيتين حسب مهامنا الجارية عليها
+    # وآخر حمل أعلنته؛ البقية تبقى في الترتيب للانتقال عند الفشل والطلب الاحتياطي
+    ranked = SELECTOR.rank({url: peers[url].get("load") for url in available})
+
+    # إعادة توجيه الطلب (العميل متزامن: يُنفَّذ خارج حلقة الأحداث)
+    payload = make_task(task.func, task.args, task.kwargs)
+    payload["complexity"] = task.complexity
+    loop = asyncio.get_running_loop()
     try:
-        resp = requests.post(best, json=task.dict(), timeout=10)
-        resp.raise_for_status()
-        return resp.json()
+        # المهمة الجارية تُحسب على القرين الذي أُرسلت إليه فعلاً (قد يكون
+        # التالي في الترتيب عند الانتقال أو الطلب الاحتياطي)، لا على ranked[0]
+        response = await loop.run_in_executor(
+            None, lambda: CLIENT.send(ranked, payload, tracker=SELECTOR))
+        response.pop("peer", None)
+        return response
     except Exception as e:
-        raise HTTPException(502, f"فشل التوجيه إلى {best}: {e}")
+        raise HTTPException(502, f"فشل التوجيه إلى {ranked[0]}: {e}")
 
 # ---- فحص دوري لصحة العقد ---------------------------------------------------
 
@@ -91,7 +94,7 @@ def health_check_loop():
         for url in list(peers.keys()):
             health_url = url.replace("/run", "/health")
             try:
-                r = requests.get(health_url, timeout=3)
+                r = POOL.get(health_url, timeout=3)
                 if r.status_code == 200:
                     peers[url]["last_seen"] = now
                     # يمكنك تحديث load من رد /health إذا وفّرته
@@ -0,0 +1,204 @@
+# compression.py
+# ============================================================
+# ضغط تكيّفي لأجسام الطلبات والردود بين الأقران:
+#   • zstd إن كانت مكتبة zstandard متوفرة، وإلا gzip (مكتبة قياسية).
+#   • التفاوض لكل قرين: العميل يرسل Accept-Encoding بما يفكّه، والخادم
+#     يعلن في رده Accept-Encoding (RFC 7694) بما يقبله في الطلبات.
+#   • لا ضغط تحت حد أدنى للحجم، ولا ضغط حين يقول تقدير عرض الحزمة
+#     المقاس (cost_model) إن زمن الضغط أكبر من زمن النقل الموفَّر.
+#   • نسبة الضغط وزمنه يُسجّلان في stats().
+# ============================================================
+
+import gzip
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cost_model import MODEL
+
+try:
+    import zstandard
+except ImportError:  # zstandard اختياري
+    zstandard = None
+
+try:
+    from urllib3.util.request import ACCEPT_ENCODING as _CLIENT_DECODES
+except ImportError:
+    _CLIENT_DECODES = "gzip,deflate"
+
+MIN_SIZE = 16 * 1024           # بايت - لا ضغط تحت هذا الحجم
+MIN_SAVING = 0.05              # نتخلى عن الناتج إن لم يوفّر 5% على الأقل
+GZIP_LEVEL = 1                 # أسرع مستوى؛ الشبكة هي عنق الزجاجة لا النسبة
+ZSTD_LEVEL = 3
+DECOMPRESS_FACTOR = 0.3        # زمن فك الضغط كنسبة تقريبية من زمن الضغط
+EWMA_ALPHA = 0.2
+
+# تقديرات أولية قبل أي قياس: (سرعة الضغط بايت/ثانية، نسبة الحجم الناتج)
+_PRIORS = {"zstd": (200e6, 0.4), "gzip": (60e6, 0.5)}
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+_CODECS = {"gzip": (lambda data: gzip.compress(data, GZIP_LEVEL), gzip.decompress)}
+if zstandard is not None:
+    _CODECS["zstd"] = (_zstd_compress, _zstd_decompress)
+
+# بالأفضلية: ما يستطيع هذا الجهاز فكّه في الطلبات الواردة
+SUPPORTED = [name for name in ("zstd", "gzip") if name in _CODECS]
+SERVER_ACCEPT_ENCODING = ", ".join(SUPPORTED)
+# ما يفكّه requests/urllib3 تلقائياً في الردود
+CLIENT_ACCEPT_ENCODING = ", ".join(name for name in SUPPORTED if name in _CLIENT_DECODES)
+
+
+def _parse_encodings(header: Optional[str]):
+    names = []
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        try:
+            weight = float(q[2:]) if q.startswith("q=") else 1.0
+        except ValueError:
+            weight = 1.0
+        if name and weight > 0:
+            names.append(name.strip().lower())
+    return names
+
+
+def _peer_key(peer: str) -> str:
+    """'http://ip:port/run' أو 'ip:port' → 'ip:port' (مفتاح الروابط في cost_model)"""
+    return urlsplit(peer if "://" in peer else f"http://{peer}").netloc
+
+
+class _CodecStats:
+    def __init__(self, name: str):
+        self.speed, self.ratio = _PRIORS[name]
+        self.count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def record(self, nbytes: int, compressed: int, seconds: float):
+        self.count += 1
+        self.bytes_in += nbytes
+        self.bytes_out += compressed
+        self.seconds += seconds
+        self.speed += EWMA_ALPHA * (nbytes / max(seconds, 1e-6) - self.speed)
+        self.ratio += EWMA_ALPHA * (compressed / max(nbytes, 1) - self.ratio)
+
+
+class Compressor:
+    """قرارات الضغط وإحصاءاته لهذه العملية (عميلاً وخادماً)."""
+
+    def __init__(self, min_size: int = MIN_SIZE):
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self._codecs = {name: _CodecStats(name) for name in SUPPORTED}
+        self._peer_encodings: Dict[str, list] = {}
+        self.skipped = {"small": 0, "link": 0, "incompressible": 0}
+
+    # ------------------------------------------------------------
+    # القرار
+    # ------------------------------------------------------------
+    def worth_it(self, codec: str, peer: Optional[str]) -> bool:
+        """هل يوفّر الضغط زمناً على رابط هذا القرين؟ (مستقل عن الحجم فوق الحد الأدنى)"""
+        if peer is None:
+            return True
+        _, bandwidth = MODEL.link_estimate(_peer_key(peer))
+        stats = self._codecs[codec]
+        # زمن الضغط وفكه لكل بايت مقابل زمن النقل الموفَّر لكل بايت
+        cost = (1 + DECOMPRESS_FACTOR) / stats.speed
+        saving = (1 - stats.ratio) / max(bandwidth, 1.0)
+        return saving > cost
+
+    def _skip(self, reason: str):
+        with self._lock:
+            self.skipped[reason] += 1
+
+    def compress(self, data: bytes, accepted, peer: Optional[str] = None) -> Tuple[bytes, Optional[str]]:
+        """(البايتات، الترميز أو None) - يضغط بأفضل ترميز مقبول إن كان مجدياً."""
+        codec = next((name for name in SUPPORTED if name in accepted), None)
+        if codec is None:
+            return data, None
+        if len(data) < self.min_size:
+            self._skip("small")
+            return data, None
+        if not self.worth_it(codec, peer):
+            self._skip("link")
+            return data, None
+        start = time.time()
+        packed = _CODECS[codec][0](data)
+        seconds = time.time() - start
+        with self._lock:
+            self._codecs[codec].record(len(data), len(packed), seconds)
+        if len(packed) > len(data) * (1 - MIN_SAVING):
+            self._skip("incompressible")
+            return data, None
+        return packed, codec
+
+    def decompress(self, data: bytes, encoding: Optional[str]) -> bytes:
+        encoding = (encoding or "").strip().lower()
+        if not encoding or encoding == "identity":
+            return data
+        if encoding not in _CODECS:
+            raise ValueError(f"ترميز غير مدعوم: {encoding}")
+        return _CODECS[encoding][1](data)
+
+    # ------------------------------------------------------------
+    # التفاوض من جهة العميل
+    # ------------------------------------------------------------
+    def note_peer(self, peer: str, response_headers):
+        """يحفظ ما يقبله القرين في طلباته (من Accept-Encoding في رده)."""
+        accepted = _parse_encodings(response_headers.get("Accept-Encoding"))
+        with self._lock:
+            self._peer_encodings[_peer_key(peer)] = accepted
+
+    def accept_encoding(self, peer: str) -> str:
+        """Accept-Encoding لطلب إلى هذا القرين: identity حين لا يستحق الرابط الضغط."""
+        codecs = [name for name in _parse_encodings(CLIENT_ACCEPT_ENCODING) if self.worth_it(name, peer)]
+        return ", ".join(codecs) or "identity"
+
+    def request_body(self, peer: str, data: bytes) -> Tuple[bytes, Dict]:
+        """(الجسم، ترويسات إضافية) لطلب إلى القرين؛ لا ضغط لقرين لم يعلن دعمه بعد."""
+        headers = {"Accept-Encoding": self.accept_encoding(peer)}
+        accepted = self._peer_encodings.get(_peer_key(peer), ())
+        data, encoding = self.compress(data, accepted, peer)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return data, headers
+
+    # ------------------------------------------------------------
+    # جهة الخادم
+    # ------------------------------------------------------------
+    def response_body(self, data: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Dict]:
+        """(الجسم، الترويسات) لرد الخادم حسب Accept-Encoding الطلب."""
+        headers = {"Accept-Encoding": SERVER_ACCEPT_ENCODING, "Vary": "Accept-Encoding"}
+        data, encoding = self.compress(data, _parse_encodings(accept_encoding))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return data, headers
+
+    def stats(self) -> Dict:
+        with self._lock:
+            codecs = {
+                name: {
+                    "count": s.count,
+                    "bytes_in": s.bytes_in,
+                    "bytes_out": s.bytes_out,
+                    "ratio": s.bytes_out / s.bytes_in if s.bytes_in else None,
+                    "seconds": round(s.seconds, 4),
+                    "mb_per_s": round(s.speed / 1e6, 1),
+                }
+                for name, s in self._codecs.items()
+            }
+            return {"codecs": codecs, "skipped": dict(self.skipped)}
+
+
+# ضاغط مشترك للعملية
+COMPRESSOR = Compressor()
@@ -0,0 +1,224 @@
+# cost_model.py
+# ============================================================
+# نموذج تكلفة متعلَّم لكل دالة:
+#   • يسجّل زمن التنفيذ المحلي والبعيد وحجم الوسائط وحجم النتيجة.
+#   • يتعلّم علاقة أُسّية (زمن ≈ a · حجم^b) لكل دالة عبر انحدار
+#     خطي على اللوغاريتمات، فيناسب n^1.5 للأعداد الأولية و size^3
+#     لضرب المصفوفات بدون جداول ثابتة.
+#   • يقدّر زمن الإنجاز لكل خيار: محلياً، أو على القرين X مع زمن
+#     النقل (RTT + الحجم / عرض الحزمة المقاس لذلك القرين).
+# ============================================================
+
+import json
+import math
+import threading
+import time
+from numbers import Number
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LOCAL = "local"              # معرّف خيار التنفيذ المحلي
+ANY_PEER = "*"               # قرين افتراضي بخصائص شبكة أولية حين لا نعرف أي قرين
+DEFAULT_RTT = 0.05           # ثواني - تقدير أولي قبل أي قياس
+DEFAULT_BANDWIDTH = 10e6     # بايت/ثانية - تقدير أولي قبل أي قياس
+EWMA_ALPHA = 0.2
+MAX_LOAD = 0.9               # سقف الحمل عند تضخيم الزمن المحلي
+
+
+def work_scale(args, kwargs) -> float:
+    """مقياس «حجم العمل» من الوسائط: حاصل ضرب الأعداد وأطوال الحاويات."""
+    scale = 1.0
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, Number) and value > 0:
+            scale *= float(value)
+        elif isinstance(value, (list, tuple, dict, str, bytes)) and len(value) > 0:
+            scale *= len(value)
+    return max(scale, 1.0)
+
+
+def approx_size(obj, _depth=0) -> int:
+    """تقدير سريع لحجم الكائن بعد ترميزه JSON (بدون ترميزه فعلياً)."""
+    if obj is None or isinstance(obj, bool):
+        return 4
+    if isinstance(obj, Number):
+        return 8
+    if isinstance(obj, (str, bytes)):
+        return len(obj) + 2
+    if hasattr(obj, "nbytes"):          # numpy.ndarray
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        items = list(obj.items())
+        if not items:
+            return 2
+        sample = items[:50]
+        per_item = sum(approx_size(k, _depth + 1) + approx_size(v, _depth + 1) for k, v in sample) / len(sample)
+        return int(per_item * len(items)) + 2
+    if isinstance(obj, (list, tuple, set)):
+        if not obj:
+            return 2
+        seq = list(obj) if not isinstance(obj, (list, tuple)) else obj
+        sample = seq[:50]
+        per_item = sum(approx_size(v, _depth + 1) for v in sample) / len(sample)
+        return int(per_item * len(seq)) + 2
+    try:
+        return len(json.dumps(obj, default=str))
+    except Exception:
+        return 64
+
+
+class _PowerFit:
+    """انحدار خطي تراكمي على log(y) مقابل log(x)."""
+
+    def __init__(self):
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def add(self, x: float, y: float):
+        lx, ly = math.log(max(x, 1.0)), math.log(max(y, 1e-6))
+        self.n += 1
+        self.sx += lx
+        self.sy += ly
+        self.sxx += lx * lx
+        self.sxy += lx * ly
+
+    def predict(self, x: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        lx = math.log(max(x, 1.0))
+        denom = self.n * self.sxx - self.sx * self.sx
+        if self.n < 2 or abs(denom) < 1e-9:
+            return math.exp(self.sy / self.n)
+        slope = (self.n * self.sxy - self.sx * self.sy) / denom
+        intercept = (self.sy - slope * self.sx) / self.n
+        return math.exp(intercept + slope * lx)
+
+
+class _Link:
+    """تقدير RTT وعرض الحزمة لقرين واحد (متوسط متحرك أُسّي)."""
+
+    def __init__(self):
+        self.rtt = DEFAULT_RTT
+        self.bandwidth = DEFAULT_BANDWIDTH
+        self.samples = 0
+
+    def update(self, network_seconds: float, nbytes: int):
+        network_seconds = max(network_seconds, 1e-4)
+        # الطلبات الصغيرة تقيس RTT والكبيرة تقيس عرض الحزمة
+        if nbytes < 64 * 1024:
+            self.rtt += EWMA_ALPHA * (network_seconds - self.rtt)
+        else:
+            transfer = max(network_seconds - self.rtt, 1e-4)
+            self.bandwidth += EWMA_ALPHA * (nbytes / transfer - self.bandwidth)
+        self.samples += 1
+
+    def transfer_time(self, nbytes: int) -> float:
+        return self.rtt + nbytes / max(self.bandwidth, 1.0)
+
+
+class CostModel:
+    """يسجّل قياسات التنفيذ ويتنبأ بزمن الإنجاز لكل خيار."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[str, _PowerFit] = {}
+        self._remote: Dict[Tuple[str, str], _PowerFit] = {}
+        self._remote_any: Dict[str, _PowerFit] = {}
+        self._result_bytes: Dict[str, _PowerFit] = {}
+        self._links: Dict[str, _Link] = {}
+
+    # ------------------------------------------------------------
+    # التسجيل
+    # ------------------------------------------------------------
+    def record_local(self, func_name: str, args, kwargs, seconds: float, result=None):
+        x = work_scale(args, kwargs)
+        with self._lock:
+            self._local.setdefault(func_name, _PowerFit()).add(x, seconds)
+            self._result_bytes.setdefault(func_name, _PowerFit()).add(x, approx_size(result))
+
+    def record_remote(self, func_name: str, peer: str, args, kwargs,
+                      total_seconds: float, took: Optional[float] = None, result=None):
+        """total_seconds: الزمن الكامل عند العميل، took: زمن التنفيذ الذي أعاده القرين."""
+        x = work_scale(args, kwargs)
+        result_size = approx_size(result)
+        compute = took if took is not None else total_seconds
+        with self._lock:
+            self._remote.setdefault((func_name, peer), _PowerFit()).add(x, compute)
+            self._remote_any.setdefault(func_name, _PowerFit()).add(x, compute)
+            self._result_bytes.setdefault(func_name, _PowerFit()).add(x, result_size)
+            if took is not None:
+                nbytes = approx_size([list(args), kwargs]) + result_size
+                self._links.setdefault(peer, _Link()).update(total_seconds - took, nbytes)
+
+    # ------------------------------------------------------------
+    # التنبؤ
+    # ------------------------------------------------------------
+    def has_data(self, func_name: str) -> bool:
+        return func_name in self._local or func_name in self._remote_any
+
+    def known_peers(self) -> List[str]:
+        return list(self._links.keys())
+
+    def link_estimate(self, peer: str) -> Tuple[float, float]:
+        """(RTT بالثواني، عرض الحزمة بايت/ثانية) المقاسان لهذا القرين أو التقدير الأولي."""
+        link = self._links.get(peer) or _Link()
+        return link.rtt, link.bandwidth
+
+    def predict_local(self, func_name: str, args, kwargs, cpu_load: float = 0.0) -> Optional[float]:
+        fit = self._local.get(func_name)
+        if fit is None:
+            return None
+        base = fit.predict(work_scale(args, kwargs))
+        # تضخيم بحسب الحمل الحالي (نموذج طابور M/M/1 مبسّط)
+        return base / (1.0 - min(max(cpu_load, 0.0), MAX_LOAD))
+
+    def predict_remote(self, func_name: str, peer: str, args, kwargs) -> Optional[float]:
+        x = work_scale(args, kwargs)
+        fit = self._remote.get((func_name, peer)) or self._remote_any.get(func_name) or self._local.get(func_name)
+        if fit is None:
+            return None
+        compute = fit.predict(x)
+        result_fit = self._result_bytes.get(func_name)
+        result_size = result_fit.predict(x) if result_fit else 0
+        nbytes = approx_size([list(args), kwargs]) + int(result_size or 0)
+        link = self._links.get(peer) or _Link()
+        return compute + link.transfer_time(nbytes)
+
+    def predict(self, func_name: str, args, kwargs, peers: Iterable[str] = (),
+                cpu_load: float = 0.0) -> List[Tuple[str, float]]:
+        """قائمة (الخيار، الزمن المتوقع) مرتبة تصاعدياً؛ الخيارات المجهولة تُستبعد."""
+        options = []
+        local = self.predict_local(func_name, args, kwargs, cpu_load)
+        if local is not None:
+            options.append((LOCAL, local))
+        for peer in peers:
+            eta = self.predict_remote(func_name, peer, args, kwargs)
+            if eta is not None:
+                options.append((peer, eta))
+        return sorted(options, key=lambda option: option[1])
+
+    def choose(self, func_name: str, args, kwargs, peers: Iterable[str] = (),
+               cpu_load: float = 0.0) -> Optional[str]:
+        """الخيار الأسرع إنجازاً، أو None إن لم تتوفر قياسات للدالة بعد."""
+        if not self.has_data(func_name):
+            return None
+        options = self.predict(func_name, args, kwargs, list(peers) or [ANY_PEER], cpu_load)
+        return options[0][0] if options else None
+
+    def rank_peers(self, func_name: str, args, kwargs, peers: Iterable[str]) -> List[str]:
+        """ترتيب الأقران حسب الزمن المتوقع؛ المجهولون في النهاية بترتيبهم الأصلي."""
+        peers = list(peers)
+        known = {p: self.predict_remote(func_name, p, args, kwargs) for p in peers}
+        return sorted(peers, key=lambda p: (known[p] is None, known[p] or 0.0))
+
+
+# نموذج مشترك لكل ديكوراتورات التوزيع في العملية
+MODEL = CostModel()
+
+
+def timed_call(func, *args, **kwargs):
+    """تنفيذ محلي مع تسجيل الزمن في النموذج المشترك."""
+    start = time.time()
+    result = func(*args, **kwargs)
+    MODEL.record_local(func.__name__, args, kwargs, time.time() - start, result)
+    return result
@@ -1,15 +1,22 @@
 import threading
 import queue
 import time
-from typing import Callable, Dict, List
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed as _as_completed
+from typing import Callable, Dict, Iterable, Iterator, List
 import socket
 from zeroconf import Zeroconf, ServiceBrowser, ServiceInfo
 import logging
-import requests
 import subprocess
 import psutil
 import GPUtil
-from processor_manager import ResourceMonitor
+from load_sampler import get_snapshot
+from offload_controller import get_thresholds
+from rpc_client import CLIENT, make_task
+from self_node import add_own_port, is_self
+from result_cache import CACHE, cache_key, lookup_peers
+from cost_model import MODEL
+from task_scheduler import TaskScheduler, PRIORITY_NORMAL, DEFAULT_QUEUE_SIZE
 from peer_discovery import PORT, PORT
 
 
@@ -68,14 +75,16 @@ class DeviceManager:
     # قياس الحمل
     def get_device_load(self, device_type, index=0):
         try:
+            devices = get_snapshot().devices
             if device_type == "GPU" and self.devices["GPU"]:
-                return self.devices["GPU"][index].load * 100
+                gpu_loads = devices.get("GPU") or ()
+                return gpu_loads[index] if index < len(gpu_loads) else 0
             elif device_type == "DSP" and self.devices["DSP"]:
                 return 10  # افتراضي
             elif device_type == "NIC" and self.devices["NIC"]:
-                return psutil.net_io_counters().bytes_sent / (1024 * 1024)  # MB sent كمثال
+                return devices.get("NIC", 0)  # MB/s مُرسلة
             elif device_type == "STORAGE" and self.devices["STORAGE"]:
-                return psutil.disk_usage('/').percent
+                return devices.get("STORAGE", 0)
             elif device_type == "CAPTURE" and self.devices["CAPTURE"]:
                 return 20  # افتراضي
             elif device_type == "ACCELERATOR" and self.devices["ACCELERATOR"]:
@@ -86,10 +95,10 @@ class DeviceManager:
 
     # منطق الاستقبال/الإرسال
     def can_receive(self, device_type, index=0):
-        return self.get_device_load(device_type, index) <= 30
+        return self.get_device_load(device_type, index) <= get_thresholds().device_receive
 
     def should_offload(self, device_type, index=0):
-        return self.get_device_load(device_type, index) >= 70
+        return self.get_device_load(device_type, index) >= get_thresholds().device_offload
 
 # ─────────────── Peer Registry ───────────────
 class PeerRegistry:
@@ -111,9 +120,12 @@ class PeerRegistry:
             server=f"{name}.local."
         )
         self._zeroconf.register_service(service_info)
+        add_own_port(port)
         logging.info(f"✅ Service registered: {name} @ {self._get_local_ip()}:{port}")
 
     def discover_peers(self, timeout: int = 3) -> List[Dict]:
+        local_node_id = self.local_node_id
+
         class Listener:
             def __init__(self):
                 self.peers = []
@@ -130,6 +142,9 @@ class PeerRegistry:
                             'node_id': info.properties.get(b'node_id', b'unknown').decode(),
                             'last_seen': time.time()
                         }
+                        if (peer_data['node_id'] == local_node_id
+                                or is_self(f"{ip}:{info.port}", peer_data['node_id'])):
+                            return   # خدمتنا نفسها ليست قريناً بعيداً
                         if peer_data not in self.peers:
                             self.peers.append(peer_data)
                         logging.info(f"✅ تمت إضافة نظير جديد: {peer_data}")
@@ -161,14 +176,30 @@ class PeerRegistry:
         return ip
 
 # ─────────────── Distributed Executor ───────────────
+MAX_REMOTE_IN_FLIGHT = 256   # أقصى عدد مهام بعيدة متزامنة (خيوط I/O)
+CLUSTER_LOOKUP_MIN = 0.05    # ثواني: لا نسأل الأقران عن نتائج دوال أرخص من هذا
+MAX_QUEUE_WAIT = 1.0         # ثواني: انتظار محلي متوقع أطول من هذا → توزيع على الأقران
+
 class DistributedExecutor:
-    def __init__(self, shared_secret: str):
+    def __init__(self, shared_secret: str, max_workers: int = None,
+                 max_remote_in_flight: int = MAX_REMOTE_IN_FLIGHT,
+                 max_queue: int = DEFAULT_QUEUE_SIZE):
         self.peer_registry = PeerRegistry()
         self.shared_secret = shared_secret
-        self.task_queue = queue.PriorityQueue()
-        self.result_cache = {}
+        # المهام المحلية عبر مُجدوِل بأولويات وعمّال بعدد الأنوية، والبعيدة على مجمّع I/O أكبر
+        self.scheduler = TaskScheduler(workers=max_workers, maxsize=max_queue)
+        self.task_queue = self.scheduler.queue
+        # الذاكرة المشتركة للعملية: هي ما يجيب به /cache/<key> للأقران
+        self.result_cache = CACHE
         self.available_peers = []
         self.devices = DeviceManager()
+        self._remote_pool = ThreadPoolExecutor(
+            max_workers=max_remote_in_flight,
+            thread_name_prefix="dex-remote"
+        )
+        # البحث لدى الأقران على مجمّع منفصل: لا ينتظر خيطٌ في _remote_pool
+        # مهمة فرعية على نفس المجمّع (يمتلئ المجمّع بالمنتظرين فيتوقف)
+        self._lookup_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dex-cache")
         self._init_peer_discovery()
 
     def _init_peer_discovery(self):
@@ -180,51 +211,142 @@ class DistributedExecutor:
 
         threading.Thread(target=discovery_loop, daemon=True).start()
 
-    def submit(self, task_func: Callable, *args, task_type=None, **kwargs):
-        monitor = ResourceMonitor().current_load()
-        avg_cpu = monitor["average"]["cpu"]
-        avg_mem = monitor["average"]["mem_percent"] if "mem_percent" in monitor["average"] else 0
+    def submit(self, task_func: Callable, *args, task_type=None, priority: int = None,
+               deadline: float = None, **kwargs) -> Future:
+        """يُرجع Future فوراً؛ التنفيذ المحلي والبعيد يجريان بالتوازي في الخلفية.
+        priority: أصغر = أهم (الافتراضي من task_func.dts_priority إن وُجد).
+        deadline: زمن مطلق لا تبدأ المهمة المحلية بعده.
+        عند امتلاء الطابور المحلي ينتظر المستدعي (ضغط عكسي)."""
+        if priority is None:
+            priority = getattr(task_func, "dts_priority", PRIORITY_NORMAL)
+        # الدوال المعلنة @deterministic: إصابة محلية تُرجع Future منتهية فوراً
+        key = cache_key(task_func, args, kwargs)
+        if key:
+            hit, value = self.result_cache.get(key)
+            if hit:
+                future = Future()
+                future.set_result(value)
+                return future
+            return self._run_cached(key, task_func, args, kwargs, task_type, priority, deadline)
+        return self._dispatch(task_func, args, kwargs, task_type, priority, deadline)
+
+    def _run_cached(self, key: str, task_func: Callable, args, kwargs, task_type, priority, deadline) -> Future:
+        """بحث لدى الأقران ثم تنفيذ وتخزين النتيجة، بتسلسل callbacks لا بانتظار خيط."""
+        result = Future()
+
+        def store(done: Future):
+            try:
+                value = done.result()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            self.result_cache.put_result(task_func, args, kwargs, value)
+            result.set_result(value)
+
+        def after_lookup(lookup: Future):
+            try:
+                hit, value = lookup.result()
+            except Exception:
+                hit, value = False, None
+            if hit:
+                self.result_cache.put_result(task_func, args, kwargs, value)
+                result.set_result(value)
+                return
+            try:
+                self._dispatch(task_func, args, kwargs, task_type, priority, deadline).add_done_callback(store)
+            except BaseException as e:
+                result.set_exception(e)
+
+        predicted = MODEL.predict_local(task_func.__name__, args, kwargs)
+        if self.available_peers and (predicted is None or predicted >= CLUSTER_LOOKUP_MIN):
+            peers = [f"{p['ip']}:{p['port']}" for p in self.available_peers]
+            self._lookup_pool.submit(lookup_peers, key, peers).add_done_callback(after_lookup)
+        else:
+            self._dispatch(task_func, args, kwargs, task_type, priority, deadline).add_done_callback(store)
+        return result
+
+    def _dispatch(self, task_func: Callable, args, kwargs, task_type, priority, deadline) -> Future:
+        snap = get_snapshot()
+        avg_cpu = snap.avg_cpu
+        avg_mem = snap.mem_percent
+        queue_wait = self.scheduler.expected_wait()
+        limits = get_thresholds()
 
         # تحديد نوع الجهاز
         device_type = task_type.upper() if task_type else "CPU"
 
-        # فحص الحمل
-        if (avg_cpu > 0.6 or avg_mem > 85 or self.devices.should_offload(device_type)):
-            logging.info(f"⚠️ الحمل مرتفع على {device_type} - إرسال المهمة للأقران")
-            self._offload_task(task_func, *args, **kwargs)
-        elif (avg_cpu <= 0.3 and self.devices.can_receive(device_type)):
+        # فحص الحمل (بما فيه طول الطابور المحلي)
+        if (avg_cpu > limits.offload_cpu or avg_mem > 85 or self.devices.should_offload(device_type)
+                or (queue_wait > MAX_QUEUE_WAIT and self.available_peers)):
+            logging.info(f"⚠️ الحمل مرتفع على {device_type} (انتظار الطابور {queue_wait:.2f}s) - إرسال المهمة للأقران")
+            return self._remote_pool.submit(self._offload_task, task_func, *args, **kwargs)
+        elif (avg_cpu <= limits.receive_cpu and self.devices.can_receive(device_type)):
             logging.info(f"✅ الحمل منخفض على {device_type} - تنفيذ المهمة محلياً")
-            return task_func(*args, **kwargs)
         else:
             logging.info(f"ℹ️ الحمل متوسط على {device_type} - تنفيذ المهمة محلياً")
-            return task_func(*args, **kwargs)
+        return self.scheduler.submit(task_func, *args, priority=priority, deadline=deadline, **kwargs)
+
+    def queue_stats(self) -> Dict:
+        """عمق الطابور المحلي وأزمنة الانتظار لكل مسار"""
+        return self.scheduler.stats()
+
+    def map(self, task_func: Callable, *iterables, task_type=None, timeout: float = None) -> Iterator:
+        """مثل Executor.map: يرسل كل الاستدعاءات دفعة واحدة ويُرجع النتائج بالترتيب."""
+        futures = [self.submit(task_func, *call_args, task_type=task_type) for call_args in zip(*iterables)]
+        deadline = time.time() + timeout if timeout is not None else None
+
+        def results():
+            for future in futures:
+                remaining = None if deadline is None else max(deadline - time.time(), 0)
+                yield future.result(remaining)
+        return results()
+
+    @staticmethod
+    def as_completed(futures: Iterable[Future], timeout: float = None) -> Iterator[Future]:
+        """يُرجع الـFutures حسب ترتيب اكتمالها."""
+        return _as_completed(futures, timeout=timeout)
+
+    @staticmethod
+    def gather(futures: Iterable[Future], timeout: float = None, return_exceptions: bool = False) -> List:
+        """ينتظر كل الـFutures ويُرجع نتائجها بنفس الترتيب."""
+        futures = list(futures)
+        deadline = time.time() + timeout if timeout is not None else None
+        results = []
+        for future in futures:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            try:
+                results.append(future.result(remaining))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def shutdown(self, wait: bool = True):
+        if wait:
+            self.scheduler.general.queue.join()
+            self.scheduler.realtime.queue.join()
+        self._lookup_pool.shutdown(wait=wait)
+        self._remote_pool.shutdown(wait=wait)
 
     def _offload_task(self, task_func: Callable, *args, **kwargs):
-        task_id = f"{task_func.__name__}_{time.time()}"
-
-        task = {
-            'task_id': task_id,
-            'function': task_func.__name__,
-            'args': args,
-            'kwargs': kwargs,
-            'sender_id': self.peer_registry.local_node_id
-        }
+        task = make_task(task_func.__name__, args, kwargs,
+                         sender_id=self.peer_registry.local_node_id)
+        task_id = task['task_id']
 
         if self.available_peers:
-            lan_peers = [p for p in self.available_peers if self._is_local_ip(p['ip'])]
-            wan_peers = [p for p in self.available_peers if not self._is_local_ip(p['ip'])]
-
-            if lan_peers:
-                peer = min(lan_peers, key=lambda x: x['load'])
-                logging.info(f"✅ Sending task {task_id} to LAN peer {peer['node_id']}")
-            else:
-                peer = min(wan_peers, key=lambda x: x['load'])
-                logging.info(f"✅ Sending task {task_id} to WAN peer {peer['node_id']}")
-
-            self._send_to_peer(peer, task)
+            # LAN أولاً ثم WAN، والأقل حملاً أولاً؛ التالي في القائمة هو هدف الطلب الاحتياطي
+            peers = sorted(self.available_peers,
+                           key=lambda p: (not self._is_local_ip(p['ip']), p['load']))
+            logging.info(f"✅ Sending task {task_id} to peer {peers[0]['node_id']}")
+
+            response = self._send_to_peers(peers, task)
+            if response is not None:
+                return response.get("result") if isinstance(response, dict) else response
+            logging.warning(f"⚠️ فشل التنفيذ البعيد للمهمة {task_id} - سيتم تنفيذها محلياً")
         else:
             logging.warning("⚠️ لا توجد أجهزة متاحة - سيتم تنفيذ المهمة محلياً")
-            task_func(*args, **kwargs)
+        return task_func(*args, **kwargs)
 
     def _is_local_ip(self, ip: str) -> bool:
         return (
@@ -234,15 +356,15 @@ class DistributedExecutor:
             ip == '127.0.0.1'
         )
 
-    def _send_to_peer(self, peer: Dict, task: Dict):
+    def _send_to_peers(self, peers: List[Dict], task: Dict):
         try:
-            url = f"http://{peer['ip']}:{peer['port']}/run"
-            response = requests.post(url, json=task, timeout=10)
-            response.raise_for_status()
-            logging.info(f"✅ Response from peer: {response.text}")
-            return response.json()
+            # طلب احتياطي للقرين التالي بعد p95 الدالة، والمهلة مشتقة من زمنها المرصود
+            addresses = [f"{p['ip']}:{p['port']}" for p in peers]
+            response = CLIENT.send(addresses, task)
+            logging.info(f"✅ Response from peer {response['peer']}: took {response.get('took')}s")
+            return response
         except Exception as e:
-            logging.error(f"❌ فشل إرسال المهمة لـ {peer['node_id']}: {e}")
+            logging.error(f"❌ فشل إرسال المهمة {task['task_id']}: {e}")
             return None
 
 # ─────────────── تشغيل رئيسي ───────────────
@@ -254,4 +376,5 @@ if __name__ == "__main__":
     def example_task(x):
         return x * x
 
-    executor.submit(example_task, 5, task_type="GPU")
+    print(executor.submit(example_task, 5, task_type="GPU").result())
+    print(executor.gather(executor.submit(example_task, i) for i in range(10)))
@@ -3,12 +3,12 @@
 external_server.py — سيرفر مركزي لتوزيع المهام + Dashboard تفاعلي
 """
 import logging
-import requests
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from peer_discovery import PEERS
 from peer_discovery import PORT, PORT
+from http_pool import POOL
 
 logging.basicConfig(level=logging.INFO)
 
@@ -29,7 +29,7 @@ def select_best_peer():
         peer_loads = []
         for peer_url in peers_list:
             try:
-                resp = requests.get(f"{peer_url.replace('/run_task','')}/status", timeout=2)
+                resp = POOL.get(f"{peer_url.replace('/run_task','')}/status", timeout=2)
                 if resp.ok:
                     data = resp.json()
                     peer_loads.append((peer_url, data.get("cpu_load", 100)))
@@ -57,7 +57,7 @@ def submit_task():
         return jsonify({"error": "لا توجد أجهزة متاحة حالياً"}), 503
     
     try:
-        resp = requests.post(peer, json=data, timeout=10)
+        resp = POOL.post(peer, json=data, timeout=10)
         if resp.ok:
             return jsonify({"status": "success", "result": resp.json()})
         else:
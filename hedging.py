@@ -0,0 +1,220 @@
+# hedging.py
+# ============================================================
+# طلبات احتياطية (Hedged requests) لتقليل زمن الذيل:
+#   • نرسل المهمة لأفضل قرين، وإن لم يُجب خلال p95 المرصود لهذه
+#     الدالة نرسل نسخة للقرين التالي ونأخذ أول إجابة.
+#   • النسخة الخاسرة تُلغى: من طابور المجمّع إن لم تُرسل، وإلا عبر
+#     /cancel/<task_id> لدى القرين حتى لا يكمل عملاً لن يُقرأ.
+#   • فشل القرين ينقل المهمة فوراً للقرين التالي بدل إعادة المحاولة
+#     على نفس القرين.
+#   • المهلة تتضاعف (حتى MAX_TIMEOUT) بعد كل انتهاء مهلة للدالة: الدالة
+#     الأبطأ من المهلة الافتراضية لا تُلغى إلى الأبد قبل أن تُسجَّل لها قياسات.
+#   • كل إرسال (أصلي أو احتياطي أو انتقال) يحمل المهلة المتبقية لحظته
+#     في "budget"، فلا يحصل القرين المتأخر على مهلة أطول مما بقي فعلاً.
+#   • حركة الطلبات الاحتياطية محدودة بميزانية (نسبة من الطلبات)،
+#     مع عدّادات لعدد مرات فوز الطلب الاحتياطي.
+# ============================================================
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from http_pool import POOL
+from task_batcher import BATCHER, peer_base_url
+
+HEDGE_RATIO = 0.1            # أقصى نسبة طلبات احتياطية إلى الطلبات الأصلية
+HEDGE_BURST = 5              # رصيد أقصى يسمح بدفعة احتياطية قصيرة
+DEFAULT_HEDGE_DELAY = 1.0    # ثواني - قبل توفر قياسات كافية للدالة
+MIN_HEDGE_DELAY = 0.02
+MIN_SAMPLES = 5              # قياسات قبل الاعتماد على p95
+LATENCY_WINDOW = 100         # آخر N زمن استجابة لكل دالة
+DEFAULT_TIMEOUT = 10         # ثواني - قبل توفر قياسات للدالة
+MIN_TIMEOUT = 2
+MAX_TIMEOUT = 60
+TIMEOUT_FACTOR = 4           # المهلة الكلية = p95 × هذا المعامل
+CANCEL_TIMEOUT = 2
+
+_canceller = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedge-cancel")
+
+
+def cancel_remote(peer: str, task_id: Optional[str]):
+    """يطلب من القرين إيقاف مهمة تخلّينا عنها (بدون انتظار الرد)."""
+    if not task_id:
+        return
+
+    def send():
+        try:
+            POOL.post(f"{peer_base_url(peer)}/cancel/{task_id}", timeout=CANCEL_TIMEOUT)
+        except Exception as e:
+            logging.debug(f"تعذّر إلغاء {task_id} لدى {peer}: {e}")
+
+    _canceller.submit(send)
+
+
+class HedgedCaller:
+    """يرسل المهمة لقائمة أقران مرتبة مع طلب احتياطي وانتقال عند الفشل."""
+
+    def __init__(self, batcher=BATCHER, ratio: float = HEDGE_RATIO, burst: float = HEDGE_BURST):
+        self.batcher = batcher
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._backoff: Dict[str, float] = {}     # مهلة مضاعفة بعد انتهاء مهلة الدالة
+        self.counters = {
+            "calls": 0,
+            "hedges": 0,            # طلبات احتياطية أُرسلت
+            "hedge_wins": 0,        # أجاب الاحتياطي أولاً
+            "primary_wins": 0,      # أجاب الأصلي أولاً رغم إرسال احتياطي
+            "hedges_skipped": 0,    # تجاوزنا p95 لكن الميزانية نفدت
+            "failovers": 0,         # فشل قرين فانتقلنا للتالي
+            "timeouts": 0,
+            "remote_cancels": 0,    # مهام خاسرة أُلغيت لدى القرين بعد إرسالها
+        }
+
+    # ------------------------------------------------------------
+    # القياسات
+    # ------------------------------------------------------------
+    def p95(self, func_name: str):
+        with self._lock:
+            samples = sorted(self._latencies.get(func_name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95)]
+
+    def hedge_delay(self, func_name: str) -> float:
+        p95 = self.p95(func_name)
+        return DEFAULT_HEDGE_DELAY if p95 is None else max(p95, MIN_HEDGE_DELAY)
+
+    def timeout_for(self, func_name: str) -> float:
+        p95 = self.p95(func_name)
+        timeout = DEFAULT_TIMEOUT if p95 is None else min(max(p95 * TIMEOUT_FACTOR, MIN_TIMEOUT), MAX_TIMEOUT)
+        with self._lock:
+            return max(timeout, self._backoff.get(func_name, 0.0))
+
+    def _record(self, func_name: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(func_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            self._backoff.pop(func_name, None)
+
+    def _timed_out(self, func_name: str, timeout: float):
+        """لا قياس من المهلة المنتهية: نضاعفها للمرة التالية بدل تكرار نفس الإلغاء."""
+        with self._lock:
+            self._backoff[func_name] = min(max(timeout, self._backoff.get(func_name, 0.0)) * 2, MAX_TIMEOUT)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _submit(self, peer: str, payload: Dict, deadline: float):
+        """المهلة المتبقية لحظة الإرسال (لا الموعد المطلق: ساعة القرين غير ساعتنا)."""
+        return self.batcher.submit(peer, dict(payload, budget=round(max(deadline - time.time(), 0.0), 3)))
+
+    def _abandon(self, future, peer: str, payload: Dict):
+        if not future.cancel():
+            self._count("remote_cancels")
+            cancel_remote(peer, payload.get("task_id"))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["hedge_win_rate"] = stats["hedge_wins"] / stats["hedges"] if stats["hedges"] else 0.0
+        return stats
+
+    # ------------------------------------------------------------
+    # الاستدعاء
+    # ------------------------------------------------------------
+    def call(self, peers: Iterable[str], payload: Dict, func_name: str = None,
+             timeout: float = None,
+             on_outcome: Optional[Callable[[str, bool], None]] = None,
+             on_start: Optional[Callable[[str], None]] = None) -> Tuple[str, Dict]:
+        """يُرجع (القرين الفائز، رد /run). peers مرتبة من الأفضل للأسوأ.
+        on_outcome(peer, ok) يُستدعى لكل قرين أجاب أو فشل أو انتهت مهلته.
+        on_start(peer) يُستدعى قبل كل إرسال (أصلي أو احتياطي أو انتقال)."""
+        report = on_outcome or (lambda peer, ok: None)
+        started = on_start or (lambda peer: None)
+        peers = list(peers)
+        if not peers:
+            raise ConnectionError("لا يوجد أقران لإرسال المهمة")
+        func_name = func_name or payload.get("func") or payload.get("function") or "?"
+        with self._lock:
+            self.counters["calls"] += 1
+            self._tokens = min(self._tokens + self.ratio, self.burst)
+
+        start = time.time()
+        deadline = start + (timeout or self.timeout_for(func_name))
+        hedge_at = start + self.hedge_delay(func_name)
+        started(peers[0])
+        pending = {self._submit(peers[0], payload, deadline): peers[0]}
+        hedge_futures = set()
+        next_peer = 1
+        last_error = None
+
+        while pending:
+            now = time.time()
+            if now >= deadline:
+                break
+            can_hedge = not hedge_futures and next_peer < len(peers) and hedge_at < deadline
+            done, _ = wait(pending, timeout=(min(hedge_at, deadline) if can_hedge else deadline) - now,
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                peer = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    logging.warning(f"⚠️ فشل القرين {peer}: {e}")
+                    report(peer, False)
+                    continue
+                report(peer, True)
+                for other, other_peer in pending.items():
+                    self._abandon(other, other_peer, payload)
+                if hedge_futures:
+                    self._count("hedge_wins" if future in hedge_futures else "primary_wins")
+                self._record(func_name, time.time() - start)
+                return peer, response
+
+            if not pending and next_peer < len(peers):
+                # كل الطلبات الجارية فشلت: ننتقل للقرين التالي فوراً
+                self._count("failovers")
+                started(peers[next_peer])
+                pending[self._submit(peers[next_peer], payload, deadline)] = peers[next_peer]
+                next_peer += 1
+            elif can_hedge and time.time() >= hedge_at:
+                if self._take_token():
+                    peer = peers[next_peer]
+                    next_peer += 1
+                    logging.info(f"⏱️ {func_name} تجاوز p95 ({hedge_at - start:.2f}s) - طلب احتياطي إلى {peer}")
+                    started(peer)
+                    future = self._submit(peer, payload, deadline)
+                    hedge_futures.add(future)
+                    pending[future] = peer
+                    self._count("hedges")
+                else:
+                    self._count("hedges_skipped")
+                    hedge_at = float("inf")
+
+        for future, peer in pending.items():
+            self._abandon(future, peer, payload)
+            report(peer, False)
+        if pending:
+            self._count("timeouts")
+            self._timed_out(func_name, deadline - start)
+            raise TimeoutError(f"لم يُجب أي قرين خلال {deadline - start:.1f}s")
+        raise ConnectionError(f"فشل جميع الأقران: {last_error}")
+
+
+# مُرسِل مشترك (القياسات والميزانية على مستوى العملية)
+HEDGER = HedgedCaller()
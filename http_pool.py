@@ -0,0 +1,108 @@
+# http_pool.py
+# ============================================================
+# مجمّع اتصالات HTTP مشترك لكل حركة الأقران:
+#   • Session واحدة لكل قرين (scheme://host:port) مع keep-alive،
+#     فالمهام الصغيرة تدفع RTT فقط بدل مصافحة TCP/TLS جديدة.
+#   • حد أقصى للاتصالات المحفوظة لكل قرين: الطلبات الزائدة تفتح اتصالاً
+#     مؤقتاً يُغلق عند إعادته بدل الانتظار (انتظار بلا مهلة كان يعلّق
+#     كل طلبات القرين إن تسرّب رد متدفق لم يُغلق).
+#   • تسخين الاتصال عند اكتشاف القرين، وعدد محدود من الأقران (LRU).
+# ============================================================
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_CONNECTIONS_PER_HOST = 16   # اتصالات keep-alive محفوظة لكل قرين
+MAX_HOSTS = 256                 # عدد الأقران المحتفظ باتصالاتهم
+WARM_PATH = "/health"
+WARM_TIMEOUT = 2
+
+
+def host_key(url: str) -> str:
+    """'http://ip:port/run' أو 'ip:port' → 'http://ip:port'"""
+    if "://" not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class PeerPool:
+    """Sessions بمفتاح القرين مع keep-alive وحد اتصالات لكل قرين."""
+
+    def __init__(self, max_per_host: int = MAX_CONNECTIONS_PER_HOST, max_hosts: int = MAX_HOSTS):
+        self.max_per_host = max_per_host
+        self.max_hosts = max_hosts
+        self._sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._warmer = ThreadPoolExecutor(max_workers=4, thread_name_prefix="http-warm")
+        self._warmed = set()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # requests لا يمرّر مهلة انتظار للمجمّع، فـ pool_block=True ينتظر للأبد
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_per_host, pool_block=False)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session(self, url: str) -> requests.Session:
+        key = host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._new_session()
+                while len(self._sessions) > self.max_hosts:
+                    old_key, old = self._sessions.popitem(last=False)
+                    self._warmed.discard(old_key)
+                    old.close()
+            else:
+                self._sessions.move_to_end(key)
+        return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.session(url).get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.session(url).post(url, **kwargs)
+
+    def warm(self, peer: str, path: str = WARM_PATH):
+        """يفتح اتصالاً مع القرين في الخلفية (مرة واحدة لكل قرين)."""
+        key = host_key(peer)
+        with self._lock:
+            if key in self._warmed:
+                return
+            self._warmed.add(key)
+        self._warmer.submit(self._warm, key, path)
+
+    def _warm(self, key: str, path: str):
+        try:
+            self.get(f"{key}{path}", timeout=WARM_TIMEOUT)
+        except Exception as e:
+            logging.debug(f"⚠️ تعذّر تسخين الاتصال مع {key}: {e}")
+            with self._lock:
+                self._warmed.discard(key)
+
+    def close(self, peer: str = None):
+        """إغلاق اتصالات قرين واحد (عند مغادرته) أو الكل."""
+        with self._lock:
+            keys = [host_key(peer)] if peer else list(self._sessions)
+            for key in keys:
+                session = self._sessions.pop(key, None)
+                self._warmed.discard(key)
+                if session is not None:
+                    session.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hosts": len(self._sessions), "warmed": len(self._warmed)}
+
+
+# مجمّع مشترك لكل العملية
+POOL = PeerPool()
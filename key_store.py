@@ -0,0 +1,75 @@
+# key_store.py
+# ============================================================
+# مخزن مفاتيح محلي على القرص (‎~/.dts/keys‎ أو DTS_KEY_DIR):
+#   • المجلد بصلاحية 0o700 وكل ملف بصلاحية 0o600 (المالك فقط).
+#   • get_or_create: يقرأ المفتاح إن وُجد، وإلا يولّده مرة واحدة ويكتبه
+#     كتابة ذرّية، فلا تعيد العقدة اشتقاق المفاتيح أو توليدها عند كل تشغيل.
+# ============================================================
+
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
+
+DEFAULT_DIR = os.getenv("DTS_KEY_DIR", os.path.join(os.path.expanduser("~"), ".dts", "keys"))
+
+
+class KeyStore:
+    """ملفات مفاتيح خاصة بالمستخدم الحالي."""
+
+    def __init__(self, path: str = DEFAULT_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _ensure_dir(self) -> bool:
+        try:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            os.chmod(self.path, 0o700)
+            return True
+        except OSError as e:
+            logging.warning(f"⚠️ تعذّر تجهيز مخزن المفاتيح {self.path}: {e}")
+            return False
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self._file(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"⚠️ تعذّرت قراءة المفتاح {name}: {e}")
+            return None
+
+    def write(self, name: str, data: bytes) -> bool:
+        if not self._ensure_dir():
+            return False
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=f".{name}.")   # ينشأ بصلاحية 0o600
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self._file(name))
+            return True
+        except OSError as e:
+            logging.warning(f"⚠️ تعذّرت كتابة المفتاح {name}: {e}")
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return False
+
+    def get_or_create(self, name: str, create: Callable[[], bytes]) -> bytes:
+        """المفتاح المحفوظ، أو create() مرة واحدة ثم حفظه (يعمل بدون قرص أيضاً)."""
+        data = self.read(name)
+        if data is not None:
+            return data
+        with self._lock:
+            data = self.read(name)
+            if data is None:
+                data = create()
+                self.write(name, data)
+        return data
@@ -11,7 +11,11 @@ import base64
 import json
 from datetime import datetime
 from processor_manager import should_offload
+from offload_controller import get_thresholds
 from remote_executor import execute_remotely
+from load_sampler import get_snapshot
+from cost_model import MODEL, LOCAL, ANY_PEER, timed_call
+from task_scheduler import PRIORITY_REALTIME
 from functools import wraps
 from peer_discovery import PORT, PORT
 
@@ -49,17 +53,24 @@ def stream_offload(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         complexity = estimate_stream_complexity(func, args, kwargs)
+        choice = MODEL.choose(func.__name__, args, kwargs, cpu_load=get_snapshot().cpu)
         
-        if complexity > 70 or should_offload(complexity):
+        if (complexity > 70 * get_thresholds().complexity_scale or should_offload(complexity)) if choice is None else choice != LOCAL:
             logging.info(f"📺 إرسال مهمة البث {func.__name__} للمعالجة الموزعة")
-            return execute_remotely(func.__name__, args, kwargs)
+            start = time.time()
+            result = execute_remotely(func.__name__, args, kwargs)
+            if not (isinstance(result, str) and result.startswith("❌")):
+                MODEL.record_remote(func.__name__, ANY_PEER, args, kwargs, time.time() - start, None, result)
+            return result
         
         logging.info(f"📺 معالجة البث محلياً: {func.__name__}")
-        return func(*args, **kwargs)
+        return timed_call(func, *args, **kwargs)
+    # مهام البث تمر عبر المسار المحجوز في مُجدوِل DistributedExecutor
+    wrapper.dts_priority = PRIORITY_REALTIME
     return wrapper
 
 def estimate_stream_complexity(func, args, kwargs):
-    """تقدير تعقيد معالجة البث"""
+    """تقدير أولي لتعقيد معالجة البث - يُستخدم قبل أن يجمع cost_model قياسات للدالة"""
     if func.__name__ == "process_game_stream":
         return args[1] * args[2] / 10000  # FPS × الدقة
     elif func.__name__ == "real_time_video_enhancement":
@@ -1,13 +1,17 @@
 # load_balancer.py
-import peer_discovery, requests, time, smart_tasks, psutil, socket
+import peer_discovery, time, smart_tasks, psutil, socket
 from peer_discovery import PORT, PORT
+from rpc_client import CLIENT
+from self_node import exclude_self
+from load_gossip import VIEW, GossipSubscriber, serve_gossip
+
+# الأقران يدفعون متجهات حملهم إلى هذا المستقبِل؛ الاختيار يقرأ VIEW فقط
+GOSSIP_PORT = serve_gossip(VIEW)
+GossipSubscriber(VIEW, lambda: exclude_self(peer_discovery.PEERS), GOSSIP_PORT).start()
 
 def send(peer, func, *args, **kw):
     try:
-        r = requests.post(peer, json={"func": func,
-                                      "args": list(args),
-                                      "kwargs": kw}, timeout=12)
-        return r.json()
+        return CLIENT.call([peer], func, *args, deadline=time.time() + 12, **kw)
     except Exception as e:
         return {"error": str(e)}
 
@@ -19,7 +23,7 @@ def choose_peer():
     wan_peers = []
     
     # تصنيف الأجهزة
-    for p in list(peer_discovery.PEERS):
+    for p in exclude_self(peer_discovery.PEERS):
         ip = p.split('//')[1].split(':')[0] if '//' in p else p.split(':')[0]
         if is_local_ip(ip):
             lan_peers.append(p)
@@ -39,15 +43,8 @@ def choose_peer():
     return None
 
 def find_best_peer(peers):
-    """العثور على أفضل جهاز من قائمة معينة"""
-    best = None
-    for p in peers:
-        try:
-            cpu = requests.get(p.replace("/run", "/cpu"), timeout=2).json()["usage"]
-            best = (p, cpu) if best is None or cpu < best[1] else best
-        except: 
-            continue
-    return best[0] if best else None
+    """العثور على أفضل جهاز من قائمة معينة (من آخر حمل مدفوع، بلا طلبات شبكة)"""
+    return VIEW.choose(peers)
 
 def is_local_ip(ip):
     """فحص إذا كان IP محلي"""
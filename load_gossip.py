@@ -0,0 +1,346 @@
+# load_gossip.py
+# ============================================================
+# نشر الحمل بالدفع بدل سؤال /cpu عند كل توزيع:
+#   • كل خادم ينشر متجه حمل صغيراً: CPU والذاكرة وطول الطابور وعدد
+#     المهام الجارية، للمشتركين فقط، كل PUSH_INTERVAL أو فوراً عند
+#     تغيّر حاد (قفزة CPU أو تغيّر الطابور/الجاري).
+#   • المهتم (الموازن) يشترك عبر ‎POST /gossip/subscribe‎ بمنفذ استقبال
+#     ووسم يعرّف به القرين؛ الناشر يدفع إلى عنوان المشترك نفسه كما
+#     رآه (remote_addr) على ‎/gossip‎ فقط، فلا يُوجَّه لعناوين أخرى.
+#     الاشتراك ينتهي إن لم يُجدَّد.
+#   • المستقبِل لا يقبل دفعاً إلا لقرين اشترك فيه بنفسه، ومن عنوان ذلك
+#     القرين (remote_addr): لا يستطيع مضيف آخر الكتابة فوق حمل عقدة ما
+#     وتوجيه الاختيار.
+#   • المستقبِل يحفظ آخر متجه لكل قرين في LoadView، والاختيار يقرأ
+#     منه فقط: لا طلب شبكة في مسار التوزيع، والمتجه الأقدم من
+#     STALE_AFTER لا يُعتمد عليه إلا إن لم يوجد غيره (قرين بلا /gossip،
+#     أو مكتشف حديثاً، أو لا يصل عنوان الاستقبال) فيُختار عشوائياً بعدها.
+# ============================================================
+
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Set
+from urllib.parse import urlsplit
+
+from http_pool import POOL, host_key
+from load_sampler import get_snapshot
+from self_node import NODE_ID
+
+PUSH_INTERVAL = 1.0         # ثواني بين الدفعات الدورية
+TICK = 0.2                  # ثواني بين فحوص التغيّر الحاد
+CPU_JUMP = 0.2              # قفزة CPU (0-1) تستوجب دفعاً فورياً
+QUEUE_JUMP = 2              # تغيّر الطابور أو الجاري يستوجب دفعاً فورياً
+STALE_AFTER = 3.0           # ثواني قبل اعتبار المتجه قديماً
+SUBSCRIPTION_TTL = 30       # ثواني صلاحية الاشتراك بلا تجديد
+RENEW_EVERY = 10            # ثواني بين تجديدات المشترك
+MAX_SUBSCRIBERS = 64
+MAX_FAILURES = 3            # دفعات فاشلة متتالية قبل حذف المشترك
+PUSH_TIMEOUT = 1
+
+
+def local_vector(load_fn: Optional[Callable[[], Dict]] = None) -> Dict:
+    """متجه حمل هذه العقدة من اللقطة الجاهزة (لا يحجب).
+    load_fn() → إحصاءات worker_pool (in_flight, workers)."""
+    snap = get_snapshot()
+    stats = load_fn() if load_fn else {}
+    in_flight = stats.get("in_flight", 0)
+    workers = stats.get("workers", 1) or 1
+    return {
+        "node": NODE_ID,
+        "cpu": round(snap.cpu, 3) if snap else 0.0,
+        "mem": round(snap.mem_percent, 1) if snap else 0.0,
+        "queue": max(0, in_flight - workers),
+        "in_flight": in_flight,
+        "workers": workers,
+        "ts": time.time(),
+    }
+
+
+def load_score(vector: Dict) -> float:
+    """أقل = أخف: CPU + المهام الجارية لكل عامل."""
+    return vector.get("cpu", 0.0) + vector.get("in_flight", 0) / max(vector.get("workers", 1), 1)
+
+
+# ------------------------------------------------------------
+# جهة المستقبِل
+# ------------------------------------------------------------
+class LoadView:
+    """آخر متجه لكل قرين (بمفتاح host_key)."""
+
+    def __init__(self, stale_after: float = STALE_AFTER):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, Dict] = {}
+        self._expected: Dict[str, Set[str]] = {}    # قرين اشتركنا فيه → عناوينه
+        self.updates = 0
+        self.rejected = 0
+
+    def update(self, peer: str, vector: Dict):
+        vector = dict(vector, received=time.time())
+        with self._lock:
+            self._vectors[host_key(peer)] = vector
+            self.updates += 1
+
+    def expect(self, peer: str):
+        """يسجّل قريناً اشتركنا فيه وعناوينه، فتُقبل دفعاته منها فقط."""
+        host = urlsplit(host_key(peer)).hostname or ""
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        except OSError:
+            addresses = set()
+        addresses.add(host)
+        with self._lock:
+            self._expected[host_key(peer)] = addresses
+
+    def accepts(self, peer: str, sender: str) -> bool:
+        """هل الدفع باسم peer من العنوان sender مقبول؟"""
+        if sender.startswith("::ffff:"):
+            sender = sender[len("::ffff:"):]
+        with self._lock:
+            return sender in self._expected.get(host_key(peer), ())
+
+    def get(self, peer: str) -> Optional[Dict]:
+        """المتجه إن كان حديثاً، وإلا None."""
+        with self._lock:
+            vector = self._vectors.get(host_key(peer))
+        if vector is None or time.time() - vector["received"] > self.stale_after:
+            return None
+        return vector
+
+    def best(self, peers: Iterable[str]) -> Optional[str]:
+        """أخف قرين له متجه حديث؛ None إن لم يكن لأي منهم."""
+        scored = [(load_score(v), peer) for peer in peers for v in [self.get(peer)] if v is not None]
+        return min(scored)[1] if scored else None
+
+    def choose(self, peers: Iterable[str]) -> Optional[str]:
+        """best()، وإلا أخف متجه قديم، وإلا قرين عشوائي؛ None لقائمة فارغة فقط."""
+        peers = list(peers)
+        chosen = self.best(peers)
+        if chosen is not None:
+            return chosen
+        with self._lock:
+            stale = [(load_score(v), peer) for peer in peers
+                     for v in [self._vectors.get(host_key(peer))] if v is not None]
+        if stale:
+            return min(stale)[1]
+        return random.choice(peers) if peers else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            fresh = sum(1 for v in self._vectors.values() if now - v["received"] <= self.stale_after)
+            return {"peers": len(self._vectors), "fresh": fresh, "updates": self.updates,
+                    "rejected": self.rejected}
+
+
+def accept_push(view: LoadView, message: Dict, sender: str):
+    """جسم ‎POST /gossip‎: {"peer": الوسم، "load": المتجه}؛ sender: عنوان المرسل.
+    يرفع PermissionError إن لم نشترك في القرين أو لم يأتِ الدفع من عنوانه."""
+    peer = message["peer"]
+    if not view.accepts(peer, sender):
+        with view._lock:
+            view.rejected += 1
+        raise PermissionError(f"دفع حمل غير متوقع لـ {peer} من {sender}")
+    view.update(peer, message["load"])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            accept_push(self.server.view, json.loads(self.rfile.read(length)), self.client_address[0])
+            self.send_response(204)
+        except PermissionError:
+            self.send_response(403)
+        except (ValueError, KeyError, TypeError):
+            self.send_response(400)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_gossip(view: LoadView, port: int = 0) -> int:
+    """خادم استقبال صغير لمن ليس خادم Flask (مثل load_balancer)؛ يُرجع المنفذ."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    server.daemon_threads = True
+    server.view = view
+    threading.Thread(target=server.serve_forever, daemon=True, name="gossip-receiver").start()
+    return server.server_address[1]
+
+
+class GossipSubscriber:
+    """يجدد الاشتراك لدى كل قرين في الخلفية؛ رد الاشتراك يملأ العرض فوراً."""
+
+    def __init__(self, view: LoadView, peers_fn: Callable[[], Iterable[str]], port: int,
+                 renew_every: float = RENEW_EVERY):
+        self.view = view
+        self.peers_fn = peers_fn
+        self.port = port
+        self.renew_every = renew_every
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, daemon=True, name="gossip-subscriber").start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while True:
+            for peer in list(self.peers_fn()):
+                self.subscribe(peer)
+            if self._stop.wait(self.renew_every):
+                return
+
+    def subscribe(self, peer: str) -> bool:
+        base = host_key(peer)
+        try:
+            response = POOL.post(f"{base}/gossip/subscribe", timeout=PUSH_TIMEOUT, json={
+                "port": self.port,
+                "peer": base,
+                "ttl": SUBSCRIPTION_TTL,
+            })
+            response.raise_for_status()
+            self.view.expect(base)
+            self.view.update(base, response.json())
+            return True
+        except Exception as e:
+            logging.debug(f"⚠️ تعذّر الاشتراك في حمل {base}: {e}")
+            return False
+
+
+# ------------------------------------------------------------
+# جهة الناشر
+# ------------------------------------------------------------
+class _Subscriber:
+    def __init__(self, url: str, peer: str, ttl: float):
+        self.url = url
+        self.peer = peer
+        self.expires = time.time() + ttl
+        self.failures = 0
+        self.pending = False
+
+
+class GossipPublisher:
+    """يدفع متجه الحمل للمشتركين دورياً وعند التغيّر الحاد."""
+
+    def __init__(self, load_fn: Optional[Callable[[], Dict]] = None,
+                 interval: float = PUSH_INTERVAL, tick: float = TICK):
+        self.load_fn = load_fn
+        self.interval = interval
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, _Subscriber] = {}
+        self._sender = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gossip-push")
+        self._last: Optional[Dict] = None
+        self._last_push = 0.0
+        self._thread = None
+        self.pushes = 0
+        self.urgent = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="gossip-publisher")
+            self._thread.start()
+        return self
+
+    def vector(self) -> Dict:
+        return local_vector(self.load_fn)
+
+    def subscribe(self, host: str, port: int, peer: str, ttl: float = SUBSCRIPTION_TTL) -> Dict:
+        """يسجّل (أو يجدد) مشتركاً ويُرجع المتجه الحالي.
+        host: عنوان طالب الاشتراك كما رآه الخادم (remote_addr)، لا ما يرسله."""
+        port = int(port)
+        if not 0 < port < 65536:
+            raise ValueError("منفذ استقبال غير صالح")
+        url = f"http://{f'[{host}]' if ':' in host else host}:{port}/gossip"
+        ttl = min(float(ttl), SUBSCRIPTION_TTL)
+        with self._lock:
+            existing = self._subscribers.get(url)
+            if existing is not None:
+                existing.peer, existing.expires = peer, time.time() + ttl
+            elif len(self._subscribers) >= MAX_SUBSCRIBERS:
+                raise ValueError("تجاوز عدد المشتركين الحد")
+            else:
+                self._subscribers[url] = _Subscriber(url, peer, ttl)
+        self.start()
+        return self.vector()
+
+    def _sharp_change(self, vector: Dict) -> bool:
+        last = self._last
+        if last is None:
+            return True
+        return (abs(vector["cpu"] - last["cpu"]) >= CPU_JUMP
+                or abs(vector["queue"] - last["queue"]) >= QUEUE_JUMP
+                or abs(vector["in_flight"] - last["in_flight"]) >= QUEUE_JUMP)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.tick)
+            try:
+                with self._lock:
+                    if not self._subscribers:
+                        continue
+                vector = self.vector()
+                due = time.time() - self._last_push >= self.interval
+                if due or self._sharp_change(vector):
+                    if not due:
+                        self.urgent += 1
+                    self._push(vector)
+            except Exception as e:
+                logging.debug(f"⚠️ فشل نشر الحمل: {e}")
+
+    def _push(self, vector: Dict):
+        self._last, self._last_push = vector, time.time()
+        now = time.time()
+        with self._lock:
+            for url in [u for u, s in self._subscribers.items() if s.expires < now]:
+                del self._subscribers[url]
+            targets = [s for s in self._subscribers.values() if not s.pending]
+            for subscriber in targets:
+                subscriber.pending = True
+            self.pushes += 1
+        for subscriber in targets:
+            self._sender.submit(self._send, subscriber, vector)
+
+    def _send(self, subscriber: _Subscriber, vector: Dict):
+        try:
+            POOL.post(subscriber.url, json={"peer": subscriber.peer, "load": vector},
+                      timeout=PUSH_TIMEOUT).raise_for_status()
+            subscriber.failures = 0
+        except Exception as e:
+            subscriber.failures += 1
+            if subscriber.failures >= MAX_FAILURES:
+                logging.info(f"🔕 إلغاء اشتراك الحمل {subscriber.url}: {e}")
+                with self._lock:
+                    self._subscribers.pop(subscriber.url, None)
+        finally:
+            subscriber.pending = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "pushes": self.pushes, "urgent": self.urgent}
+
+
+# عرض مشترك للعملية (ما يصلها من الأقران)
+VIEW = LoadView()
+_PUBLISHER = None
+_START_LOCK = threading.Lock()
+
+
+def get_publisher(load_fn: Optional[Callable[[], Dict]] = None) -> GossipPublisher:
+    """ناشر العملية؛ load_fn يُمرَّر من الخادم عند أول استدعاء."""
+    global _PUBLISHER
+    if _PUBLISHER is None:
+        with _START_LOCK:
+            if _PUBLISHER is None:
+                _PUBLISHER = GossipPublisher(load_fn)
+    return _PUBLISHER
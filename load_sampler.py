@@ -0,0 +1,160 @@
+# load_sampler.py
+# ============================================================
+# عيّنة حمل مشتركة على مستوى العملية:
+#   • خيط خلفي واحد يقيس CPU / الذاكرة / الأجهزة بشكل دوري
+#     ويحتفظ بنوافذ متدحرجة (deque) للمتوسطات.
+#   • كل قرار توزيع يقرأ آخر لقطة (snapshot) جاهزة بدون أي حجب
+#     وبدون أقفال: اللقطة كائن غير قابل للتعديل يُستبدل مرجعه كاملاً.
+# ============================================================
+
+import threading
+import time
+import logging
+from collections import deque, namedtuple
+from types import MappingProxyType
+
+import psutil
+
+try:
+    import GPUtil
+except ImportError:  # GPUtil اختياري
+    GPUtil = None
+
+SAMPLE_INTERVAL = 0.5    # ثواني بين كل عيّنة
+WINDOW_SIZE = 10         # عدد العيّنات في النافذة المتدحرجة
+DEVICE_EVERY = 5         # قياس الأجهزة (GPU/القرص/الشبكة) كل N عيّنات
+
+LoadSnapshot = namedtuple(
+    "LoadSnapshot",
+    [
+        "cpu",          # آخر قياس CPU كنسبة (0.0 - 1.0)
+        "mem",          # الذاكرة المتاحة بالـ MB
+        "mem_percent",  # نسبة استخدام الذاكرة (0 - 100)
+        "avg_cpu",      # متوسط CPU على النافذة
+        "avg_mem",      # متوسط الذاكرة المتاحة على النافذة
+        "devices",      # {"GPU": (..), "STORAGE": %, "NIC": MB/s} للقراءة فقط
+        "timestamp",
+    ],
+)
+
+
+class LoadSampler:
+    """خيط قياس واحد يُحدّث لقطة الحمل المشتركة."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, window: int = WINDOW_SIZE):
+        self.interval = interval
+        self.cpu_history = deque(maxlen=window)
+        self.mem_history = deque(maxlen=window)
+        self.mem_percent_history = deque(maxlen=window)
+        self._devices = MappingProxyType({})
+        self._last_net = None
+        self._ticks = 0
+        self._snapshot = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------
+    # تشغيل / إيقاف
+    # ------------------------------------------------------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        # العيّنة الأولى حاجبة لفترة قصيرة حتى لا تكون اللقطة فارغة
+        psutil.cpu_percent(interval=0.1)
+        self._sample_once()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="load-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample_once()
+            except Exception as e:
+                logging.debug(f"⚠️ فشل أخذ عيّنة الحمل: {e}")
+
+    # ------------------------------------------------------------
+    # القياس
+    # ------------------------------------------------------------
+    def _sample_once(self):
+        cpu = psutil.cpu_percent(interval=None) / 100.0
+        vm = psutil.virtual_memory()
+        mem = vm.available / (1024 ** 2)
+
+        self.cpu_history.append(cpu)
+        self.mem_history.append(mem)
+        self.mem_percent_history.append(vm.percent)
+
+        if self._ticks % DEVICE_EVERY == 0:
+            self._devices = self._sample_devices()
+        self._ticks += 1
+
+        # استبدال المرجع عملية ذرّية؛ القرّاء لا يحتاجون قفلاً
+        self._snapshot = LoadSnapshot(
+            cpu=cpu,
+            mem=mem,
+            mem_percent=vm.percent,
+            avg_cpu=sum(self.cpu_history) / len(self.cpu_history),
+            avg_mem=sum(self.mem_history) / len(self.mem_history),
+            devices=self._devices,
+            timestamp=time.time(),
+        )
+
+    def _sample_devices(self):
+        devices = {}
+        if GPUtil is not None:
+            try:
+                devices["GPU"] = tuple(gpu.load * 100 for gpu in GPUtil.getGPUs())
+            except Exception:
+                devices["GPU"] = ()
+        try:
+            devices["STORAGE"] = psutil.disk_usage('/').percent
+        except Exception:
+            pass
+        try:
+            now = time.time()
+            sent = psutil.net_io_counters().bytes_sent
+            if self._last_net:
+                last_time, last_sent = self._last_net
+                devices["NIC"] = (sent - last_sent) / (1024 * 1024) / max(now - last_time, 1e-6)
+            self._last_net = (now, sent)
+        except Exception:
+            pass
+        return MappingProxyType(devices)
+
+    # ------------------------------------------------------------
+    # القراءة
+    # ------------------------------------------------------------
+    def snapshot(self) -> LoadSnapshot:
+        return self._snapshot
+
+
+_SAMPLER = None
+_START_LOCK = threading.Lock()
+
+
+def get_sampler() -> LoadSampler:
+    """يُرجع العيّنة المشتركة ويشغّلها عند أول استخدام."""
+    global _SAMPLER
+    if _SAMPLER is None:
+        with _START_LOCK:
+            if _SAMPLER is None:
+                _SAMPLER = LoadSampler().start()
+    return _SAMPLER
+
+
+def get_snapshot() -> LoadSnapshot:
+    """آخر لقطة حمل - لا تحجب ولا تستدعي psutil."""
+    return get_sampler().snapshot()
+
+
+if __name__ == "__main__":
+    sampler = get_sampler()
+    for _ in range(5):
+        snap = sampler.snapshot()
+        print(f"CPU: {snap.cpu:.0%} (avg {snap.avg_cpu:.0%}) | MEM: {snap.mem:.0f}MB | {dict(snap.devices)}")
+        time.sleep(1)
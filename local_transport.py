@@ -0,0 +1,316 @@
+# local_transport.py
+# ============================================================
+# نقل بين خدمات نفس الجهاز بدل TCP loopback:
+#   • التحكم عبر Unix domain socket لكل خدمة ومنفذ:
+#     ‎<tmp>/dts-<uid>/<service>-<port>.sock‎، كل رسالة: طول (8 بايت) + إطار
+#     wire_codec. المجلد والمقبس للمالك فقط (0o700 / 0o600): المتصل المحلي
+#     هو نفس المستخدم فيُعامل كموثوق، بلا توقيع ولا جلسة كما في /run.
+#   • المصفوفات والبايتات الكبيرة لا تمر في المقبس: تُنسخ مرة واحدة إلى
+#     multiprocessing.shared_memory ويُرسل اسم القطعة فقط، والمستقبِل
+#     يبني ndarray فوق الذاكرة المشتركة مباشرة (بلا نسخ).
+#   • منشئ القطعة هو من يحذفها: العميل بعد وصول الرد، والخادم بعد
+#     إشعار الاستلام (ACK) من العميل.
+#   • task_batcher يختاره تلقائياً حين يكون القرين هذا الجهاز ومقبسه موجود.
+# ============================================================
+
+import inspect
+import logging
+import os
+import socket
+import glob
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from self_node import local_addresses
+from wire_codec import decode, encode
+
+SHM_MIN = 256 * 1024           # بايت - ما دونه يُرسل داخل الإطار نفسه
+CALL_TIMEOUT = 30              # ثواني لكل استدعاء محلي
+ACK_TIMEOUT = 5                # ثواني انتظار إشعار استلام قطع الرد
+MAX_IDLE = 8                   # اتصالات خاملة محفوظة لكل مقبس
+ACK = b"\x01"
+_LENGTH = struct.Struct("<Q")
+
+
+def socket_dir() -> Optional[str]:
+    """مجلد مقابس هذا المستخدم (0o700)؛ None إن كان لمستخدم آخر أو تعذّر إنشاؤه."""
+    path = os.path.join(tempfile.gettempdir(), f"dts-{os.getuid()}")
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        if os.stat(path).st_uid != os.getuid():
+            logging.warning(f"⚠️ {path} مملوك لمستخدم آخر - لا نقل محلي")
+            return None
+        os.chmod(path, 0o700)
+    except OSError as e:
+        logging.warning(f"⚠️ تعذّر تجهيز مجلد المقابس {path}: {e}")
+        return None
+    return path
+
+
+def socket_path(service: str, port) -> Optional[str]:
+    directory = socket_dir()
+    return os.path.join(directory, f"{service}-{port}.sock") if directory else None
+
+
+# ------------------------------------------------------------
+# الذاكرة المشتركة
+# ------------------------------------------------------------
+def _share(obj, segments: List):
+    """يستبدل كل مصفوفة/بايتات كبيرة بمرجع إلى قطعة ذاكرة مشتركة جديدة."""
+    if isinstance(obj, np.ndarray) and obj.dtype != object and obj.nbytes >= SHM_MIN:
+        array = np.ascontiguousarray(obj)
+        shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        segments.append(shm)
+        shm.buf[:array.nbytes] = memoryview(array.reshape(-1).view(np.uint8))
+        return {"__shm__": shm.name, "dtype": array.dtype.str, "shape": list(array.shape)}
+    if isinstance(obj, (bytes, bytearray, memoryview)) and memoryview(obj).nbytes >= SHM_MIN:
+        data = memoryview(obj).cast("B")
+        shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+        segments.append(shm)
+        shm.buf[:data.nbytes] = data
+        return {"__shm_bytes__": shm.name, "size": data.nbytes}
+    if isinstance(obj, dict):
+        return {k: _share(v, segments) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_share(v, segments) for v in obj]
+    return obj
+
+
+class _Attached(shared_memory.SharedMemory):
+    """قطعة أنشأتها عملية أخرى، تُقرأ بلا نسخ.
+    close() يفشل بـ BufferError ما دامت مصفوفة تشير إلى buf: نتركه، فالربط
+    يبقى بعمر تلك المصفوفات ويُحرَّر تلقائياً حين تموت آخرها."""
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+def _attach(name: str) -> _Attached:
+    if sys.version_info >= (3, 13):
+        return _Attached(name=name, track=False)
+    shm = _Attached(name=name)
+    # الحذف مسؤولية المنشئ؛ لا نريد أن يحذفها متتبّع هذه العملية عند خروجها
+    resource_tracker.unregister(f"/{shm.name}", "shared_memory")
+    return shm
+
+
+def _restore(obj):
+    if isinstance(obj, dict):
+        if "__shm__" in obj:
+            shm = _attach(obj["__shm__"])
+            dtype = np.dtype(obj["dtype"])
+            count = int(np.prod(obj["shape"], dtype=np.int64))
+            array = np.frombuffer(shm.buf, dtype=dtype, count=count).reshape(obj["shape"])
+            shm.close()
+            return array
+        if "__shm_bytes__" in obj:
+            shm = _attach(obj["__shm_bytes__"])
+            data = shm.buf[:obj["size"]]
+            shm.close()
+            return data
+        return {k: _restore(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restore(v) for v in obj]
+    return obj
+
+
+def _release(segments: List):
+    for shm in segments:
+        try:
+            shm.close()
+            shm.unlink()
+        except (FileNotFoundError, BufferError) as e:
+            logging.debug(f"تعذّر تحرير {shm.name}: {e}")
+
+
+# ------------------------------------------------------------
+# الإطارات على المقبس
+# ------------------------------------------------------------
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytearray]:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return buf
+
+
+def _send_frame(sock: socket.socket, message):
+    frame = encode(message)
+    sock.sendall(_LENGTH.pack(len(frame)) + frame)
+
+
+def _recv_frame(sock: socket.socket):
+    head = _recv_exact(sock, _LENGTH.size)
+    if head is None:
+        return None
+    frame = _recv_exact(sock, _LENGTH.unpack(head)[0])
+    if frame is None:
+        raise ConnectionError("انقطع الاتصال المحلي أثناء الرسالة")
+    return decode(frame)
+
+
+# ------------------------------------------------------------
+# جهة الخادم
+# ------------------------------------------------------------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = _recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            if message is None:
+                return
+            try:
+                body, status = self.server.execute(_restore(message["task"]))
+            except Exception as e:
+                body, status = {"error": str(e)}, 500
+            if inspect.isgenerator(body.get("result")):
+                body = dict(body, result=list(body["result"]))   # لا تدفق على المقبس المحلي
+            segments = []
+            try:
+                _send_frame(self.request, {"status": status, "body": _share(body, segments),
+                                           "shared": len(segments)})
+                if segments:
+                    self.request.settimeout(ACK_TIMEOUT)
+                    self.request.recv(1)
+                    self.request.settimeout(None)
+            except OSError:
+                return
+            finally:
+                _release(segments)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, execute: Callable[[Dict], Tuple[Dict, int]]):
+        self.execute = execute
+        super().__init__(path, _Handler)
+
+
+def _stale(path: str) -> bool:
+    """مقبس متبقٍّ من عملية ميتة؟ (لا أحد يستمع عليه)"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return False
+    except OSError:
+        return True
+    finally:
+        probe.close()
+
+
+def serve_local(service: str, port, execute: Callable[[Dict], Tuple[Dict, int]]) -> Optional[str]:
+    """يشغّل خادم المقبس المحلي في خيط خلفي؛ execute(task) → (الرد، كود HTTP).
+    service: اسم الخدمة في المسار، فلا تتشارك خدمتان مقبساً واحداً."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path(service, port)
+    if path is None:
+        return None
+    if os.path.exists(path):
+        if not _stale(path):
+            logging.warning(f"⚠️ {path} مستخدم من خدمة أخرى - لا نقل محلي لهذه العملية")
+            return None
+        os.unlink(path)
+    server = _Server(path, execute)
+    os.chmod(path, 0o600)
+    threading.Thread(target=server.serve_forever, daemon=True, name="local-transport").start()
+    logging.info(f"🔗 نقل محلي عبر {path}")
+    return path
+
+
+# ------------------------------------------------------------
+# جهة العميل
+# ------------------------------------------------------------
+class LocalClient:
+    """اتصالات مقبس محلية محفوظة لكل منفذ، بنفس شكل رد /run."""
+
+    def __init__(self, timeout: float = CALL_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[socket.socket]] = {}
+        self.calls = 0
+        self.shared_bytes = 0
+
+    def path_for(self, base_url: str) -> Optional[str]:
+        """مسار المقبس إن كان القرين هذا الجهاز وخدمته تستمع محلياً، وإلا None."""
+        if not hasattr(socket, "AF_UNIX"):
+            return None
+        parts = urlsplit(base_url if "://" in base_url else f"http://{base_url}")
+        if parts.port is None:
+            return None
+        if parts.hostname not in local_addresses():
+            return None
+        directory = socket_dir()
+        if directory is None:
+            return None
+        # خدمة واحدة فقط تستمع على منفذ TCP، أياً كان اسمها
+        paths = sorted(glob.glob(os.path.join(directory, f"*-{parts.port}.sock")))
+        return paths[0] if paths else None
+
+    def _acquire(self, path: str) -> socket.socket:
+        with self._lock:
+            idle = self._idle.get(path)
+            if idle:
+                return idle.pop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        return sock
+
+    def _release(self, path: str, sock: socket.socket):
+        with self._lock:
+            idle = self._idle.setdefault(path, [])
+            if len(idle) < MAX_IDLE:
+                idle.append(sock)
+                return
+        sock.close()
+
+    def call(self, path: str, task: Dict, timeout: float = None) -> Dict:
+        """يرسل المهمة ويُرجع جسم الرد (مع "error" عند الفشل كما في /run)."""
+        segments = []
+        message = {"task": _share(task, segments)}
+        sock = self._acquire(path)
+        try:
+            sock.settimeout(timeout or self.timeout)
+            _send_frame(sock, message)
+            reply = _recv_frame(sock)
+            if reply is None:
+                raise ConnectionError("أغلق الخادم المحلي الاتصال")
+            body = _restore(reply["body"])
+            if reply.get("shared"):
+                sock.sendall(ACK)
+        except Exception:
+            sock.close()
+            raise
+        finally:
+            _release(segments)   # الخادم ربط قطعه قبل أن يرد
+        self._release(path, sock)
+        with self._lock:
+            self.calls += 1
+            self.shared_bytes += sum(shm.size for shm in segments)
+        return body
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": self.calls, "shared_bytes": self.shared_bytes}
+
+
+# عميل مشترك للعملية
+LOCAL = LocalClient()
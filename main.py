@@ -16,8 +16,12 @@ import requests
 import importlib.util
 from pathlib import Path
 from typing import Any
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
+from werkzeug.serving import WSGIRequestHandler
 from flask_cors import CORS
+from result_cache import CACHE, deterministic
+from wire_codec import encode_response
+from self_node import add_own_port, is_self
 
 # ─────────────── إعدادات المسارات ───────────────
 FILE = Path(__file__).resolve()
@@ -111,6 +115,10 @@ def get_local_ip():
 def add_peer(peer_data):
     """إضافة قرين جديد إلى النظام"""
     peer_url = f"http://{peer_data['ip']}:{peer_data['port']}/run"
+    if is_self(peer_url, peer_data.get("node_id")):
+        # العقدة نفسها: تُنفّذ المهام محلياً ولا تُحسب قريناً في الموازنة
+        PEERS_INFO[peer_url] = dict(peer_data, self=True)
+        return peer_url
     if peer_url not in PEERS:
         PEERS.add(peer_url)
         PEERS_INFO[peer_url] = peer_data
@@ -145,10 +153,13 @@ def example_task(x: int) -> int:
     """دالة مثال بديلة إذا لم تكن موجودة في your_tasks.py"""
     return x * x
 
+# بدائل بأشكال نتائج مختلفة عن smart_tasks: نسخة خاصة بها
+@deterministic("main-1")
 def matrix_multiply(size: int) -> list:
     """ضرب المصفوفات (بديل مؤقت)"""
     return [[i*j for j in range(size)] for i in range(size)]
 
+@deterministic("main-1")
 def prime_calculation(limit: int) -> list:
     """حساب الأعداد الأولية (بديل مؤقت)"""
     primes = []
@@ -157,6 +168,7 @@ def prime_calculation(limit: int) -> list:
             primes.append(num)
     return primes
 
+@deterministic("main-1")
 def data_processing(size: int) -> dict:
     """معالجة البيانات (بديل مؤقت)"""
     return {i: i**2 for i in range(size)}
@@ -174,16 +186,18 @@ def run_task():
         if not task_id:
             return jsonify(error="يجب تحديد task_id"), 400
 
+        # المهام الثابتة حتمية، فتُخدم الطلبات المتكررة من الذاكرة
         if task_id == "1":
-            result = matrix_multiply(500)
+            result = CACHE.call(matrix_multiply, 500)
         elif task_id == "2":
-            result = prime_calculation(100_000)
+            result = CACHE.call(prime_calculation, 100_000)
         elif task_id == "3":
-            result = data_processing(10_000)
+            result = CACHE.call(data_processing, 10_000)
         else:
             return jsonify(error="معرف المهمة غير صحيح"), 400
 
-        return jsonify(result=result)
+        payload, mimetype = encode_response({"result": result}, request.headers.get("Accept", ""))
+        return Response(payload, mimetype=mimetype)
 
     except Exception as e:
         logging.error(f"خطأ في معالجة المهمة: {str(e)}", exc_info=True)
@@ -192,6 +206,8 @@ def run_task():
 def start_flask_server():
     ip_public = os.getenv("PUBLIC_IP", "127.0.0.1")
     logging.info(f"Flask متوفر على: http://{ip_public}:{CPU_PORT}/run_task")
+    # HTTP/1.1 يُبقي الاتصال مفتوحاً لـ http_pool بدل إغلاقه بعد كل طلب
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     flask_app.run(host="0.0.0.0", port=CPU_PORT, debug=False)
 
 # ─────────────── دوال النظام الأساسية ───────────────
@@ -248,7 +264,8 @@ def main():
     # الاتصال بالسيرفر المركزي
     server, initial_peers = connect_until_success()
     
-    # تشغيل خادم Flask
+    # تشغيل خادم Flask على المنفذ النهائي (قد يغيّره connect_until_success)
+    add_own_port(CPU_PORT)
     threading.Thread(target=start_flask_server, daemon=True).start()
 
     # البقاء في حلقة رئيسية
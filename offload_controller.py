@@ -0,0 +1,160 @@
+# offload_controller.py
+# ============================================================
+# عتبات توزيع متكيّفة بدل الثوابت المبعثرة بين الملفات:
+#   • متحكم تغذية راجعة (تكاملي) يضبط عتبة التوزيع لكل عقدة
+#     نحو استخدام مستهدف للمعالج وزمن انتظار مستهدف للطابور.
+#   • موارد خاملة (CPU أقل من الهدف) → نرفع العتبة فنحتفظ بالمهام
+#     محلياً؛ حمل أعلى من الهدف أو طابور طويل → نخفضها فنوزّع أبكر.
+#   • عتبة الاستقبال وعتبات الأجهزة ومقياس التعقيد مشتقة من نفس الحالة،
+#     فكل الديكوراتورات تتحرك معاً.
+#   • القراءة بدون أقفال (لقطة تُستبدل كاملة) والتحديث كسول عند القراءة.
+# ============================================================
+
+import logging
+import math
+import threading
+import time
+import weakref
+from collections import namedtuple
+from typing import Callable, Dict
+
+from load_sampler import get_snapshot
+
+TARGET_UTILIZATION = 0.75    # استخدام CPU المستهدف (0.0 - 1.0)
+TARGET_QUEUE_WAIT = 0.25     # ثواني انتظار مستهدفة في الطابور المحلي
+CONTROL_INTERVAL = 2.0       # ثواني بين تحديثات المتحكم
+CPU_GAIN = 0.05              # تغيّر عتبة CPU لكل وحدة خطأ في كل تحديث
+COMPLEXITY_GAIN = 0.25       # معامل التغيّر اللوغاريتمي لمقياس التعقيد
+
+INITIAL_OFFLOAD_CPU = 0.6    # نقطة البداية = القيم الثابتة السابقة
+MIN_OFFLOAD_CPU = 0.2
+MAX_OFFLOAD_CPU = 0.95
+RECEIVE_GAP = 0.2            # فجوة (hysteresis) بين عتبتي التوزيع والاستقبال
+DEVICE_GAP = 10              # نقاط مئوية بين عتبة CPU وعتبات الأجهزة
+MIN_COMPLEXITY_SCALE = 0.1
+MAX_COMPLEXITY_SCALE = 10.0
+MIN_FREE_MEM = 2048          # MB - حد أمان ثابت، لا يُضبط آلياً
+
+Thresholds = namedtuple(
+    "Thresholds",
+    [
+        "offload_cpu",        # وزّع إذا تجاوز متوسط CPU هذه النسبة
+        "receive_cpu",        # اقبل مهام الأقران إذا كان المتوسط دونها
+        "complexity_scale",   # يُضرب في عتبة التعقيد الخاصة بكل ديكوراتور
+        "device_offload",     # نسبة مئوية لحمل GPU/الأجهزة
+        "device_receive",
+        "min_free_mem",       # MB
+    ],
+)
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+class OffloadController:
+    """يضبط عتبات التوزيع لهذه العقدة نحو الاستخدام وزمن الانتظار المستهدفين."""
+
+    def __init__(self, target_utilization: float = TARGET_UTILIZATION,
+                 target_queue_wait: float = TARGET_QUEUE_WAIT,
+                 interval: float = CONTROL_INTERVAL):
+        self.target_utilization = target_utilization
+        self.target_queue_wait = target_queue_wait
+        self.interval = interval
+        self._offload_cpu = INITIAL_OFFLOAD_CPU
+        self._complexity_scale = 1.0
+        self._queue_sources = []
+        self._lock = threading.Lock()
+        self._last_update = 0.0
+        self._last_inputs = {"avg_cpu": 0.0, "queue_wait": 0.0, "error": 0.0}
+        self._thresholds = self._build()
+
+    def watch_queue(self, expected_wait: Callable[[], float]):
+        """تسجيل مصدر لزمن انتظار الطابور (مثل TaskScheduler.expected_wait)."""
+        ref = weakref.WeakMethod(expected_wait) if hasattr(expected_wait, "__self__") else (lambda: expected_wait)
+        with self._lock:
+            self._queue_sources.append(ref)
+
+    def queue_wait(self) -> float:
+        wait = 0.0
+        for ref in list(self._queue_sources):
+            source = ref()
+            if source is None:
+                self._queue_sources.remove(ref)
+                continue
+            try:
+                wait = max(wait, source())
+            except Exception:
+                pass
+        return wait
+
+    def _build(self) -> Thresholds:
+        offload = self._offload_cpu
+        receive = max(offload - RECEIVE_GAP, 0.05)
+        return Thresholds(
+            offload_cpu=offload,
+            receive_cpu=receive,
+            complexity_scale=self._complexity_scale,
+            device_offload=min(offload * 100 + DEVICE_GAP, 100),
+            device_receive=min(max(receive * 100 - DEVICE_GAP, 5), 90),
+            min_free_mem=MIN_FREE_MEM,
+        )
+
+    def update(self):
+        """خطوة تحكم واحدة."""
+        avg_cpu = get_snapshot().avg_cpu
+        wait = self.queue_wait()
+        if wait > self.target_queue_wait:
+            # الطابور أطول من الهدف: وزّع أبكر بغض النظر عن قراءة CPU
+            error = -min(wait / self.target_queue_wait - 1.0, 1.0)
+        else:
+            # موجب = موارد خاملة → نرفع العتبة، سالب = حمل زائد → نخفضها
+            error = self.target_utilization - avg_cpu
+        self._offload_cpu = _clamp(self._offload_cpu + CPU_GAIN * error,
+                                   MIN_OFFLOAD_CPU, MAX_OFFLOAD_CPU)
+        self._complexity_scale = _clamp(self._complexity_scale * math.exp(COMPLEXITY_GAIN * error),
+                                        MIN_COMPLEXITY_SCALE, MAX_COMPLEXITY_SCALE)
+        self._last_inputs = {"avg_cpu": avg_cpu, "queue_wait": wait, "error": error}
+        self._thresholds = self._build()
+        logging.debug(f"🎛️ عتبة التوزيع {self._offload_cpu:.2f} (CPU {avg_cpu:.2f}, انتظار {wait:.2f}s)")
+
+    def thresholds(self) -> Thresholds:
+        """العتبات الحالية؛ يُحدَّث المتحكم إن مرّت CONTROL_INTERVAL منذ آخر تحديث."""
+        now = time.time()
+        if now - self._last_update >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._last_update = now
+                self.update()
+            finally:
+                self._lock.release()
+        return self._thresholds
+
+    def stats(self) -> Dict:
+        stats = dict(self._thresholds._asdict())
+        stats.update(self._last_inputs)
+        return stats
+
+
+_CONTROLLER = None
+_START_LOCK = threading.Lock()
+
+
+def get_controller() -> OffloadController:
+    """المتحكم المشترك في العملية (تستخدمه كل الديكوراتورات)."""
+    global _CONTROLLER
+    if _CONTROLLER is None:
+        with _START_LOCK:
+            if _CONTROLLER is None:
+                _CONTROLLER = OffloadController()
+    return _CONTROLLER
+
+
+def get_thresholds() -> Thresholds:
+    return get_controller().thresholds()
+
+
+if __name__ == "__main__":
+    controller = get_controller()
+    for _ in range(5):
+        print(controller.stats())
+        time.sleep(CONTROL_INTERVAL)
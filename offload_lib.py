@@ -4,12 +4,14 @@
 import time
 import math
 import random
-import psutil
-import requests
-import socket
 from functools import wraps
-from zeroconf import Zeroconf, ServiceBrowser
 import logging
+from load_sampler import get_snapshot
+from peer_table import get_peer_table, verify_peer_project, is_local_network
+from cost_model import MODEL, LOCAL, timed_call
+from rpc_client import CLIENT, make_task
+from result_cache import CACHE, cache_key, deterministic
+from offload_controller import get_thresholds
 
 # إعداد السجل
 logging.basicConfig(
@@ -17,108 +19,31 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-# إعدادات التحميل
-MAX_CPU = 0.6  # عتبة استخدام CPU فقط
+# إعدادات التحميل: عتبة التعقيد الأولية (تُضرب في مقياس offload_controller)
+BASE_COMPLEXITY = 50
 
-class PeerListener:
-    def __init__(self):
-        self.peers = []
+def discover_peers(timeout=1.5):
+    """الأجهزة المتوافقة من جدول الأقران الحيّ - أولوية LAN ثم WAN.
+    لا مسح جديد لكل استدعاء: الانتظار (حتى timeout) يحدث فقط عند أول تشغيل للجدول."""
+    table = get_peer_table()
+    table.wait_ready(timeout)
+    peers = table.snapshot()
 
-    def add_service(self, zc, type, name):
-        info = zc.get_service_info(type, name)
-        if info:
-            ip = socket.inet_ntoa(info.addresses[0])
-            self.peers.append(f"{ip}:{info.port}")
-            logging.info(f"🔗 جهاز مكتشف: {ip}:{info.port}")
+    lan = sum(1 for p in peers if p.is_lan)
+    logging.debug(f"{len(peers)} جهاز DTS متوافق - LAN: {lan}, WAN: {len(peers) - lan}")
 
-    def update_service(self, zc, type, name):
-        logging.debug(f"🔄 تم تحديث الخدمة: {name}")
-        pass  # هنا فقط لتفادي التحذير
+    return [p.address for p in peers]
 
-def discover_peers(timeout=1.5):
-    """اكتشاف الأجهزة المتاحة - أولوية LAN ثم WAN ثم الإنترنت مع فحص المشروع"""
-    import peer_discovery
-    from project_identifier import verify_project_compatibility
-
-    zc = Zeroconf()
-    listener = PeerListener()
-    ServiceBrowser(zc, "_http._tcp.local.", listener)
-    time.sleep(timeout)
-    zc.close()
-
-    lan_peers = []
-    wan_peers = []
-    internet_peers = []
-
-    for peer in listener.peers:
-        ip = peer.split(':')[0]
-        if verify_peer_project(ip):
-            if is_local_network(ip):
-                lan_peers.append(peer)
-            else:
-                wan_peers.append(peer)
-
-    all_discovered = list(peer_discovery.PEERS)
-    for peer_url in all_discovered:
-        peer_ip = peer_url.split("://")[1].split(":")[0]
-        if verify_peer_project(peer_ip):
-            if is_local_network(peer_ip):
-                if peer_url not in lan_peers:
-                    lan_peers.append(peer_url)
-            else:
-                if peer_url not in wan_peers:
-                    internet_peers.append(peer_url)
-
-    all_peers = lan_peers + wan_peers + internet_peers
-    logging.info(f"اكتُشف {len(all_peers)} جهاز DTS متوافق - LAN: {len(lan_peers)}, WAN: {len(wan_peers)}, Internet: {len(internet_peers)}")
-
-    return all_peers
-
-def verify_peer_project(ip, port=7520):
-    """فحص إذا كان الجهاز يحتوي على نفس المشروع"""
-    try:
-        from project_identifier import verify_project_compatibility
-
-        project_url = f"http://{ip}:{port}/project_info"
-        response = requests.get(project_url, timeout=2)
-
-        if response.status_code == 200:
-            remote_info = response.json()
-            return verify_project_compatibility(remote_info)
-
-    except:
-        pass
-    return False
-
-def is_local_network(ip):
-    """فحص إذا كان IP في الشبكة المحلية"""
-    try:
-        import ipaddress
-        addr = ipaddress.ip_address(ip)
-        return (
-            addr.is_private or
-            str(addr).startswith('192.168.') or
-            str(addr).startswith('10.') or
-            str(addr).startswith('172.')
-        )
-    except:
-        return False
-
-def try_offload(peer, payload, max_retries=3):
-    """محاولة إرسال المهمة إلى جهاز آخر"""
-    url = f"http://{peer}/run"
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logging.warning(f"فشل المحاولة {attempt + 1} لـ {peer}: {str(e)}")
-            time.sleep(0.5 * (attempt + 1))
-    raise ConnectionError(f"فشل جميع المحاولات لـ {peer}")
+def try_offload(peers, payload):
+    """إرسال المهمة لأفضل جهاز مع طلب احتياطي للتالي إن تجاوز p95 الدالة،
+    وانتقال فوري للتالي عند الفشل. يُرجع (الجهاز الفائز، الرد)."""
+    if isinstance(peers, str):
+        peers = [peers]
+    response = CLIENT.send(peers, payload)
+    return response.pop("peer"), response
 
 def estimate_complexity(func, args, kwargs):
-    """تقدير تعقيد المهمة"""
+    """تقدير أولي للتعقيد - يُستخدم فقط قبل أن يجمع cost_model قياسات للدالة"""
     if func.__name__ == "matrix_multiply":
         return args[0] ** 2
     elif func.__name__ == "prime_calculation":
@@ -133,32 +58,63 @@ def offload(func):
     """ديكوراتور لتوزيع المهام"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        cpu = psutil.cpu_percent(interval=0.5) / 100.0
-        mem = psutil.virtual_memory().available / (1024**2)
-        complexity = estimate_complexity(func, args, kwargs)
-
-        logging.info(f"حمل النظام - CPU: {cpu:.2f}, الذاكرة: {mem:.1f}MB, تعقيد المهمة: {complexity}")
-
-        if complexity > 50 or cpu > MAX_CPU:
-            try:
-                peers = discover_peers()
-                if peers:
-                    payload = {
-                        "func": func.__name__,
-                        "args": args,
-                        "kwargs": kwargs,
-                        "complexity": complexity
-                    }
-                    selected_peer = random.choice(peers)
-                    logging.info(f"إرسال المهمة إلى {selected_peer}")
-                    return try_offload(selected_peer, payload)
-            except Exception as e:
-                logging.error(f"خطأ في التوزيع: {str(e)}")
-
-        logging.info("تنفيذ المهمة محلياً")
-        return func(*args, **kwargs)
+        # الدوال المعلنة @deterministic تُخدم من الذاكرة مباشرة
+        key = cache_key(func, args, kwargs)
+        if key:
+            hit, value = CACHE.get(key)
+            if hit:
+                return value
+            value = _offload_call(func, args, kwargs)
+            CACHE.put_result(func, args, kwargs, value)
+            return value
+        return _offload_call(func, args, kwargs)
     return wrapper
 
+def _offload_call(func, args, kwargs):
+    """قرار التوزيع والتنفيذ الفعلي لاستدعاء واحد"""
+    snap = get_snapshot()
+    cpu = snap.cpu
+    mem = snap.mem
+    complexity = estimate_complexity(func, args, kwargs)
+
+    logging.info(f"حمل النظام - CPU: {cpu:.2f}, الذاكرة: {mem:.1f}MB, تعقيد المهمة: {complexity}")
+
+    # نموذج التكلفة يقرر متى توفرت قياسات؛ وإلا نعود للتقدير الأولي
+    choice = MODEL.choose(func.__name__, args, kwargs, MODEL.known_peers(), cpu)
+    if choice is None:
+        limits = get_thresholds()
+        go_remote = complexity > BASE_COMPLEXITY * limits.complexity_scale or cpu > limits.offload_cpu
+    else:
+        go_remote = choice != LOCAL
+
+    if go_remote:
+        try:
+            peers = list(get_peer_table().addresses())
+            if peers:
+                payload = make_task(func.__name__, args, kwargs)
+                payload["complexity"] = complexity
+                random.shuffle(peers)
+                options = MODEL.predict(func.__name__, args, kwargs, peers, cpu)
+                if options and options[0][0] == LOCAL:
+                    logging.info("نموذج التكلفة يفضّل التنفيذ المحلي")
+                    return timed_call(func, *args, **kwargs)
+                ranked = [peer for peer, _ in options if peer != LOCAL] or peers
+                logging.info(f"إرسال المهمة إلى {ranked[0]}")
+                start = time.time()
+                selected_peer, response = try_offload(ranked, payload)
+                elapsed = time.time() - start
+                if isinstance(response, dict) and "result" in response:
+                    result, took = response["result"], response.get("took")
+                else:
+                    result, took = response, None
+                MODEL.record_remote(func.__name__, selected_peer, args, kwargs, elapsed, took, result)
+                return result
+        except Exception as e:
+            logging.error(f"خطأ في التوزيع: {str(e)}")
+
+    logging.info("تنفيذ المهمة محلياً")
+    return timed_call(func, *args, **kwargs)
+
 # المهام القابلة للتوزيع:
 
 @offload
@@ -167,8 +123,10 @@ def matrix_multiply(size):
     import numpy as np
     A = np.random.rand(size, size)
     B = np.random.rand(size, size)
-    return np.dot(A, B).tolist()
+    return np.dot(A, B)
 
+# شكل نتيجة مختلف عن smart_tasks ("primes_count"): نسخة خاصة لا تتشارك معها
+@deterministic("offload_lib-1")
 @offload
 def prime_calculation(n):
     """حساب الأعداد الأولية"""
@@ -183,6 +141,7 @@ def prime_calculation(n):
             primes.append(num)
     return {"primes_count": len(primes), "primes": primes}
 
+@deterministic("offload_lib-1")
 @offload
 def data_processing(data_size):
     """معالجة بيانات كبيرة"""
@@ -6,6 +6,7 @@ import time
 import logging
 import requests
 from zeroconf import Zeroconf, ServiceInfo, ServiceBrowser
+from self_node import add_own_port, is_self
 
 # إعداد السجلات
 logging.basicConfig(level=logging.INFO)
@@ -48,6 +49,8 @@ def get_local_ip():
 
 def register_peer(ip, port):
     peer_url = f"http://{ip}:{port}/run"
+    if is_self(peer_url):
+        return   # خدمتنا المسجّلة في Zeroconf تعود إلينا في الاكتشاف
     if peer_url not in PEERS:
         PEERS.add(peer_url)
         logger.info(f"تم تسجيل قرين جديد: {peer_url}")
@@ -78,6 +81,7 @@ def main():
         server=f"{socket.gethostname()}.local."
     )
     zeroconf.register_service(info)
+    add_own_port(PORT)   # إعلاننا يعود إلينا في الاكتشاف
 
     # بدء اكتشاف الأقران
     discover_lan_peers()
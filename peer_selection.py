@@ -0,0 +1,79 @@
+# peer_selection.py
+# ============================================================
+# اختيار القرين بطريقة "قوة خيارين" (power of two choices):
+#   • قرينان عشوائيان، ويُختار الأخف منهما حسب: المهام التي أرسلناها
+#     إليه ولم تكتمل بعد (عدّنا نحن، يتحدث لحظياً) + آخر حمل أعلنه.
+#   • بخلاف مسح الكل واختيار أقل حمل مُعلن: الحمل المعلن لا يتغير إلا
+#     عند التسجيل، فكل الطلبات المتزامنة تتكدس على نفس القرين حتى
+#     التسجيل التالي؛ العشوائية والعدّ المحلي يوزّعانها.
+#   • بلا اعتماد على fastapi: يستخدمه central_manager واختبار الحمل.
+# ============================================================
+
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+LOAD_WEIGHT = 4.0           # حمل مُعلن 1.0 يعادل هذا العدد من المهام الجارية
+
+
+class PeerSelector:
+    """عدّاد المهام الجارية لكل قرين + اختيار بقوة خيارين."""
+
+    def __init__(self, load_weight: float = LOAD_WEIGHT, rng: Optional[random.Random] = None):
+        self.load_weight = load_weight
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+
+    def score(self, peer: str, load: Optional[float] = 0.0) -> float:
+        """أقل = أخف؛ من لم يعلن حمله يُعامل كعقدة فارغة."""
+        return self._in_flight.get(peer, 0) + (load or 0.0) * self.load_weight
+
+    def choose(self, loads: Dict[str, Optional[float]]) -> str:
+        """{القرين: الحمل المعلن} → القرين المختار."""
+        peers = list(loads)
+        if not peers:
+            raise ValueError("لا يوجد أقران للاختيار")
+        if len(peers) == 1:
+            return peers[0]
+        with self._lock:
+            first, second = self._rng.sample(peers, 2)
+            return min((first, second), key=lambda peer: self.score(peer, loads[peer]))
+
+    def rank(self, loads: Dict[str, Optional[float]]) -> List[str]:
+        """المختار أولاً، ثم البقية من الأخف للانتقال عند الفشل والطلب الاحتياطي."""
+        chosen = self.choose(loads)
+        with self._lock:
+            rest = sorted((peer for peer in loads if peer != chosen),
+                          key=lambda peer: self.score(peer, loads[peer]))
+        return [chosen] + rest
+
+    def acquire(self, peer: str):
+        with self._lock:
+            self._in_flight[peer] = self._in_flight.get(peer, 0) + 1
+
+    def release(self, peer: str):
+        with self._lock:
+            count = self._in_flight.get(peer, 0) - 1
+            if count > 0:
+                self._in_flight[peer] = count
+            else:
+                self._in_flight.pop(peer, None)
+
+    @contextmanager
+    def track(self, peer: str):
+        """يحسب مهمة جارية على القرين طوال الكتلة."""
+        self.acquire(peer)
+        try:
+            yield
+        finally:
+            self.release(peer)
+
+    def in_flight(self, peer: str) -> int:
+        with self._lock:
+            return self._in_flight.get(peer, 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"in_flight": dict(self._in_flight)}
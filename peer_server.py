@@ -1,38 +1,169 @@
 # peer_server.py
 
-from flask import Flask, request, jsonify  # استيراد request و jsonify مع Flask
+from flask import Flask, request, jsonify, Response, stream_with_context  # استيراد request و jsonify مع Flask
+from werkzeug.serving import WSGIRequestHandler
 import psutil
 import smart_tasks
 import time
+import json
 import socket
 import peer_discovery  # إذا كان يستخدم لاحقًا
 from peer_discovery import PORT, PORT
+from task_batcher import iter_batch, execute_batch, ndjson_lines, NDJSON
+from result_cache import CACHE, cache_key
+from result_stream import is_stream, wants_stream, stream_lines, materialize
+from wire_codec import encode_response, decode_request
+from worker_pool import get_worker_pool, Overloaded, DeadlineExceeded, Cancelled
+from compression import COMPRESSOR
+from rpc_client import task_func_name, task_deadline
+from local_transport import serve_local
+from task_dedup import DEDUP
+from self_node import add_own_port
+from load_gossip import VIEW, SUBSCRIPTION_TTL, accept_push, get_publisher
+import inspect
 
 app = Flask(__name__)  # إنشاء التطبيق
 
+def respond(body, status=200):
+    # إطار ثنائي لمن يطلبه في Accept (المصفوفات بلا tolist)، وإلا JSON
+    payload, mimetype = encode_response(body, request.headers.get("Accept", ""))
+    # ضغط فوق الحد الأدنى إن قبله العميل (العميل يرسل identity حين لا يستحق رابطه الضغط)
+    payload, headers = COMPRESSOR.response_body(payload, request.headers.get("Accept-Encoding"))
+    return Response(payload, status=status, mimetype=mimetype, headers=headers)
+
+def request_body():
+    return COMPRESSOR.decompress(request.get_data(), request.headers.get("Content-Encoding"))
+
+def read_task():
+    raw = request_body()
+    data = decode_request(request.content_type, raw)
+    return data if data is not None else json.loads(raw)
+
+@app.route("/metrics")
+def metrics():
+    return jsonify(compression=COMPRESSOR.stats(), workers=get_worker_pool().stats(), cache=CACHE.stats(),
+                   dedup=DEDUP.stats(), gossip=get_publisher(server_load).stats())
+
+@app.route("/gossip/subscribe", methods=["POST"])
+def gossip_subscribe():
+    # الموازن يشترك في متجهات الحمل بالدفع بدل سؤال /cpu عند كل توزيع
+    data = request.get_json(silent=True) or {}
+    try:
+        # الدفع لعنوان طالب الاشتراك فقط: لا يُستخدم الخادم لمراسلة عناوين أخرى
+        load = get_publisher(server_load).subscribe(request.remote_addr, data["port"], data["peer"],
+                                                    data.get("ttl", SUBSCRIPTION_TTL))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(load)
+
+@app.route("/gossip", methods=["GET", "POST"])
+def gossip():
+    if request.method == "POST":
+        # متجه حمل مدفوع من قرين اشتركت فيه هذه العقدة (ومن عنوانه فقط)
+        try:
+            accept_push(VIEW, request.get_json(), request.remote_addr)
+        except PermissionError as e:
+            return jsonify(error=str(e)), 403
+        except (KeyError, TypeError) as e:
+            return jsonify(error=str(e)), 400
+        return "", 204
+    return jsonify(load=get_publisher(server_load).vector(), view=VIEW.stats())
+
 @app.route("/cpu")
 def cpu():
-    # يعيد نسبة استخدام المعالج
-    return jsonify(usage=psutil.cpu_percent(interval=0.3))
+    # يعيد نسبة استخدام المعالج من اللقطة الجاهزة (بلا انتظار 0.3 ثانية)؛
+    # الموازنات الحديثة تشترك في /gossip بدل سؤال هذا المسار
+    return jsonify(usage=get_publisher(server_load).vector()["cpu"] * 100)
 
-@app.route("/run", methods=["POST"])
-def run():
-    data = request.get_json(force=True)
-    fn_name = data.get("func")
-    fn = getattr(smart_tasks, fn_name, None)
+def server_load():
+    # ما ينشره load_gossip: المهام الجارية والعمّال
+    return get_worker_pool().stats()
+
+def execute_task(data):
+    """تنفيذ مهمة واحدة وإرجاع (الرد، كود HTTP) - مرة واحدة لكل task_id"""
+    # الموعد يُحسب مرة عند الوصول: المكرر لا ينتظر بعده، والمنفّذ لا يمدّده
+    deadline = task_deadline(data)
+    return DEDUP.run(data.get("task_id"), lambda: _execute_task(data, deadline), deadline)
+
+def _execute_task(data, deadline):
+    fn_name = task_func_name(data)
+    fn = getattr(smart_tasks, fn_name, None) if fn_name else None
     if not fn:
-        return jsonify(error="function-not-found"), 404
+        return {"error": "function-not-found"}, 404
+    args, kwargs = data.get("args", []), data.get("kwargs", {})
+    if deadline is not None and time.time() >= deadline:
+        # المرسل تخلّى عنها: لا نبدأ عملاً لن يُقرأ
+        return {"error": "deadline-exceeded", "expired": True}, 504
+    key = cache_key(fn, args, kwargs)
+    if key:
+        hit, result = CACHE.get(key)
+        if hit:
+            return {"result": result, "host": socket.gethostname(), "took": 0.0, "cached": True}, 200
     try:
-        start = time.time()
-        result = fn(*data.get("args", []), **data.get("kwargs", {}))
-        return jsonify(
-            result=result,
-            host=socket.gethostname(),
-            took=round(time.time() - start, 3)
-        )
+        if inspect.isgeneratorfunction(fn):
+            # المهام المولِّدة تُنفَّذ في خيط الطلب لتتدفق دفعاتها مباشرة
+            start = time.time()
+            result, took = fn(*args, **kwargs), time.time() - start
+        else:
+            # باقي المهام في عامل منفصل: كل الأنوية بدل خيط واحد تحت الـ GIL
+            result, took = get_worker_pool().run("smart_tasks", fn_name, args, kwargs,
+                                                 task_id=data.get("task_id"), deadline=deadline)
+        if key and not is_stream(result):
+            CACHE.put_result(fn, args, kwargs, result)
+        return {
+            "result": result,
+            "host": socket.gethostname(),
+            "took": round(took, 3)
+        }, 200
+    except Overloaded as e:
+        return {"error": str(e), "overloaded": True}, 503
+    except DeadlineExceeded as e:
+        return {"error": str(e), "expired": True}, 504
+    except Cancelled as e:
+        return {"error": str(e), "cancelled": True}, 409
     except Exception as e:
-        return jsonify(error=str(e)), 500
+        return {"error": str(e)}, 500
+
+@app.route("/cancel/<task_id>", methods=["POST"])
+def cancel(task_id):
+    # المرسل تخلّى عن المهمة (انتهت مهلته أو فاز طلب احتياطي)
+    return jsonify(task_id=task_id, running=get_worker_pool().cancel(task_id))
+
+@app.route("/cache/<key>")
+def cache_lookup(key):
+    # يجيب الأقران عن نتيجة محسوبة مسبقاً على هذه العقدة
+    hit, result = CACHE.get(key)
+    if not hit:
+        return jsonify(error="miss"), 404
+    return respond({"result": result})
+
+@app.route("/run", methods=["POST"])
+def run():
+    body, status = execute_task(read_task())
+    if is_stream(body.get("result")):
+        # مهمة مولِّدة: كل دفعة تُرسل فور إنتاجها (chunked NDJSON)
+        if wants_stream(request.headers.get("Accept", "")):
+            return Response(stream_with_context(stream_lines(body["result"])), mimetype=NDJSON)
+        body = materialize(body)
+    return respond(body, status)
+
+@app.route("/run_batch", methods=["POST"])
+def run_batch():
+    # دفعة مهام في طلب واحد: النتائج بالترتيب، أو تدفّقاً حسب الاكتمال (NDJSON)
+    data = read_task()
+    tasks = data.get("tasks", [])
+    execute = lambda task: materialize(execute_task(task)[0])
+    if data.get("stream") or NDJSON in request.headers.get("Accept", ""):
+        return Response(stream_with_context(ndjson_lines(iter_batch(tasks, execute))), mimetype=NDJSON)
+    return respond({"results": execute_batch(tasks, execute)})
 
 if __name__ == "__main__":  # التصحيح هنا
-    app.run(host="0.0.0.0", port=PORT)
+    # HTTP/1.1 يُبقي الاتصال مفتوحاً لـ http_pool بدل إغلاقه بعد كل طلب
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    get_worker_pool().warm()
+    # الخدمات على نفس الجهاز تصل عبر مقبس Unix وذاكرة مشتركة بدل TCP
+    serve_local("peer_server", PORT, execute_task)
+    add_own_port(PORT)
+    # خيوط الطلبات تنتظر عمّال get_worker_pool فقط، فالحد الفعلي هو max_in_flight
+    app.run(host="0.0.0.0", port=PORT, threaded=True)
 
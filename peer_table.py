@@ -0,0 +1,235 @@
+# peer_table.py
+# ============================================================
+# جدول أقران حيّ طويل العمر:
+#   • نسخة Zeroconf واحدة + ServiceBrowser دائم مع معالجة حقيقية
+#     لـ add/update/remove_service.
+#   • فحص توافق المشروع (/project_info) مرة لكل جهاز مع TTL،
+#     ويجري في خيوط خلفية لا في مسار التنفيذ.
+#   • المستدعون يقرؤون لقطة غير قابلة للتعديل (tuple) بدون انتظار.
+# ============================================================
+
+import socket
+import threading
+import time
+import logging
+import ipaddress
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+from http_pool import POOL
+from self_node import is_self
+
+from zeroconf import Zeroconf, ServiceBrowser
+
+SERVICE_TYPES = ["_http._tcp.local.", "_tasknode._tcp.local."]
+VERIFY_TTL = 300          # ثواني قبل إعادة فحص توافق الجهاز
+VERIFY_FAIL_TTL = 30      # إعادة المحاولة أسرع للأجهزة التي فشل فحصها
+SYNC_INTERVAL = 5         # دمج peer_discovery.PEERS كل N ثواني
+PROJECT_PORT = 7520       # منفذ /project_info الافتراضي
+
+Peer = namedtuple("Peer", ["address", "ip", "port", "node_id", "source", "is_lan"])
+
+
+def is_local_network(ip):
+    """فحص إذا كان IP في الشبكة المحلية"""
+    try:
+        addr = ipaddress.ip_address(ip)
+        return (
+            addr.is_private or
+            str(addr).startswith('192.168.') or
+            str(addr).startswith('10.') or
+            str(addr).startswith('172.')
+        )
+    except:
+        return False
+
+
+def verify_peer_project(ip, port=PROJECT_PORT):
+    """فحص إذا كان الجهاز يحتوي على نفس المشروع"""
+    try:
+        from project_identifier import verify_project_compatibility
+
+        project_url = f"http://{ip}:{port}/project_info"
+        response = POOL.get(project_url, timeout=2)
+
+        if response.status_code == 200:
+            remote_info = response.json()
+            return verify_project_compatibility(remote_info)
+
+    except:
+        pass
+    return False
+
+
+def _address_from_url(peer_url: str) -> Tuple[str, int]:
+    """http://ip:port/run → (ip, port)"""
+    host = peer_url.split("://", 1)[-1].split("/", 1)[0]
+    ip, _, port = host.partition(":")
+    return ip, int(port or 80)
+
+
+class PeerTable:
+    """جدول الأقران المتوافقين، يُحدَّث من Zeroconf و peer_discovery."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._known: Dict[str, Peer] = {}          # كل ما اكتُشف
+        self._verified: Dict[str, Tuple[bool, float]] = {}   # ip → (متوافق؟، وقت الفحص)
+        self._pending = set()
+        self._snapshot: Tuple[Peer, ...] = ()
+        self._verifier = ThreadPoolExecutor(max_workers=4, thread_name_prefix="peer-verify")
+        self._zeroconf = None
+        self._browsers = []
+        self._created = time.time()
+
+    # ------------------------------------------------------------
+    # التشغيل
+    # ------------------------------------------------------------
+    def start(self):
+        try:
+            self._zeroconf = Zeroconf()
+            self._browsers = [ServiceBrowser(self._zeroconf, t, self) for t in SERVICE_TYPES]
+        except Exception as e:
+            logging.warning(f"⚠️ تعذّر تشغيل Zeroconf، سيُعتمد على peer_discovery فقط: {e}")
+        threading.Thread(target=self._maintenance_loop, name="peer-table", daemon=True).start()
+        return self
+
+    def close(self):
+        if self._zeroconf:
+            self._zeroconf.close()
+        self._verifier.shutdown(wait=False)
+
+    # ------------------------------------------------------------
+    # مستمع Zeroconf
+    # ------------------------------------------------------------
+    def add_service(self, zc, type_, name):
+        try:
+            info = zc.get_service_info(type_, name, timeout=3000)
+        except Exception as e:
+            logging.debug(f"⚠️ فشل جلب معلومات الخدمة {name}: {e}")
+            return
+        if not info or not info.addresses:
+            return
+        ip = socket.inet_ntoa(info.addresses[0])
+        node_id = info.properties.get(b'node_id', b'').decode() or name
+        self._add(Peer(f"{ip}:{info.port}", ip, info.port, node_id, name, is_local_network(ip)))
+        logging.info(f"🔗 جهاز مكتشف: {ip}:{info.port}")
+
+    def update_service(self, zc, type_, name):
+        self.add_service(zc, type_, name)
+
+    def remove_service(self, zc, type_, name):
+        with self._lock:
+            gone = [addr for addr, peer in self._known.items() if peer.source == name]
+            for addr in gone:
+                self._known.pop(addr, None)
+        for addr in gone:
+            POOL.close(addr)
+        if gone:
+            logging.info(f"🔌 جهاز غادر الشبكة: {', '.join(gone)}")
+            self._publish()
+
+    # ------------------------------------------------------------
+    # الإضافة والفحص
+    # ------------------------------------------------------------
+    def _add(self, peer: Peer):
+        if is_self(peer.address, peer.node_id):
+            return   # العقدة نفسها تُنفّذ محلياً، لا تُحسب قريناً
+        with self._lock:
+            self._known[peer.address] = peer
+        self._schedule_verify(peer.ip)
+        self._publish()
+
+    def _schedule_verify(self, ip: str):
+        now = time.time()
+        with self._lock:
+            ok, checked = self._verified.get(ip, (False, 0.0))
+            ttl = VERIFY_TTL if ok else VERIFY_FAIL_TTL
+            if ip in self._pending or (checked and now - checked < ttl):
+                return
+            self._pending.add(ip)
+        self._verifier.submit(self._verify, ip)
+
+    def _verify(self, ip: str):
+        ok = verify_peer_project(ip)
+        with self._lock:
+            self._verified[ip] = (ok, time.time())
+            self._pending.discard(ip)
+            peers = [peer.address for peer in self._known.values() if peer.ip == ip]
+        if ok:
+            # فتح اتصال keep-alive مسبقاً حتى لا تدفع أول مهمة ثمن المصافحة
+            for address in peers:
+                POOL.warm(address)
+        self._publish()
+
+    def _sync_static_peers(self):
+        """دمج الأقران المسجَّلين يدوياً أو عبر السيرفر المركزي في peer_discovery."""
+        try:
+            import peer_discovery
+        except Exception:
+            return
+        for peer_url in list(peer_discovery.PEERS):
+            try:
+                ip, port = _address_from_url(peer_url)
+            except ValueError:
+                continue
+            address = f"{ip}:{port}"
+            if address not in self._known:
+                self._add(Peer(address, ip, port, address, "peer_discovery", is_local_network(ip)))
+
+    def _maintenance_loop(self):
+        while True:
+            self._sync_static_peers()
+            for ip in {peer.ip for peer in list(self._known.values())}:
+                self._schedule_verify(ip)
+            time.sleep(SYNC_INTERVAL)
+
+    def _publish(self):
+        """بناء لقطة جديدة واستبدال المرجع: LAN أولاً ثم WAN."""
+        with self._lock:
+            compatible = [
+                peer for peer in self._known.values()
+                if self._verified.get(peer.ip, (False, 0.0))[0]
+            ]
+        compatible.sort(key=lambda p: (not p.is_lan, p.address))
+        self._snapshot = tuple(compatible)
+
+    # ------------------------------------------------------------
+    # القراءة
+    # ------------------------------------------------------------
+    def snapshot(self) -> Tuple[Peer, ...]:
+        """الأقران المتوافقون حالياً - بدون أي شبكة أو انتظار."""
+        return self._snapshot
+
+    def addresses(self) -> Tuple[str, ...]:
+        return tuple(peer.address for peer in self._snapshot)
+
+    def wait_ready(self, timeout: float) -> bool:
+        """انتظار اختياري خلال أول `timeout` ثانية من عمر الجدول فقط؛ بعدها لا انتظار."""
+        deadline = self._created + timeout
+        while not self._snapshot and time.time() < deadline:
+            time.sleep(0.05)
+        return bool(self._snapshot)
+
+
+_TABLE = None
+_START_LOCK = threading.Lock()
+
+
+def get_peer_table() -> PeerTable:
+    """جدول الأقران المشترك في العملية، يُشغَّل عند أول استخدام."""
+    global _TABLE
+    if _TABLE is None:
+        with _START_LOCK:
+            if _TABLE is None:
+                _TABLE = PeerTable().start()
+    return _TABLE
+
+
+if __name__ == "__main__":
+    table = get_peer_table()
+    table.wait_ready(3)
+    while True:
+        print(f"الأقران المتوافقون: {table.addresses()}")
+        time.sleep(5)
@@ -1,53 +1,58 @@
 # processor_manager.py
 
-import psutil
-from collections import deque
 import logging
+from load_sampler import get_snapshot
+from offload_controller import get_thresholds
 
 logging.basicConfig(level=logging.INFO)
 
 class ResourceMonitor:
-    def __init__(self):
-        self.cpu_history = deque(maxlen=10)
-        self.mem_history = deque(maxlen=10)
-        # حد استقبال المهمات الآن 40% CPU بدل 30%
-        self.receive_cpu_threshold = 0.40  
+    """واجهة قراءة فوق العيّنة المشتركة في load_sampler (لا تحجب)."""
 
-    def current_load(self):
-        cpu = psutil.cpu_percent(interval=0.5) / 100.0    # كنسبة (0.0 - 1.0)
-        mem = psutil.virtual_memory().available / (1024**2)  # متاح بالـ MB
+    @property
+    def receive_cpu_threshold(self):
+        # حد الاستقبال يضبطه offload_controller (يبدأ من 40%)
+        return get_thresholds().receive_cpu
 
-        self.cpu_history.append(cpu)
-        self.mem_history.append(mem)
+    def current_load(self):
+        # النوافذ المتدحرجة (آخر 10 عيّنات) تُدار في خيط load_sampler
+        snap = get_snapshot()
+        cpu = snap.cpu    # كنسبة (0.0 - 1.0)
+        mem = snap.mem    # متاح بالـ MB
 
-        avg_cpu = sum(self.cpu_history) / len(self.cpu_history)
-        avg_mem = sum(self.mem_history) / len(self.mem_history)
+        avg_cpu = snap.avg_cpu
+        avg_mem = snap.avg_mem
 
-        logging.info(f"Instant CPU: {cpu:.2%}, Instant MEM: {mem:.1f}MB")
-        logging.info(f"Avg CPU: {avg_cpu:.2%}, Avg MEM: {avg_mem:.1f}MB")
+        logging.debug(f"Instant CPU: {cpu:.2%}, Instant MEM: {mem:.1f}MB")
+        logging.debug(f"Avg CPU: {avg_cpu:.2%}, Avg MEM: {avg_mem:.1f}MB")
 
-        recommendation = "offload" if (avg_cpu > 0.5 or avg_mem < 2048) else "local"
-        can_receive = avg_cpu <= self.receive_cpu_threshold
+        limits = get_thresholds()
+        recommendation = "offload" if (avg_cpu > limits.offload_cpu or avg_mem < limits.min_free_mem) else "local"
+        can_receive = avg_cpu <= limits.receive_cpu
 
         return {
             "instant": {"cpu": cpu, "mem": mem},
-            "average": {"cpu": avg_cpu, "mem": avg_mem},
+            "average": {"cpu": avg_cpu, "mem": avg_mem, "mem_percent": snap.mem_percent},
             "recommendation": recommendation,
             "can_receive": can_receive
         }
 
+# مراقب واحد مشترك بدل إنشاء واحد جديد مع كل قرار
+_MONITOR = ResourceMonitor()
+
 def trigger_offload():
     """عملية توزيع المهام التجريبية"""
     print("⚠️ تم استدعاء توزيع المهام (اختباري)")
 
 def should_offload(task_complexity=0):
-    monitor = ResourceMonitor()
-    status = monitor.current_load()
+    status = _MONITOR.current_load()
 
     avg_cpu = status['average']['cpu']
     avg_mem = status['average']['mem']
+    limits = get_thresholds()
 
-    if avg_cpu > 0.6 or avg_mem < 2048 or task_complexity > 75:
+    if (avg_cpu > limits.offload_cpu or avg_mem < limits.min_free_mem
+            or task_complexity > 75 * limits.complexity_scale):
         trigger_offload()
         return True
 
@@ -56,9 +61,9 @@ def should_offload(task_complexity=0):
 def can_receive_task():
     """
     يعيد True إذا كان بالإمكان استقبال مهمة جديدة،
-    أي عندما يكون متوسط استهلاك الـ CPU ≤ 40%.
+    أي عندما يكون متوسط استهلاك الـ CPU ≤ عتبة الاستقبال المتكيّفة.
     """
-    return ResourceMonitor().current_load()["can_receive"]
+    return _MONITOR.current_load()["can_receive"]
 
 if __name__ == "__main__":
     status = ResourceMonitor().current_load()
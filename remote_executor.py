@@ -5,14 +5,14 @@
 # يستخدم قائمة الأقران المكتشفة لاختيار الـ endpoint بدل IP ثابت.
 # ============================================================
 
-import requests
-import json
 import os
 from typing import Any
 
 # قائمة الأقران (URLs) المستخرجة من peer_discovery
 from peer_discovery import PEERS
 from peer_discovery import PORT, PORT
+from rpc_client import CLIENT, RpcClient, SecureTransport, make_task
+from self_node import exclude_self
 
 # عنوان افتراضي احتياطي (يمكن تغييره بمتغير بيئي REMOTE_SERVER)
 FALLBACK_SERVER = os.getenv(
@@ -25,9 +25,12 @@ try:
     from security_layer import SecurityManager
     security = SecurityManager(os.getenv("SHARED_SECRET", "my_shared_secret_123"))
     SECURITY_ENABLED = True
+    # المهام الموقّعة المشفّرة لا تُجمَّع في دفعات؛ نقل مستقل بنفس العميل
+    _client = RpcClient(SecureTransport(security, timeout=15))
 except ImportError:
     security = None
     SECURITY_ENABLED = False
+    _client = CLIENT
 
 
 def _choose_remote_server() -> str:
@@ -41,65 +44,37 @@ def _choose_remote_server() -> str:
     if env_url:
         return env_url.rstrip('/') + '/run'
     # PEERS يحوي عناوين كاملة من نوع http://ip:port/run
-    if PEERS:
+    # (العقدة نفسها ليست سيرفراً بعيداً)
+    remote = exclude_self(PEERS)
+    if remote:
         # نختار الحد الأدنى من التحميل (اختياري) أو أول عنصر
         # هنا ببساطة نأخذ أول URL
-        return next(iter(PEERS))
+        return remote[0]
     # استخدام الافتراضي
     return FALLBACK_SERVER.rstrip('/') + '/run'
 
 
+def _ranked_servers() -> list[str]:
+    """السيرفر المختار أولاً، ثم بقية الأقران والاحتياطي للانتقال عند الفشل."""
+    ranked = [_choose_remote_server()]
+    for url in exclude_self(PEERS) + [FALLBACK_SERVER.rstrip('/') + '/run']:
+        if url not in ranked:
+            ranked.append(url)
+    return ranked
+
+
 def execute_remotely(
     func_name: str,
     args: list[Any] | None = None,
     kwargs: dict[str, Any] | None = None
 ) -> Any:
     """إرسال استدعاء دالة إلى الخادم البعيد وإرجاع النتيجة."""
-    if args is None:
-        args = []
-    if kwargs is None:
-        kwargs = {}
-
-    task = {
-        "func": func_name,
-        "args": args,
-        "kwargs": kwargs,
-        "sender_id": "client_node"
-    }
-
-    # اختيار السيرفر الصحيح ديناميكياً
-    target_url = _choose_remote_server()
+    task = make_task(func_name, args or [], kwargs or {})
+    servers = _ranked_servers()
 
     try:
-        if SECURITY_ENABLED:
-            # 1) وقّع المهمة ثم شفّرها
-            signed_task = security.sign_task(task)
-            encrypted   = security.encrypt_data(json.dumps(signed_task).encode())
-
-            headers = {
-                "X-Signature": security.signature_hex,
-                "Content-Type": "application/octet-stream"
-            }
-            payload = encrypted  # خام ثنائي
-            resp = requests.post(
-                target_url,
-                headers=headers,
-                data=payload,
-                timeout=15
-            )
-        else:
-            # وضع التطوير: أرسل JSON صريح
-            headers = {"Content-Type": "application/json"}
-            resp = requests.post(
-                target_url,
-                headers=headers,
-                json=task,
-                timeout=15
-            )
-
-        resp.raise_for_status()
-        data = resp.json()
+        data = _client.send(servers, task)
         return data.get("result", "⚠️ لا يوجد نتيجة")
 
     except Exception as e:
-        return f"❌ فشل التنفيذ البعيد على {target_url}: {e}"
+        return f"❌ فشل التنفيذ البعيد على {servers[0]}: {e}"
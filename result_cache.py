@@ -0,0 +1,167 @@
+# result_cache.py
+# ============================================================
+# ذاكرة نتائج معنونة بالمحتوى:
+#   • المفتاح = SHA-256 لـ (اسم الدالة على السلك "func"، نسختها، الوسائط):
+#     نفس الاسم الذي يُرسل للأقران، فالعميل (your_tasks / offload_lib) والخادم
+#     (smart_tasks) يصلان لنفس المفتاح. النسخة إلزامية وصريحة: التطبيقات
+#     المتطابقة تعلن نفس النسخة، وما يُرجع شكلاً مختلفاً يعلن نسخة أخرى.
+#   • LRU بحد أقصى للعناصر + TTL لكل عنصر.
+#   • التخزين اختياري لكل دالة عبر @deterministic (للدوال الحتمية فقط).
+#   • الأقران يجيبون على /cache/<key> فتخدم النتيجة المحسوبة على
+#     عقدة واحدة الشبكة كلها.
+# ============================================================
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from http_pool import POOL
+from task_batcher import peer_base_url
+from wire_codec import ACCEPT, read_response
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 600           # ثواني
+PEER_LOOKUP_TIMEOUT = 0.3   # مهلة سؤال الأقران عن مفتاح
+
+# {هوية الدالة: (اسمها على السلك، النسخة، TTL)} للدوال المسموح تخزين نتائجها
+_DETERMINISTIC: Dict[str, Tuple[str, str, Optional[float]]] = {}
+
+
+def func_identity(func: Union[Callable, str]) -> str:
+    """'module.qualname' (اسم الملف بدل __main__ للسكربتات)؛ النص يُرجع كما هو.
+    يميّز الدوال المسجَّلة محلياً فقط؛ المفتاح نفسه من الاسم على السلك."""
+    if isinstance(func, str):
+        return func
+    module = func.__module__
+    if module == "__main__":
+        main_file = getattr(sys.modules["__main__"], "__file__", None)
+        if main_file:
+            module = os.path.splitext(os.path.basename(main_file))[0]
+    return f"{module}.{func.__qualname__}"
+
+
+def deterministic(version: str, ttl: Optional[float] = None):
+    """ديكوراتور: يعلن أن الدالة حتمية فيُسمح بتخزين نتائجها.
+    version: تتشارك النتائج عبر العقد الدوالُ بنفس الاسم ونفس version فقط؛
+    غيّرها عند تغيير منطق الدالة أو شكل نتيجتها لإبطال النتائج القديمة."""
+    def mark(func):
+        _DETERMINISTIC[func_identity(func)] = (func.__name__, str(version), ttl)
+        return func
+    return mark
+
+
+def is_cacheable(func: Union[Callable, str]) -> bool:
+    return func_identity(func) in _DETERMINISTIC
+
+
+def cache_key(func: Union[Callable, str], args=(), kwargs=None) -> Optional[str]:
+    """مفتاح المحتوى، أو None إن لم تكن الدالة حتمية أو تعذّر ترميز الوسائط.
+    func: الدالة نفسها أو هويتها (func_identity)."""
+    entry = _DETERMINISTIC.get(func_identity(func))
+    if entry is None:
+        return None
+    name, version, _ = entry
+    try:
+        canonical = json.dumps([name, version, list(args), kwargs or {}],
+                               sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """LRU محدود الحجم مع TTL، آمن للخيوط."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def put_result(self, func: Union[Callable, str], args, kwargs, value: Any):
+        key = cache_key(func, args, kwargs)
+        if key:
+            self.put(key, value, _DETERMINISTIC[func_identity(func)][2])
+
+    def call(self, func, *args, **kwargs):
+        """تنفيذ مع ذاكرة: يُرجع النتيجة المخزنة إن وُجدت، وإلا يحسبها ويخزنها."""
+        key = cache_key(func, args, kwargs)
+        if key:
+            hit, value = self.get(key)
+            if hit:
+                return value
+        value = func(*args, **kwargs)
+        if key:
+            self.put(key, value, _DETERMINISTIC[func_identity(func)][2])
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = len(self._data)
+        return {"entries": size, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ------------------------------------------------------------
+# البحث لدى الأقران
+# ------------------------------------------------------------
+_LOOKUP_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cache-lookup")
+
+
+def _ask_peer(peer: str, key: str):
+    response = POOL.get(f"{peer_base_url(peer)}/cache/{key}", timeout=PEER_LOOKUP_TIMEOUT,
+                        headers={"Accept": ACCEPT})
+    if response.status_code == 200:
+        return True, read_response(response).get("result")
+    return False, None
+
+
+def lookup_peers(key: str, peers: Iterable[str]) -> Tuple[bool, Any]:
+    """يسأل الأقران بالتوازي ويُرجع أول إصابة."""
+    futures = [_LOOKUP_POOL.submit(_ask_peer, peer, key) for peer in peers]
+    try:
+        for future in as_completed(futures, timeout=PEER_LOOKUP_TIMEOUT * 2):
+            try:
+                hit, value = future.result()
+            except Exception:
+                continue
+            if hit:
+                return True, value
+    except Exception:
+        pass
+    return False, None
+
+
+# ذاكرة مشتركة للعملية (يستخدمها خادم الأقران لإجابة /cache/<key>)
+CACHE = ResultCache()
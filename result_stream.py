@@ -0,0 +1,121 @@
+# result_stream.py
+# ============================================================
+# نتائج متدفقة للمهام ذات المخرجات الكبيرة:
+#   • المهمة المولِّدة (generator) تُرجع نتيجتها على دفعات (chunks).
+#   • الخادم يرسل كل دفعة سطراً NDJSON فور إنتاجها عبر
+#     Transfer-Encoding: chunked، ثم سطراً ختامياً {"done": true, ...}.
+#   • العميل مكرِّر (iterator) يُرجع كل دفعة فور وصولها، فلا يحتفظ
+#     أي طرف بالنتيجة كاملة، وأول نتيجة تصل مبكراً مهما كبر n.
+# ============================================================
+
+import inspect
+import json
+import time
+from typing import Dict, Iterator
+
+from http_pool import POOL
+from rpc_client import make_task
+from task_batcher import peer_base_url, NDJSON
+from wire_codec import dumps_json, json_default
+
+STREAM_TIMEOUT = 30        # ثواني انتظار بين دفعتين متتاليتين
+
+
+class StreamError(Exception):
+    """خطأ أعاده القرين أثناء التدفق."""
+
+
+# ------------------------------------------------------------
+# جهة الخادم
+# ------------------------------------------------------------
+def is_stream(result) -> bool:
+    return inspect.isgenerator(result)
+
+
+def wants_stream(accept_header: str) -> bool:
+    return NDJSON in (accept_header or "")
+
+
+def stream_lines(chunks: Iterator) -> Iterator[str]:
+    """سطر NDJSON لكل دفعة، ثم سطر ختامي بعددها وزمن التنفيذ أو بالخطأ."""
+    started = time.time()
+    count = 0
+    try:
+        for chunk in chunks:
+            yield json.dumps({"chunk": chunk}, default=json_default) + "\n"
+            count += 1
+    except Exception as e:
+        yield json.dumps({"error": str(e), "chunks": count}) + "\n"
+        return
+    yield json.dumps({"done": True, "chunks": count, "took": round(time.time() - started, 3)}) + "\n"
+
+
+def materialize(body: Dict) -> Dict:
+    """للعملاء الذين لا يطلبون التدفق (أو داخل الدفعات): قائمة الدفعات كاملة."""
+    if is_stream(body.get("result")):
+        body = dict(body, result=list(body["result"]))
+    return body
+
+
+# ------------------------------------------------------------
+# جهة العميل
+# ------------------------------------------------------------
+class ResultStream:
+    """مكرِّر على دفعات نتيجة مهمة بعيدة؛ took و done تُملآن عند وصول السطر الختامي.
+    body: رد كامل (مهمة عادية أو قرين قديم) يُكرَّر بنفس الواجهة."""
+
+    def __init__(self, response=None, body: Dict = None):
+        self._response = response
+        self._body = body
+        self.chunks = 0
+        self.took = None
+        self.done = False
+
+    def __iter__(self):
+        if self._response is None:
+            result = self._body.get("result")
+            for chunk in result if isinstance(result, list) else [result]:
+                self.chunks += 1
+                yield chunk
+            self.took = self._body.get("took")
+            self.done = True
+            return
+        try:
+            for line in self._response.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if "chunk" in item:
+                    self.chunks += 1
+                    yield item["chunk"]
+                elif "error" in item:
+                    raise StreamError(item["error"])
+                elif item.get("done"):
+                    self.took = item.get("took")
+                    self.done = True
+                    return
+            raise StreamError("انقطع التدفق قبل السطر الختامي")
+        finally:
+            self._response.close()
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+
+
+def stream_task(peer: str, func_name: str, *args, timeout: float = STREAM_TIMEOUT, **kwargs) -> ResultStream:
+    """يرسل مهمة مولِّدة إلى القرين ويُرجع مكرِّراً على دفعاتها."""
+    payload = make_task(func_name, args, kwargs)
+    response = POOL.post(
+        f"{peer_base_url(peer)}/run",
+        data=dumps_json(payload),
+        headers={"Content-Type": "application/json", "Accept": NDJSON},
+        timeout=timeout,
+        stream=True,
+    )
+    if response.ok and response.headers.get("Content-Type", "").startswith(NDJSON):
+        return ResultStream(response)
+    # خطأ، أو مهمة عادية أو قرين قديم: الرد كامل في وثيقة واحدة
+    with response:
+        response.raise_for_status()
+        return ResultStream(body=response.json())
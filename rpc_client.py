@@ -0,0 +1,315 @@
+# rpc_client.py
+# ============================================================
+# عميل RPC موحّد لكل مرسلات المهام:
+#   • مغلّف مهمة واحد: {"func", "args", "kwargs", "task_id", "sender_id", "budget"}
+#     (الخوادم تقبل "function" القديمة أيضاً). task_id إلزامي وثابت عبر
+#     كل المحاولات، فيزيل الخادم تكرارها (task_dedup).
+#   • مهلة مبنية على موعد نهائي مطلق للاستدعاء كله، لا مهلة ثابتة لكل محاولة.
+#     يُرسل في المغلّف كمدة متبقية ("budget" بالثواني، تُحسب عند كل إرسال)
+#     لا كزمن مطلق: ساعات الأجهزة غير متزامنة. القرين يحوّلها لزمن مطلق
+#     بساعته لحظة الوصول، فلا يبدأ مهمة انتهى وقتها ويقطعها إن تجاوزته.
+#   • إعادة المحاولة تنتقل للقرين التالي في الترتيب (مع طلب احتياطي
+#     عبر hedging) بدل تكرار نفس القرين.
+#   • قاطع دائرة لكل قرين: بعد فشل متتالٍ يُستبعد القرين فترة تهدئة،
+#     ثم يُسمح بطلب تجريبي واحد.
+#   • القرين الذي هو هذه العقدة (self_node) لا يُرسل إليه شيء: إن كان
+#     الأول في الترتيب نُفِّذت المهمة هنا، وإلا حُذف من قائمة الانتقال.
+# ============================================================
+
+import inspect
+import logging
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from hedging import HedgedCaller, HEDGER
+from http_pool import POOL
+from self_node import is_self
+from task_batcher import BATCHER, peer_base_url
+from wire_codec import ACCEPT, BINARY, JSON, decode_request, encode_request, read_response
+
+FAILURE_THRESHOLD = 3       # فشل متتالٍ قبل فتح الدائرة
+OPEN_SECONDS = 10           # تهدئة أولى؛ تتضاعف مع كل فشل للطلب التجريبي
+MAX_OPEN_SECONDS = 300
+
+
+class RpcError(Exception):
+    """فشل تنفيذ المهمة على كل الأقران المتاحين."""
+
+
+class CircuitOpen(RpcError):
+    """كل الأقران المرشحين في فترة تهدئة."""
+
+
+# ------------------------------------------------------------
+# المغلّف
+# ------------------------------------------------------------
+def make_task(func_name: str, args=(), kwargs=None, task_id: str = None, sender_id: str = None,
+              deadline: float = None) -> Dict:
+    task = {
+        "func": func_name,
+        "args": list(args),
+        "kwargs": kwargs or {},
+        "task_id": task_id or uuid.uuid4().hex,
+        "sender_id": sender_id or "client_node",
+    }
+    if deadline is not None:
+        task["deadline"] = deadline
+    return task
+
+
+def task_func_name(data: Dict) -> Optional[str]:
+    """للخوادم: اسم الدالة من المغلّف ("func"، أو "function" من العملاء القدامى)."""
+    return data.get("func") or data.get("function")
+
+
+def task_deadline(data: Dict) -> Optional[float]:
+    """للخوادم: الموعد النهائي المطلق بساعة هذا الجهاز، يُستدعى عند الوصول.
+    "budget" مدة متبقية؛ "deadline" المطلق من العملاء القدامى؛ None لمن لا يرسل أياً منهما."""
+    try:
+        if "budget" in data:
+            return time.time() + float(data["budget"])
+        return float(data["deadline"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# ------------------------------------------------------------
+# قاطع الدائرة
+# ------------------------------------------------------------
+class _Circuit:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = OPEN_SECONDS
+        self.probing = False
+
+
+class CircuitBreaker:
+    """حالة كل قرين: مغلقة (طبيعي)، مفتوحة (مستبعد)، نصف مفتوحة (طلب تجريبي واحد)."""
+
+    def __init__(self, threshold: int = FAILURE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+
+    def allow(self, peer: str) -> bool:
+        now = time.time()
+        with self._lock:
+            c = self._circuits.get(peer_base_url(peer))
+            if c is None or c.failures < self.threshold:
+                return True
+            if now < c.open_until or c.probing:
+                return False
+            c.probing = True       # نصف مفتوحة: هذا الطلب هو التجربة
+            return True
+
+    def record(self, peer: str, ok: bool):
+        key = peer_base_url(peer)
+        with self._lock:
+            c = self._circuits.setdefault(key, _Circuit())
+            if ok:
+                self._circuits.pop(key, None)
+                return
+            was_probe = c.probing
+            c.probing = False
+            c.failures += 1
+            if c.failures >= self.threshold:
+                if was_probe:
+                    c.cooldown = min(c.cooldown * 2, MAX_OPEN_SECONDS)
+                c.open_until = time.time() + c.cooldown
+                logging.warning(f"🔌 دائرة {key} مفتوحة لمدة {c.cooldown}s")
+
+    def release(self, peer: str):
+        """القرين سُمح له بطلب تجريبي لكن لم يُرسل إليه شيء فعلاً."""
+        with self._lock:
+            c = self._circuits.get(peer_base_url(peer))
+            if c is not None:
+                c.probing = False
+
+    def filter(self, peers: Iterable[str]) -> List[str]:
+        return [peer for peer in peers if self.allow(peer)]
+
+    def state(self) -> Dict[str, Dict]:
+        now = time.time()
+        with self._lock:
+            return {
+                key: {"failures": c.failures, "open_for": max(c.open_until - now, 0.0)}
+                for key, c in self._circuits.items()
+            }
+
+
+# ------------------------------------------------------------
+# نقل مشفّر (بدون تجميع): نفس واجهة BATCHER.submit
+# ------------------------------------------------------------
+class SecureTransport:
+    """يختم المهمة بمفتاح جلسة مع القرين (مصافحة /handshake مرة لكل جلسة)
+    ويرسلها إلى /run تدفقاً مشفّراً (stream_aead)، ويفك الرد بنفس الطريقة."""
+
+    def __init__(self, security, timeout: float = 60):
+        self.security = security
+        self.timeout = timeout
+        self._sender = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rpc-secure")
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, object] = {}
+        self._handshake_locks: Dict[str, threading.Lock] = {}
+
+    def _session(self, base: str):
+        session = self._sessions.get(base)
+        if session is not None and not session.expired:
+            return session
+        with self._lock:
+            lock = self._handshake_locks.setdefault(base, threading.Lock())
+        with lock:   # مصافحة واحدة لكل قرين مهما كثرت الطلبات المتزامنة
+            session = self._sessions.get(base)
+            if session is None or session.expired:
+                ephemeral, hello = self.security.start_handshake()
+                response = POOL.post(f"{base}/handshake", json=hello, timeout=self.timeout)
+                response.raise_for_status()
+                session = self.security.finish_handshake(ephemeral, response.json())
+                self._sessions[base] = session
+            return session
+
+    def _post(self, base: str, body: bytes):
+        from security_layer import KEY_ID_HEADER, TIME_HEADER, SEALED
+
+        session = self._session(base)
+        timestamp = str(time.time())
+        # الجسم يُختم دفعة بدفعة أثناء إرساله (chunked)، والرد يُقرأ متدفقاً
+        response = POOL.post(f"{base}/run", data=session.seal_stream([body], timestamp),
+                             timeout=self.timeout, stream=True, headers={
+            "Content-Type": SEALED,
+            KEY_ID_HEADER: session.key_id,
+            TIME_HEADER: timestamp,
+            "Accept": ACCEPT,
+        })
+        return session, response
+
+    @staticmethod
+    def _read(session, response):
+        from security_layer import INNER_TYPE_HEADER, TIME_HEADER, SEALED
+        from stream_aead import CHUNK_SIZE
+
+        if not response.headers.get("Content-Type", "").startswith(SEALED):
+            return read_response(response)
+        mimetype = response.headers.get(INNER_TYPE_HEADER, JSON)
+        # يُفك دفعة بدفعة، لكن JSON وDTS1 يحتاجان النص الصريح كاملاً للفك
+        opened = bytearray()
+        for chunk in session.open_stream(response.iter_content(CHUNK_SIZE),
+                                         response.headers.get(TIME_HEADER, ""), f"response|{mimetype}"):
+            opened += chunk
+        return decode_request(BINARY if mimetype.startswith(BINARY) else JSON, opened)
+
+    def submit(self, peer: str, payload: Dict) -> Future:
+        future = Future()
+
+        def send():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                base = peer_base_url(peer)
+                body, _ = encode_request(payload)
+                session, response = self._post(base, body)
+                if response.status_code == 401:
+                    # القرين أُعيد تشغيله ونسي الجلسة: مصافحة جديدة ومحاولة واحدة
+                    response.close()
+                    self._sessions.pop(base, None)
+                    session, response = self._post(base, body)
+                with response:
+                    response.raise_for_status()
+                    future.set_result(self._read(session, response))
+            except Exception as e:
+                future.set_exception(e)
+
+        self._sender.submit(send)
+        return future
+
+
+# ------------------------------------------------------------
+# العميل
+# ------------------------------------------------------------
+class RpcClient:
+    """نقطة إرسال واحدة: ترتيب الأقران → قاطع الدائرة → طلب مع احتياطي وانتقال."""
+
+    def __init__(self, transport=BATCHER, breaker: CircuitBreaker = None, hedger: HedgedCaller = None):
+        self.breaker = breaker or CircuitBreaker()
+        self.hedger = hedger or HedgedCaller(transport)
+
+    def send(self, peers: Iterable[str], task: Dict, deadline: float = None, tracker=None) -> Dict:
+        """يرسل مغلّفاً جاهزاً لأول قرين متاح في الترتيب.
+        deadline: زمن مطلق (time.time()) للاستدعاء كله؛ None = موعد المغلّف أو مهلة
+        من زمن الدالة المرصود. يُرسل للقرين كمدة متبقية ليتوقف عنده أيضاً.
+        tracker: كائن acquire(peer)/release(peer) (مثل PeerSelector) يُحسب عليه
+        كل قرين أُرسل إليه فعلاً (بما فيه الاحتياطي والانتقال) حتى يجيب أو يفشل أو يُلغى.
+        يُرجع رد /run مضافاً إليه "peer"."""
+        peers = list(peers)
+        if not peers:
+            raise RpcError("لا يوجد أقران لإرسال المهمة")
+        if not task.get("task_id"):
+            # المعرّف الثابت هو ما يجعل الاحتياطي وإعادة المحاولة لا يُحسبان مرتين
+            raise ValueError("مغلّف بلا task_id - استخدم make_task")
+        if is_self(peers[0]):
+            return self._run_here(peers[0], task)
+        peers = [peer for peer in peers if not is_self(peer)]
+        if deadline is None:
+            deadline = task.get("deadline") or time.time() + self.hedger.timeout_for(task_func_name(task))
+        timeout = deadline - time.time()
+        if timeout <= 0:
+            raise TimeoutError("انتهى الموعد النهائي قبل الإرسال")
+        # الموعد المطلق بساعتنا لا يغادر العملية: HEDGER يختم "budget" عند كل إرسال
+        task = {key: value for key, value in task.items() if key != "deadline"}
+        allowed = self.breaker.filter(peers)
+        if not allowed:
+            raise CircuitOpen(f"كل الأقران ({len(peers)}) في فترة تهدئة")
+        reported, active = set(), []
+
+        def on_outcome(peer, ok):
+            reported.add(peer)
+            self.breaker.record(peer, ok)
+            if peer in active:
+                active.remove(peer)
+                tracker.release(peer)
+
+        def on_start(peer):
+            if tracker is not None:
+                active.append(peer)
+                tracker.acquire(peer)
+
+        try:
+            peer, response = self.hedger.call(allowed, task, task_func_name(task), timeout,
+                                              on_outcome=on_outcome, on_start=on_start)
+        except (TimeoutError, RpcError):
+            raise
+        except Exception as e:
+            raise RpcError(str(e)) from e
+        finally:
+            for peer in set(allowed) - reported:
+                self.breaker.release(peer)
+            for peer in active:   # طلبات خاسرة أُلغيت بعد فوز غيرها
+                tracker.release(peer)
+        return dict(response, peer=peer)
+
+    def _run_here(self, peer: str, task: Dict) -> Dict:
+        """المهمة موجهة لهذه العقدة: تُنفَّذ في العملية بلا تسلسل ولا شبكة."""
+        import smart_tasks
+
+        func_name = task_func_name(task)
+        fn = getattr(smart_tasks, func_name, None) if func_name else None
+        if fn is None:
+            raise RpcError(f"الدالة غير موجودة: {func_name}")
+        start = time.time()
+        result = fn(*task.get("args", []), **task.get("kwargs", {}))
+        if inspect.isgenerator(result):
+            result = list(result)
+        return {"result": result, "host": socket.gethostname(),
+                "took": round(time.time() - start, 3), "peer": peer}
+
+    def call(self, peers: Iterable[str], func_name: str, *args, deadline: float = None, **kwargs) -> Dict:
+        return self.send(peers, make_task(func_name, args, kwargs), deadline)
+
+
+# عميل مشترك عبر المجمّع (المهام الصغيرة المتزامنة تُرسل دفعة واحدة)
+CLIENT = RpcClient(hedger=HEDGER)
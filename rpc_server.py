@@ -3,13 +3,30 @@
 # خادِم يستقبل مهام عن بُعد:
 #   • إن وصلته بيانات خام (Encrypted) في Body → يفك تشفيرها ويتحقق من التوقيع.
 #   • وإلا إن وصل JSON خام في Content‑Type: application/json → ينفّذ مباشرة (وضع تطويـر).
+#   • تدفق مختوم (application/x-dts-sealed) → يُفك دفعة بدفعة من request.stream،
+#     ورده يُختم ويُرسل متدفقاً بنفس المفتاح (جلسة أو سر مشترك).
 # ============================================================
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from werkzeug.serving import WSGIRequestHandler
 import smart_tasks  # «your_tasks» تمّ استيراده تحت هذا الاسم فى main.py
-import logging, json
-from security_layer import SecurityManager
+import logging, json, time
+from security_layer import (SecurityManager, HandshakeError, KEY_ID_HEADER, TIME_HEADER,
+                            INNER_TYPE_HEADER, SEALED)
+from stream_aead import CHUNK_SIZE
 from peer_discovery import PORT, PORT
+from task_batcher import iter_batch, execute_batch, ndjson_lines, NDJSON
+from result_cache import CACHE, cache_key
+from result_stream import is_stream, wants_stream, stream_lines, materialize
+from wire_codec import encode_response, decode_request, BINARY, JSON, MAGIC
+from worker_pool import get_worker_pool, Overloaded, DeadlineExceeded, Cancelled
+from compression import COMPRESSOR
+from rpc_client import task_func_name, task_deadline
+from local_transport import serve_local
+from task_dedup import DEDUP
+from self_node import add_own_port
+from load_gossip import VIEW, SUBSCRIPTION_TTL, accept_push, get_publisher
+import inspect
 
 SECURITY = SecurityManager("my_shared_secret_123")
 
@@ -19,56 +36,253 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-app = Flask(name)
+app = Flask(__name__)
+
+def respond(body, status=200):
+    # إطار ثنائي لمن يطلبه في Accept (المصفوفات بلا tolist)، وإلا JSON
+    payload, mimetype = encode_response(body, request.headers.get("Accept", ""))
+    if g.get("seal"):
+        return sealed_reply([payload], mimetype, status)
+    # ضغط فوق الحد الأدنى إن قبله العميل (العميل يرسل identity حين لا يستحق رابطه الضغط)
+    payload, headers = COMPRESSOR.response_body(payload, request.headers.get("Accept-Encoding"))
+    return Response(payload, status=status, mimetype=mimetype, headers=headers)
+
+def sealed_reply(chunks, mimetype, status=200):
+    # الرد لطلب مختوم: يُختم دفعة بدفعة أثناء إرساله (النوع الداخلي والاتجاه موثَّقان)
+    timestamp = str(time.time())
+    sealed = g.seal(chunks, timestamp, f"response|{mimetype}")
+    return Response(stream_with_context(sealed), status=status, mimetype=SEALED,
+                    headers={TIME_HEADER: timestamp, INNER_TYPE_HEADER: mimetype})
+
+def stream_reply(chunks, mimetype):
+    if g.get("seal"):
+        return sealed_reply(chunks, mimetype)
+    return Response(stream_with_context(chunks), mimetype=mimetype)
+
+def request_body():
+    return COMPRESSOR.decompress(request.get_data(), request.headers.get("Content-Encoding"))
+
+def body_chunks():
+    # الجسم كما يصل من المقبس، بلا get_data() ولا نسخة كاملة من النص المشفّر
+    stream = request.stream
+    return iter(lambda: stream.read(CHUNK_SIZE), b"")
+
+def open_sealed(chunks):
+    """يجمع النص الصريح لتدفق مختوم في مخزن واحد ثم يفكه (JSON أو إطار ثنائي).
+    JSON وDTS1 يحتاجان الإطار كاملاً: النص المشفّر لا يُجمع، أما الصريح فنسخة واحدة."""
+    opened = bytearray()
+    for chunk in chunks:
+        opened += chunk
+    return decode_request(BINARY if opened[:4] == MAGIC else JSON, opened)
 
 # ------------------------------------------------------------------
 @app.route("/health")
 def health():
     return jsonify(status="ok")
 
+@app.route("/metrics")
+def metrics():
+    return jsonify(compression=COMPRESSOR.stats(), workers=get_worker_pool().stats(), cache=CACHE.stats(),
+                   dedup=DEDUP.stats(), gossip=get_publisher(server_load).stats())
+
 # ------------------------------------------------------------------
-@app.route("/run", methods=["POST"])
-def run():
+def read_payload():
+    """يُرجع (data, None) أو (None, رد الخطأ)"""
+    # 0) طلب مختوم بمفتاح جلسة (بعد /handshake): وسم AES-GCM بدل التوقيع
+    key_id = request.headers.get(KEY_ID_HEADER)
+    if key_id:
+        session = SECURITY.session(key_id)
+        if session is None:
+            # جلسة منتهية أو من قبل إعادة التشغيل: العميل يصافح من جديد
+            return None, (jsonify(error="unknown-session"), 401)
+        timestamp = request.headers.get(TIME_HEADER, "")
+        try:
+            if request.mimetype == SEALED:
+                # تدفق مختوم: يُفك أثناء القراءة، والرد يُختم بنفس الجلسة
+                data = open_sealed(session.open_stream(body_chunks(), timestamp))
+                g.seal = session.seal_stream
+                return data, None
+            opened = session.open(request_body(), timestamp)
+        except ValueError as e:
+            logging.warning(f"❌ طلب مختوم مرفوض من {session.peer_id}: {e}")
+            return None, (jsonify(error="Invalid tag"), 403)
+        # كل طلب موثَّق بالجلسة يُختم رده، أياً كان شكل جسمه
+        g.seal = session.seal_stream
+        return decode_request(BINARY if opened[:4] == MAGIC else JSON, opened), None
+
+    # 1) حاول قراءة كـ JSON مباشر (وضع التطويـر)
+    if request.is_json or request.mimetype == BINARY:
+        data = decode_request(request.content_type, request_body())
+    elif request.mimetype == SEALED:
+        # 1.5) تدفق مشفّر بالسر المشترك (بديل Fernet: بلا base64): الوقت في AAD
+        # والتدفق المعاد يُرفض، والرد يُختم بنفس المفتاح كرد لا كطلب
+        try:
+            data = open_sealed(SECURITY.decrypt_stream(body_chunks(), request.headers.get(TIME_HEADER, "")))
+        except ValueError as e:
+            logging.error(f"⚠️ فشل فك التشفير: {e}")
+            return None, (jsonify(error="Decryption failed"), 400)
+        g.seal = SECURITY.encrypt_stream
+    else:
+        # 2) وإلا اعتبره Payload مُشفَّر (وضع الإنتاج)
+        encrypted = request_body()
+        try:
+            decrypted = SECURITY.decrypt_data(encrypted)
+            data = json.loads(decrypted.decode())
+        except Exception as e:
+            logging.error(f"⚠️ فشل فك التشفير: {e}")
+            return None, (jsonify(error="Decryption failed"), 400)
+
+    # 3) التحقّق من التوقيع إن وُجد
+    if "_signature" in data:
+        if not SECURITY.verify_task(data):
+            logging.warning("❌ توقيع غير صالح")
+            return None, (jsonify(error="Invalid signature"), 403)
+        # أزل عناصر موقّعة إضافية
+        data = {k: v for k, v in data.items() if k not in ("_signature", "sender_id", "sender_key", "sig_alg")}
+    return data, None
+
+def server_load():
+    # ما ينشره load_gossip: المهام الجارية والعمّال
+    return get_worker_pool().stats()
+
+def execute_task(data):
+    """تنفيذ مهمة واحدة وإرجاع (الرد، كود HTTP) - مرة واحدة لكل task_id"""
+    # الموعد يُحسب مرة عند الوصول: المكرر لا ينتظر بعده، والمنفّذ لا يمدّده
+    deadline = task_deadline(data)
+    return DEDUP.run(data.get("task_id"), lambda: _execute_task(data, deadline), deadline)
+
+def _execute_task(data, deadline):
+    func_name = task_func_name(data)
+    args      = data.get("args", [])
+    kwargs    = data.get("kwargs", {})
+
+    fn = getattr(smart_tasks, func_name, None) if func_name else None
+    if not fn:
+        logging.warning(f"❌ لم يتم العثور على الدالة: {func_name}")
+        return {"error": "Function not found"}, 404
+
+    if deadline is not None and time.time() >= deadline:
+        # المرسل تخلّى عنها: لا نبدأ عملاً لن يُقرأ
+        logging.info(f"⌛ تجاهل {func_name}: انتهى موعدها قبل البدء")
+        return {"error": "deadline-exceeded", "expired": True}, 504
+
+    key = cache_key(fn, args, kwargs)
+    if key:
+        hit, result = CACHE.get(key)
+        if hit:
+            return {"result": result, "took": 0.0, "cached": True}, 200
+
     try:
-        # 1) حاول قراءة كـ JSON مباشر (وضع التطويـر)
-        if request.is_json:
-            data = request.get_json()
+        logging.info(f"⚙️ تنفيذ الدالة: {func_name} من جهاز آخر")
+        if inspect.isgeneratorfunction(fn):
+            # المهام المولِّدة تُنفَّذ في خيط الطلب لتتدفق دفعاتها مباشرة
+            start = time.time()
+            result, took = fn(*args, **kwargs), time.time() - start
         else:
-            # 2) وإلا اعتبره Payload مُشفَّر (وضع الإنتاج)
-            encrypted = request.get_data()
-            try:
-                decrypted = SECURITY.decrypt_data(encrypted)
-                data = json.loads(decrypted.decode())
-            except Exception as e:
-                logging.error(f"⚠️ فشل فك التشفير: {e}")
-                return jsonify(error="Decryption failed"), 400
-
-        # 3) التحقّق من التوقيع إن وُجد
-        if "_signature" in data:
-            if not SECURITY.verify_task(data):
-                logging.warning("❌ توقيع غير صالح")
-                return jsonify(error="Invalid signature"), 403
-            # أزل عناصر موقّعة إضافية
-            data = {k: v for k, v in data.items() if k not in ("_signature", "sender_id")}
-
-        func_name = data.get("func")
-        args      = data.get("args", [])
-        kwargs    = data.get("kwargs", {})
-
-        fn = getattr(smart_tasks, func_name, None)
-        if not fn:
-            logging.warning(f"❌ لم يتم العثور على الدالة: {func_name}")
-            return jsonify(error="Function not found"), 404
+            # باقي المهام في عامل منفصل: كل الأنوية بدل خيط واحد تحت الـ GIL
+            result, took = get_worker_pool().run("smart_tasks", func_name, args, kwargs,
+                                                 task_id=data.get("task_id"), deadline=deadline)
+        if key and not is_stream(result):
+            CACHE.put_result(fn, args, kwargs, result)
+        return {"result": result, "took": round(took, 3)}, 200
+    except Overloaded as e:
+        logging.warning(f"⏳ رفض المهمة {func_name}: {e}")
+        return {"error": str(e), "overloaded": True}, 503
+    except DeadlineExceeded as e:
+        return {"error": str(e), "expired": True}, 504
+    except Cancelled as e:
+        return {"error": str(e), "cancelled": True}, 409
+    except Exception as e:
+        logging.error(f"🔥 خطأ أثناء تنفيذ المهمة: {str(e)}")
+        return {"error": str(e)}, 500
 
-        logging.info(f"⚙️ تنفيذ الدالة: {func_name} من جهاز آخر")
-        result = fn(*args, **kwargs)
-        return jsonify(result=result)
+# ------------------------------------------------------------------
+@app.route("/handshake", methods=["POST"])
+def handshake():
+    # مصافحة الجلسة: توقيع RSA مرة واحدة هنا، ثم طلبات مختومة بمفتاح الجلسة
+    try:
+        return jsonify(SECURITY.accept_handshake(request.get_json()))
+    except (HandshakeError, KeyError, ValueError, TypeError) as e:
+        logging.warning(f"❌ مصافحة مرفوضة: {e}")
+        return jsonify(error="Handshake failed"), 403
+
+@app.route("/gossip/subscribe", methods=["POST"])
+def gossip_subscribe():
+    # الموازن يشترك في متجهات الحمل بالدفع بدل سؤال /cpu عند كل توزيع
+    data = request.get_json(silent=True) or {}
+    try:
+        # الدفع لعنوان طالب الاشتراك فقط: لا يُستخدم الخادم لمراسلة عناوين أخرى
+        load = get_publisher(server_load).subscribe(request.remote_addr, data["port"], data["peer"],
+                                                    data.get("ttl", SUBSCRIPTION_TTL))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(load)
+
+@app.route("/gossip", methods=["GET", "POST"])
+def gossip():
+    if request.method == "POST":
+        # متجه حمل مدفوع من قرين اشتركت فيه هذه العقدة (ومن عنوانه فقط)
+        try:
+            accept_push(VIEW, request.get_json(), request.remote_addr)
+        except PermissionError as e:
+            return jsonify(error=str(e)), 403
+        except (KeyError, TypeError) as e:
+            return jsonify(error=str(e)), 400
+        return "", 204
+    return jsonify(load=get_publisher(server_load).vector(), view=VIEW.stats())
+
+@app.route("/cancel/<task_id>", methods=["POST"])
+def cancel(task_id):
+    # المرسل تخلّى عن المهمة (انتهت مهلته أو فاز طلب احتياطي)
+    return jsonify(task_id=task_id, running=get_worker_pool().cancel(task_id))
+
+@app.route("/cache/<key>")
+def cache_lookup(key):
+    hit, result = CACHE.get(key)
+    if not hit:
+        return jsonify(error="miss"), 404
+    return respond({"result": result})
+
+# ------------------------------------------------------------------
+@app.route("/run", methods=["POST"])
+def run():
+    try:
+        data, error = read_payload()
+        if error:
+            return error
+        body, status = execute_task(data)
+        if is_stream(body.get("result")):
+            # مهمة مولِّدة: كل دفعة تُرسل فور إنتاجها (chunked NDJSON)
+            if wants_stream(request.headers.get("Accept", "")):
+                return stream_reply(stream_lines(body["result"]), NDJSON)
+            body = materialize(body)
+        return respond(body, status)
 
     except Exception as e:
         logging.error(f"🔥 خطأ أثناء تنفيذ المهمة: {str(e)}")
         return jsonify(error=str(e)), 500
 
 # ------------------------------------------------------------------
-if name == "main":
+@app.route("/run_batch", methods=["POST"])
+def run_batch():
+    """دفعة مهام في طلب واحد (نفس التشفير والتوقيع على مستوى الدفعة كاملة)"""
+    data, error = read_payload()
+    if error:
+        return error
+    tasks = data.get("tasks", [])
+    execute = lambda task: materialize(execute_task(task)[0])
+    if data.get("stream") or NDJSON in request.headers.get("Accept", ""):
+        return stream_reply(ndjson_lines(iter_batch(tasks, execute)), NDJSON)
+    return respond({"results": execute_batch(tasks, execute)})
+
+# ------------------------------------------------------------------
+if __name__ == "__main__":
     # تأكد أن المنفذ PORT مفتوح
-    app.run(host="0.0.0.0", port=PORT)
+    # HTTP/1.1 يُبقي الاتصال مفتوحاً لـ http_pool بدل إغلاقه بعد كل طلب
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    get_worker_pool().warm()
+    # الخدمات على نفس الجهاز تصل عبر مقبس Unix وذاكرة مشتركة بدل TCP
+    serve_local("rpc_server", PORT, execute_task)
+    add_own_port(PORT)
+    # خيوط الطلبات تنتظر عمّال get_worker_pool فقط، فالحد الفعلي هو max_in_flight
+    app.run(host="0.0.0.0", port=PORT, threaded=True)
@@ -1,40 +1,321 @@
 # security_layer.py (مُحدَّث)
 # ============================================================
 # إدارة التشفير والتوقيع وتبادل المفاتيح بين العقد
+#   • التوقيع بخوارزمية قابلة للاختيار (sig_alg): Ed25519 افتراضياً
+#     (توقيع 64 بايت وأسرع بكثير)، وRSA-2048 PSS للتوافق مع العقد القديمة.
+#     المهام والمصافحات بلا sig_alg تُعامل كـ RSA.
+#   • جلسات: مصافحة واحدة بين عقدتين (X25519 مؤقت موقّع بمفتاح العقدة،
+#     ثم HKDF مع المفتاح المشتق من السر المشترك) تُنتج مفتاح جلسة
+#     ومعرّفاً له (key_id).
+#   • بعدها كل طلب يُختم بـ AES-GCM بمفتاح الجلسة (سرية + وسم مصادقة)
+#     مع key_id في الترويسة، بلا توقيع ولا PEM في كل مهمة.
+#     الجلسة تتذكر nonces ما قبلته داخل نافذة الوقت، فالطلب المعاد يُرفض.
+#   • sign_task / verify_task باقية للعملاء القدامى.
+#   • المفاتيح كسولة: لا PBKDF2 ولا توليد مفتاح التوقيع عند الإنشاء، بل عند أول
+#     استخدام، وتُحفظ في key_store فيتخطاها التشغيل التالي. اسم ملف المفتاح
+#     المشتق ثابت لا بصمة للسر (البصمة السريعة تتيح تخمين السر بلا PBKDF2)،
+#     والتحقق من مطابقته للسر يجري بـ PBKDF2 في الخلفية بعد التحميل.
+#   • التشفير المتدفق (stream_aead): الطلبات والنتائج الكبيرة تُشفَّر وتُفك
+#     دفعة بدفعة أثناء الإرسال والاستقبال، بلا base64 ولا مخزن كامل.
 # ============================================================
 
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa, padding, x25519
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.fernet import Fernet
-import os, base64, json
-from typing import Dict
+from abc import ABC, abstractmethod
+import os, base64, heapq, json, logging, threading, time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 from peer_discovery import PORT, PORT
+from self_node import NODE_ID
+from key_store import KeyStore
+from stream_aead import seal_stream, open_stream
+
+SESSION_TTL = 3600          # ثواني صلاحية مفتاح الجلسة
+MAX_SESSIONS = 4096         # جلسات محفوظة على الخادم (الأقدم يُحذف)
+MAX_HANDSHAKE_KEYS = 1024   # مفاتيح عامة محلَّلة من المصافحات (الأقدم يُحذف)
+MAX_SKEW = 300              # ثواني فرق الساعة المقبول في الطلب المختوم
+HANDSHAKE_INFO = b"dts-session-v1"
+NONCE_SIZE = 12
+KEY_ID_HEADER = "X-DTS-Key-Id"
+TIME_HEADER = "X-DTS-Time"
+INNER_TYPE_HEADER = "X-DTS-Content-Type"   # نوع المحتوى داخل التدفق المختوم
+SEALED = "application/x-dts-sealed"
+STREAM_INFO = b"dts-stream-v1"
+SHARED_KEY_ID = "shared"    # معرّف "الجلسة" في AAD للتدفق المختوم بالسر المشترك
+KDF_SALT = b"nora_salt_2025"
+KDF_ITERATIONS = 150_000
+FERNET_KEY_FILE = "fernet.key"
+DEFAULT_SIG_ALG = os.getenv("DTS_SIG_ALG", "ed25519")
+LEGACY_SIG_ALG = "rsa"      # ما يُفترض حين لا يحمل الطلب sig_alg
+
+
+class HandshakeError(Exception):
+    """توقيع مصافحة غير صالح."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _private_pem(key) -> bytes:
+    return key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),   # الحماية بصلاحيات الملف
+    )
+
+
+# ------------------------------------------------------------
+# خوارزميات التوقيع
+# ------------------------------------------------------------
+class SignatureBackend(ABC):
+    """خوارزمية توقيع: توليد المفتاح وتحميله والتوقيع والتحقق."""
+
+    name = ""
+    key_file = ""
+    key_type = object
+
+    @abstractmethod
+    def new_key(self) -> bytes:
+        ...
+
+    def load(self, pem: bytes):
+        return serialization.load_pem_private_key(pem, password=None)
+
+    @abstractmethod
+    def sign(self, private_key, data: bytes) -> bytes:
+        ...
+
+    def verify(self, public_key, signature: bytes, data: bytes) -> bool:
+        """False لتوقيع غير صالح أو مفتاح من خوارزمية أخرى."""
+        if not isinstance(public_key, self.key_type):
+            return False
+        try:
+            self._verify(public_key, signature, data)
+            return True
+        except Exception:
+            return False
+
+    @abstractmethod
+    def _verify(self, public_key, signature: bytes, data: bytes):
+        ...
+
+
+class Ed25519Backend(SignatureBackend):
+    name = "ed25519"
+    key_file = "node_ed25519.pem"
+    key_type = ed25519.Ed25519PublicKey
+
+    def new_key(self) -> bytes:
+        return _private_pem(ed25519.Ed25519PrivateKey.generate())
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data)
+
+    def _verify(self, public_key, signature: bytes, data: bytes):
+        public_key.verify(signature, data)
+
+
+class RsaBackend(SignatureBackend):
+    name = "rsa"
+    key_file = "node_rsa.pem"
+    key_type = rsa.RSAPublicKey
+    _padding = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+    def new_key(self) -> bytes:
+        return _private_pem(rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+    def load(self, pem: bytes):
+        # الملف من توليدنا وبصلاحية المالك فقط: فحص صحة RSA الكامل
+        # عند التحميل (عشرات ms) لا يضيف شيئاً هنا
+        return serialization.load_pem_private_key(pem, password=None, unsafe_skip_rsa_key_validation=True)
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data, self._padding, hashes.SHA256())
+
+    def _verify(self, public_key, signature: bytes, data: bytes):
+        public_key.verify(signature, data, self._padding, hashes.SHA256())
+
+
+SIGNATURE_BACKENDS: Dict[str, SignatureBackend] = {
+    backend.name: backend for backend in (Ed25519Backend(), RsaBackend())
+}
+
+
+def signature_backend(name: Optional[str]) -> SignatureBackend:
+    """الخوارزمية بالاسم (None = RSA القديمة)؛ ValueError لاسم غير معروف."""
+    backend = SIGNATURE_BACKENDS.get(name or LEGACY_SIG_ALG)
+    if backend is None:
+        raise ValueError(f"خوارزمية توقيع غير معروفة: {name}")
+    return backend
+
+
+def _raw_public(key) -> bytes:
+    return key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+class Session:
+    """مفتاح جلسة متفق عليه مع عقدة واحدة."""
+
+    def __init__(self, key_id: str, key: bytes, peer_id: str, ttl: float = SESSION_TTL):
+        self.key_id = key_id
+        self.peer_id = peer_id
+        self.expires = time.time() + ttl
+        self._key = key
+        self._aead = AESGCM(key)
+        # nonces مقبولة ما دام وقت طلبها داخل النافذة: الطلب المعاد يُرفض
+        self._seen = set()
+        self._seen_expiry = []
+        self._seen_lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires
+
+    def _aad(self, timestamp: str) -> bytes:
+        return f"{self.key_id}|{timestamp}".encode()
+
+    def _stream_aad(self, timestamp: str, label: str) -> bytes:
+        # الاتجاه ونوع المحتوى موثَّقان: لا يُعاد رد كطلب ولا يُبدَّل نوعه
+        return f"{self.key_id}|{timestamp}|{label}".encode()
+
+    @staticmethod
+    def _check_time(timestamp: str):
+        try:
+            skew = abs(time.time() - float(timestamp))
+        except ValueError:
+            raise ValueError("وقت طلب غير صالح")
+        if skew > MAX_SKEW:
+            raise ValueError("طلب خارج نافذة الوقت المسموحة")
+
+    def _check_replay(self, nonce: bytes, timestamp: str):
+        """يرفع ValueError لـ nonce سبق قبوله؛ يُنسى حين يخرج وقته من نافذة MAX_SKEW."""
+        now = time.time()
+        with self._seen_lock:
+            while self._seen_expiry and self._seen_expiry[0][0] < now:
+                self._seen.discard(heapq.heappop(self._seen_expiry)[1])
+            if nonce in self._seen:
+                raise ValueError("طلب معاد (nonce مستخدم)")
+            self._seen.add(nonce)
+            heapq.heappush(self._seen_expiry, (float(timestamp) + MAX_SKEW, nonce))
+
+    def seal(self, data: bytes, timestamp: str) -> bytes:
+        """nonce + نص مشفّر + وسم؛ key_id والوقت ضمن البيانات الموثَّقة."""
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, data, self._aad(timestamp))
+
+    def open(self, sealed: bytes, timestamp: str) -> bytes:
+        """يرفع ValueError لطلب قديم أو معاد أو وسم غير صالح."""
+        self._check_time(timestamp)
+        try:
+            opened = self._aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], self._aad(timestamp))
+        except Exception:
+            raise ValueError("وسم مصادقة غير صالح")
+        # بعد التحقق من الوسم فقط: لا يملأ أحد الجدول بـ nonces مزيفة
+        self._check_replay(bytes(sealed[:NONCE_SIZE]), timestamp)
+        return opened
+
+    def seal_stream(self, chunks: Iterable[bytes], timestamp: str, label: str = "request") -> Iterator[bytes]:
+        """يختم القطع فور وصولها (انظر stream_aead)."""
+        return seal_stream(self._key, chunks, self._stream_aad(timestamp, label))
+
+    def open_stream(self, data: Iterable[bytes], timestamp: str, label: str = "request") -> Iterator[bytes]:
+        """يفك تدفقاً مختوماً دفعة بدفعة؛ StreamError (ValueError) عند أي تلاعب."""
+        self._check_time(timestamp)
+        return open_stream(self._key, data, self._stream_aad(timestamp, label),
+                           on_open=lambda nonce: self._check_replay(nonce, timestamp))
 
 
 class SecurityManager:
     """طبقة أمان موحّدة لكل العقد."""
 
-    def __init__(self, shared_secret: str):
-        # مفتاح متماثل لاستخدام Fernet
-        self._key = self._derive_key(shared_secret)
-        self._cipher = Fernet(self._key)
+    def __init__(self, shared_secret: str, key_store: Optional[KeyStore] = None,
+                 sig_alg: str = DEFAULT_SIG_ALG):
+        # لا اشتقاق ولا توليد هنا: المفاتيح تُحضَّر عند أول استخدام
+        # (ومن مخزن المفاتيح على القرص إن سبق تحضيرها في تشغيل سابق)
+        self._shared_secret = shared_secret
+        self._signer = signature_backend(sig_alg)
+        self.sig_alg = self._signer.name
+        self._store = key_store or KeyStore()
+        self._key_cache: Optional[bytes] = None
+        self._cipher_cache: Optional[Fernet] = None
+        self._stream_cache: Optional[bytes] = None
+        self._shared_stream_cache: Optional[Session] = None
+        self._private_key_cache = None
+        self._public_pem_cache: Optional[str] = None
+        self._init_lock = threading.Lock()
+        # مفاتيح العقد الأخرى {peer_id: public_key_obj}
+        self._peer_keys: Dict[str, object] = {}
+        # جلسات الخادم {key_id: Session}
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._handshake_keys: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
 
-        # زوج مفاتيح غير متماثل للتوقيع الرقمي
-        self._private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-        )
-        self._public_pem = (
-            self._private_key.public_key()
-            .public_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    # ------------------------------------------------------------
+    # المفاتيح (كسولة ومخزّنة)
+    # ------------------------------------------------------------
+    @property
+    def _key(self) -> bytes:
+        """مفتاح Fernet المشتق من السر المشترك (PBKDF2 مرة واحدة لكل سر على هذا الجهاز)."""
+        if self._key_cache is None:
+            with self._init_lock:
+                if self._key_cache is None:
+                    stored = self._store.read(FERNET_KEY_FILE)
+                    if stored is None:
+                        stored = self._derive_key(self._shared_secret)
+                        self._store.write(FERNET_KEY_FILE, stored)
+                    else:
+                        # المخزن لا يثبت أن المفتاح لهذا السر: نتحقق دون تأخير أول طلب
+                        threading.Thread(target=self._check_stored_key, args=(stored,),
+                                         daemon=True, name="key-check").start()
+                    self._key_cache = stored
+        return self._key_cache
+
+    def _check_stored_key(self, stored: bytes):
+        """تغيّر السر منذ التخزين: نستبدل المفتاح المحفوظ وما اشتُق منه."""
+        derived = self._derive_key(self._shared_secret)
+        if derived == stored:
+            return
+        logging.warning("🔑 المفتاح المحفوظ لا يطابق السر المشترك - إعادة اشتقاقه")
+        self._store.write(FERNET_KEY_FILE, derived)
+        with self._init_lock:
+            self._key_cache = derived
+            self._cipher_cache = None
+            self._stream_cache = None
+            self._shared_stream_cache = None
+
+    @property
+    def _cipher(self) -> Fernet:
+        if self._cipher_cache is None:
+            self._cipher_cache = Fernet(self._key)
+        return self._cipher_cache
+
+    @property
+    def _private_key(self):
+        """مفتاح توقيع العقدة: يُولَّد مرة واحدة ويُحفظ، فيبقى ثابتاً عبر إعادة التشغيل."""
+        if self._private_key_cache is None:
+            with self._init_lock:
+                if self._private_key_cache is None:
+                    pem = self._store.get_or_create(self._signer.key_file, self._signer.new_key)
+                    self._private_key_cache = self._signer.load(pem)
+        return self._private_key_cache
+
+    @property
+    def _public_pem(self) -> str:
+        if self._public_pem_cache is None:
+            self._public_pem_cache = (
+                self._private_key.public_key()
+                .public_bytes(
+                    encoding=serialization.Encoding.PEM,
+                    format=serialization.PublicFormat.SubjectPublicKeyInfo,
+                )
+                .decode()
             )
-            .decode()
-        )
-        # مفاتيح العقد الأخرى {peer_id: public_key_obj}
-        self._peer_keys: Dict[str, rsa.RSAPublicKey] = {}
+        return self._public_pem_cache
 
     # ------------------------------------------------------------
     # تشفير / فك تشفير متماثل
@@ -45,33 +326,60 @@ class SecurityManager:
     def decrypt_data(self, encrypted: bytes) -> bytes:
         return self._cipher.decrypt(encrypted)
 
+    @property
+    def _stream_key(self) -> bytes:
+        # مفتاح رئيسي فقط: كل تدفق يشتق منه مفتاحاً بملح عشوائي (stream_aead)
+        if self._stream_cache is None:
+            self._stream_cache = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                                      info=STREAM_INFO).derive(base64.urlsafe_b64decode(self._key))
+        return self._stream_cache
+
+    @property
+    def _shared_stream(self) -> Session:
+        # نفس قواعد الجلسة (الوقت والاتجاه في AAD، رفض التكرار) بمفتاح السر المشترك
+        if self._shared_stream_cache is None:
+            key = self._stream_key   # قبل القفل: _key يأخذ _init_lock بنفسه
+            with self._init_lock:
+                if self._shared_stream_cache is None:
+                    self._shared_stream_cache = Session(SHARED_KEY_ID, key, SHARED_KEY_ID, ttl=float("inf"))
+        return self._shared_stream_cache
+
+    def encrypt_stream(self, chunks: Iterable[bytes], timestamp: str,
+                       label: str = "request") -> Iterator[bytes]:
+        """بديل encrypt_data للبيانات الكبيرة: AES-GCM على دفعات بمفتاح السر المشترك.
+        label: الاتجاه ("request" أو "response|<النوع>")، موثَّق مع الوقت."""
+        return self._shared_stream.seal_stream(chunks, timestamp, label)
+
+    def decrypt_stream(self, data: Iterable[bytes], timestamp: str,
+                       label: str = "request") -> Iterator[bytes]:
+        """يرفع ValueError لوقت خارج النافذة أو تدفق معاد أو اتجاه/وسم غير مطابق."""
+        return self._shared_stream.open_stream(data, timestamp, label)
+
     # ------------------------------------------------------------
     # توقيع/تحقّق رقمي غير متماثل
     # ------------------------------------------------------------
     def sign_task(self, task: Dict) -> Dict:
-        """يُرجع نسخة موقّعة من الـtask مضافًا إليها المفتاح العام والمعرّف."""
-        signature = self._private_key.sign(
-            json.dumps(task, separators=(",", ":")).encode(),
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH,
-            ),
-            hashes.SHA256(),
-        )
+        """يُرجع نسخة موقّعة من الـtask مضافًا إليها المفتاح العام والمعرّف والخوارزمية."""
         task_signed = task.copy()
+        task_signed.update({"sender_id": os.getenv("NODE_ID", "unknown"), "sig_alg": self.sig_alg})
+        # التوقيع يغطي المهمة مع sender_id وsig_alg (نفس ما يتحقق منه verify_task)
+        signature = self._sign(json.dumps(task_signed, separators=(",", ":")).encode())
         task_signed.update(
             {
                 "_signature": base64.b64encode(signature).decode(),
-                "sender_id": os.getenv("NODE_ID", "unknown"),
                 "sender_key": self._public_pem,
             }
         )
         return task_signed
 
     def verify_task(self, signed_task: Dict) -> bool:
-        """يتحقق من صحة التوقيع باستخدام المفتاح العام للمرسل."""
+        """يتحقق من صحة التوقيع باستخدام المفتاح العام للمرسل وخوارزميته."""
         if "_signature" not in signed_task or "sender_id" not in signed_task:
             return False
+        try:
+            backend = signature_backend(signed_task.get("sig_alg"))
+        except ValueError:
+            return False
         sig = base64.b64decode(signed_task["_signature"])
         task_copy = {k: v for k, v in signed_task.items() if k not in {"_signature", "sender_key"}}
 
@@ -82,19 +390,113 @@ class SecurityManager:
                 self.add_peer_key(peer_id, signed_task["sender_key"])
             else:
                 return False
+        return backend.verify(self._peer_keys[peer_id], sig,
+                              json.dumps(task_copy, separators=(",", ":")).encode())
+
+    # ------------------------------------------------------------
+    # مصافحة الجلسة (التوقيع هنا فقط، مرة لكل جلسة)
+    # ------------------------------------------------------------
+    def start_handshake(self) -> Tuple[x25519.X25519PrivateKey, Dict]:
+        """جهة العميل: (المفتاح المؤقت، رسالة /handshake)."""
+        ephemeral = x25519.X25519PrivateKey.generate()
+        public = _raw_public(ephemeral)
+        hello = {
+            "node_id": NODE_ID,
+            "ephemeral": _b64(public),
+            "key": self._public_pem,
+            "sig_alg": self.sig_alg,
+            "signature": _b64(self._sign(b"hello|" + NODE_ID.encode() + public)),
+        }
+        return ephemeral, hello
+
+    def accept_handshake(self, hello: Dict) -> Dict:
+        """جهة الخادم: يتحقق من رسالة العميل، يسجّل الجلسة، ويُرجع الرد الموقّع."""
+        peer_id = hello["node_id"]
+        client_public = base64.b64decode(hello["ephemeral"])
+        peer_key = self._handshake_key(hello["key"])
+        self._verify(hello.get("sig_alg"), peer_key, base64.b64decode(hello["signature"]),
+                     b"hello|" + peer_id.encode() + client_public)
+
+        ephemeral = x25519.X25519PrivateKey.generate()
+        server_public = _raw_public(ephemeral)
+        key = self._session_key(ephemeral, client_public, client_public, server_public)
+        key_id = os.urandom(12).hex()
+        session = Session(key_id, key, peer_id)
+        with self._lock:
+            self._sessions[key_id] = session
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        return {
+            "node_id": NODE_ID,
+            "ephemeral": _b64(server_public),
+            "key": self._public_pem,
+            "key_id": key_id,
+            "ttl": SESSION_TTL,
+            "sig_alg": self.sig_alg,
+            # التوقيع يغطي المفتاحين المؤقتين معاً: لا يمكن إعادة استخدام رد قديم
+            "signature": _b64(self._sign(b"accept|" + NODE_ID.encode() + server_public
+                                         + client_public + key_id.encode())),
+        }
+
+    def finish_handshake(self, ephemeral: x25519.X25519PrivateKey, reply: Dict) -> Session:
+        """جهة العميل: يتحقق من رد الخادم ويشتق نفس مفتاح الجلسة."""
+        peer_id = reply["node_id"]
+        client_public = _raw_public(ephemeral)
+        server_public = base64.b64decode(reply["ephemeral"])
+        key_id = reply["key_id"]
+        peer_key = self._handshake_key(reply["key"])
+        self._verify(reply.get("sig_alg"), peer_key, base64.b64decode(reply["signature"]),
+                     b"accept|" + peer_id.encode() + server_public + client_public + key_id.encode())
+        key = self._session_key(ephemeral, server_public, client_public, server_public)
+        # هامش صغير حتى لا يستخدم العميل مفتاحاً ينتهي على الخادم أثناء الطلب
+        return Session(key_id, key, peer_id, ttl=float(reply.get("ttl", SESSION_TTL)) - 60)
+
+    def session(self, key_id: str) -> Optional[Session]:
+        """جلسة سارية بهذا المعرّف أو None (منتهية أو غير معروفة)."""
+        with self._lock:
+            session = self._sessions.get(key_id)
+            if session is not None and session.expired:
+                del self._sessions[key_id]
+                session = None
+        return session
+
+    def _session_key(self, ephemeral, peer_public: bytes, client_public: bytes, server_public: bytes) -> bytes:
+        shared = ephemeral.exchange(x25519.X25519PublicKey.from_public_bytes(peer_public))
+        # السر المشترك (Fernet) ملحٌ لـ HKDF: من لا يعرفه لا يصل لنفس المفتاح
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=base64.urlsafe_b64decode(self._key),
+            info=HANDSHAKE_INFO + client_public + server_public,
+        ).derive(shared)
+
+    def _sign(self, data: bytes) -> bytes:
+        return self._signer.sign(self._private_key, data)
+
+    def _verify(self, sig_alg: Optional[str], public_key, signature: bytes, data: bytes):
         try:
-            self._peer_keys[peer_id].verify(
-                sig,
-                json.dumps(task_copy, separators=(",", ":")).encode(),
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH,
-                ),
-                hashes.SHA256(),
-            )
-            return True
-        except Exception:
-            return False
+            valid = signature_backend(sig_alg).verify(public_key, signature, data)
+        except ValueError:
+            valid = False
+        if not valid:
+            raise HandshakeError("توقيع مصافحة غير صالح")
+
+    def _handshake_key(self, public_key_pem: str):
+        """المفتاح العام المرسل في المصافحة (يُحلَّل PEM مرة لكل مفتاح جديد فقط).
+        الثقة من السر المشترك في اشتقاق المفتاح، والتوقيع يربط الجلسة بحامل المفتاح.
+        لا يمس _peer_keys: المرسل لم يُتحقق منه بعد، والمفتاح المثبت لـ verify_task
+        لا يستبدله طلب مجهول."""
+        with self._lock:
+            cached = self._handshake_keys.get(public_key_pem)
+            if cached is not None:
+                self._handshake_keys.move_to_end(public_key_pem)
+                return cached
+        cached = serialization.load_pem_public_key(public_key_pem.encode())
+        with self._lock:
+            self._handshake_keys[public_key_pem] = cached
+            while len(self._handshake_keys) > MAX_HANDSHAKE_KEYS:
+                self._handshake_keys.popitem(last=False)
+        return cached
 
     # ------------------------------------------------------------
     # إدارة المفاتيح العامة للأقران
@@ -110,12 +512,11 @@ class SecurityManager:
     # ------------------------------------------------------------
     @staticmethod
     def _derive_key(password: str) -> bytes:
-        salt = b"nora_salt_2025"  # ◀️ عدِّل في الإنتاج
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
-            salt=salt,
-            iterations=150_000,
+            salt=KDF_SALT,  # ◀️ عدِّل في الإنتاج
+            iterations=KDF_ITERATIONS,
         )
         return base64.urlsafe_b64encode(kdf.derive(password.encode()))
 
@@ -0,0 +1,68 @@
+# self_node.py
+# ============================================================
+# التعرّف على العقدة نفسها في قوائم الأقران:
+#   • القرين هو هذه العقدة إن طابق node_id صريحاً (متغير NODE_ID فقط:
+#     اسم الجهاز مشترك بين كل خدمات الجهاز فلا يميّز عملية)، أو إن كان
+#     عنوانه أحد عناوين هذا الجهاز على منفذ تخدمه هذه العملية فعلاً
+#     (الخوادم تسجّله بـ add_own_port قبل الاستماع).
+#   • الخدمات الأخرى على نفس الجهاز ليست "نفسنا": تصلها local_transport.
+#   • موازنة الحمل تستبعده (exclude_self)، و rpc_client ينفّذ المهمة
+#     في العملية نفسها بدل تسلسلها وإرسالها لخادمنا عبر HTTP.
+# ============================================================
+
+import os
+import socket
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+
+NODE_ID = os.getenv("NODE_ID", socket.gethostname())
+NODE_ID_EXPLICIT = "NODE_ID" in os.environ
+
+_LOOPBACK = {"127.0.0.1", "localhost", "::1", "0.0.0.0"}
+_own_ports = set()             # منافذ تخدمها هذه العملية فقط
+_addresses = None
+
+
+def local_addresses() -> set:
+    """عناوين هذا الجهاز (loopback + الواجهات)، تُحسب مرة واحدة."""
+    global _addresses
+    if _addresses is None:
+        addresses = set(_LOOPBACK)
+        try:
+            addresses.update(socket.gethostbyname_ex(socket.gethostname())[2])
+        except OSError:
+            pass
+        try:
+            probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            probe.connect(("8.8.8.8", 80))
+            addresses.add(probe.getsockname()[0])
+            probe.close()
+        except OSError:
+            pass
+        _addresses = addresses
+    return _addresses
+
+
+def add_own_port(port):
+    """يستدعيه من يستمع فعلاً على المنفذ، قبل بدء الاستماع."""
+    _own_ports.add(int(port))
+
+
+def _host_port(peer: str):
+    parts = urlsplit(peer if "://" in peer else f"http://{peer}")
+    return parts.hostname, parts.port
+
+
+def is_self(peer: str, node_id: Optional[str] = None) -> bool:
+    """peer: 'ip:port' أو 'http://ip:port/run'؛ node_id إن كان معروفاً من الاكتشاف."""
+    if node_id and NODE_ID_EXPLICIT and node_id == NODE_ID:
+        return True
+    try:
+        host, port = _host_port(peer)
+    except ValueError:
+        return False
+    return port in _own_ports and host in local_addresses()
+
+
+def exclude_self(peers: Iterable[str]) -> List[str]:
+    return [peer for peer in peers if not is_self(peer)]
@@ -2,7 +2,9 @@ import math
 import numpy as np
 import time
 from peer_discovery import PORT, PORT
+from result_cache import deterministic
 
+@deterministic("1")
 def prime_calculation(n: int):
     """ترجع قائمة الأعداد الأوليّة حتى n مع عددها"""
     primes = []
@@ -11,12 +13,31 @@ def prime_calculation(n: int):
             primes.append(num)
     return {"count": len(primes), "primes": primes}
 
+def prime_stream(n: int, segment: int = 65536):
+    """مولِّد: الأعداد الأوليّة حتى n على دفعات (غربال مقطّع)، ذاكرة ثابتة مهما كبر n"""
+    limit = math.isqrt(n)
+    small = np.ones(limit + 1, dtype=bool)
+    small[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if small[p]:
+            small[p * p::p] = False
+    base = np.nonzero(small)[0]
+    for low in range(2, n + 1, segment):
+        high = min(low + segment, n + 1)
+        mark = np.ones(high - low, dtype=bool)
+        for p in base:
+            if p * p >= high:
+                break
+            start = max(p * p, (low + p - 1) // p * p)
+            mark[start - low::p] = False
+        yield np.nonzero(mark)[0] + low
+
 def matrix_multiply(size: int):
     """ضرب مصفوفات عشوائيّة (size × size)"""
     A = np.random.rand(size, size)
     B = np.random.rand(size, size)
     result = np.dot(A, B)  # يمكن أيضًا: A @ B
-    return {"result": result.tolist()}
+    return {"result": result}  # ndarray: يُنقل ثنائياً عبر wire_codec
 
 def data_processing(data_size: int):
     """تنفيذ معالجة بيانات بسيطة كتجربة"""
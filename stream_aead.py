@@ -0,0 +1,126 @@
+# stream_aead.py
+# ============================================================
+# تشفير متدفق موثَّق (AEAD) على دفعات، بأسلوب STREAM (مثل AES-GCM-HKDF
+# المتدفق في Tink):
+#   • الترويسة: ‎DTSA‎ + إصدار + ملح عشوائي (16 بايت) + بادئة nonce (7 بايت).
+#   • مفتاح لكل تدفق = HKDF(المفتاح الرئيسي، الملح): الـ nonce لا يتكرر إلا
+#     بتكرار الملح (128 بت)، لا بتكرار بادئة 56 بت تحت مفتاح ثابت.
+#   • كل دفعة: طول (4 بايت) + AES-GCM(الدفعة) + وسم 16 بايت،
+#     nonce = البادئة + عدّاد الدفعة (4 بايت) + علم الأخيرة (1 بايت).
+#   • الدفعة الأخيرة فارغة وعلمها 1: حذف دفعات من النهاية أو إعادة
+#     ترتيبها أو تبديلها يُكتشف، ولا حاجة لمعرفة نهاية البيانات مسبقاً
+#     (مناسب لنتائج متدفقة).
+#   • بلا base64، والنص المشفّر لا يُجمع: دفعة واحدة في الذاكرة. النص
+#     الصريح يُسلَّم دفعة بدفعة، ومن يحتاجه كاملاً (JSON / DTS1) يجمعه.
+# ============================================================
+
+import os
+import struct
+from typing import Callable, Iterable, Iterator, Optional
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"DTSA"
+VERSION = 2
+SALT_SIZE = 16
+STREAM_INFO = b"dts-stream-key-v2"
+CHUNK_SIZE = 64 * 1024         # أقصى حجم نص صريح في الدفعة الواحدة
+PREFIX_SIZE = 7
+TAG_SIZE = 16
+HEADER_SIZE = len(MAGIC) + 1 + SALT_SIZE + PREFIX_SIZE
+MAX_FRAME = CHUNK_SIZE + TAG_SIZE
+_LENGTH = struct.Struct(">I")
+_COUNTER = struct.Struct(">IB")
+
+
+class StreamError(ValueError):
+    """تدفق تالف أو مقطوع أو وسم غير صالح."""
+
+
+def _nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    if counter > 0xFFFFFFFF:
+        raise StreamError("تجاوز عدد الدفعات حد العدّاد")
+    return prefix + _COUNTER.pack(counter, 1 if last else 0)
+
+
+def _stream_aead(key: bytes, salt: bytes) -> AESGCM:
+    return AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=STREAM_INFO).derive(key))
+
+
+def seal_stream(key: bytes, chunks: Iterable[bytes], aad: bytes = b"",
+                chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """يشفّر كل قطعة فور وصولها (القطع الكبيرة تُقسَّم)، ثم دفعة ختامية فارغة.
+    key: المفتاح الرئيسي (32 بايت)؛ مفتاح التدفق يُشتق منه بملح جديد."""
+    salt, prefix = os.urandom(SALT_SIZE), os.urandom(PREFIX_SIZE)
+    aead = _stream_aead(key, salt)
+    yield MAGIC + bytes([VERSION]) + salt + prefix
+    counter = 0
+    for chunk in chunks:
+        view = memoryview(chunk)
+        for start in range(0, len(view), chunk_size):
+            sealed = aead.encrypt(_nonce(prefix, counter, False), view[start:start + chunk_size], aad)
+            counter += 1
+            yield _LENGTH.pack(len(sealed)) + sealed
+    sealed = aead.encrypt(_nonce(prefix, counter, True), b"", aad)
+    yield _LENGTH.pack(len(sealed)) + sealed
+
+
+class _Reader:
+    """قراءة أطوال محددة من مكرِّر بايتات بأحجام عشوائية."""
+
+    def __init__(self, data: Iterable[bytes]):
+        self._data = iter(data)
+        self._buffer = bytearray()
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            piece = next(self._data, None)
+            if piece is None:
+                raise StreamError("انقطع التدفق المشفّر قبل نهايته")
+            self._buffer += piece
+        out = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return out
+
+    def exhausted(self) -> bool:
+        if self._buffer:
+            return False
+        for piece in self._data:
+            if piece:
+                self._buffer += piece
+                return False
+        return True
+
+
+def open_stream(key: bytes, data: Iterable[bytes], aad: bytes = b"",
+                on_open: Optional[Callable[[bytes], None]] = None) -> Iterator[bytes]:
+    """يفك التدفق دفعة بدفعة؛ يرفع StreamError عند أي تلاعب أو قطع.
+    on_open(الملح + البادئة): يُستدعى بعد أول دفعة صحيحة الوسم (لرفض التكرار)."""
+    reader = _Reader(data)
+    header = reader.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC or header[len(MAGIC)] != VERSION:
+        raise StreamError("ليس تدفقاً مشفّراً بصيغة DTSA")
+    salt = header[len(MAGIC) + 1:len(MAGIC) + 1 + SALT_SIZE]
+    prefix = header[len(MAGIC) + 1 + SALT_SIZE:]
+    aead = _stream_aead(key, salt)
+    counter = 0
+    while True:
+        (length,) = _LENGTH.unpack(reader.read(_LENGTH.size))
+        if not TAG_SIZE <= length <= MAX_FRAME:
+            raise StreamError("طول دفعة غير صالح")
+        sealed = reader.read(length)
+        last = length == TAG_SIZE
+        try:
+            plain = aead.decrypt(_nonce(prefix, counter, last), sealed, aad)
+        except Exception:
+            raise StreamError("وسم مصادقة غير صالح")
+        if counter == 0 and on_open is not None:
+            on_open(salt + prefix)
+        if last:
+            break
+        counter += 1
+        yield plain
+    if not reader.exhausted():
+        raise StreamError("بيانات زائدة بعد الدفعة الختامية")
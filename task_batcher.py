@@ -0,0 +1,207 @@
+# task_batcher.py
+# ============================================================
+# تجميع المهام الصغيرة في طلب HTTP واحد:
+#   • جهة العميل: MicroBatcher يجمع الاستدعاءات المتجهة لنفس القرين
+#     ما دام هناك طلب سابق قيد التنفيذ (بأسلوب Nagle)، فلا تأخير
+#     إضافي عند الحمل الخفيف، ودفعات كبيرة عند الحمل العالي.
+#   • جهة الخادم: execute_batch / iter_batch لتنفيذ الدفعة وإرجاع
+#     النتائج بالترتيب أو تدفّقاً (NDJSON) حسب اكتمالها.
+#   • القرين على نفس الجهاز لا يمر بالتجميع ولا HTTP: local_transport
+#     (مقبس Unix + ذاكرة مشتركة للمصفوفات الكبيرة).
+# ============================================================
+
+import json
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List
+
+from http_pool import POOL
+from compression import COMPRESSOR
+from wire_codec import ACCEPT, encode_request, read_response, json_default
+from local_transport import LOCAL
+
+MAX_BATCH = 64              # أقصى عدد مهام في الطلب الواحد
+MAX_BATCHES_IN_FLIGHT = 4   # دفعات متزامنة لكل قرين قبل البدء بالتجميع
+BATCH_TIMEOUT = 30          # ثواني لكل دفعة
+NDJSON = "application/x-ndjson"
+
+
+class BatchItemError(Exception):
+    """خطأ أعاده القرين لمهمة واحدة داخل الدفعة."""
+
+
+def peer_base_url(peer: str) -> str:
+    """يقبل 'ip:port' أو 'http://ip:port/run' ويُرجع 'http://ip:port'."""
+    if "://" not in peer:
+        return f"http://{peer}"
+    base = peer.rstrip("/")
+    return base[: -len("/run")] if base.endswith("/run") else base
+
+
+class _PeerQueue:
+    def __init__(self):
+        self.pending = deque()   # [(payload, future)]
+        self.in_flight = 0
+
+
+class MicroBatcher:
+    """يجمع الاستدعاءات المعلّقة لكل قرين ويرسلها عبر /run_batch."""
+
+    def __init__(self, max_batch: int = MAX_BATCH,
+                 max_in_flight: int = MAX_BATCHES_IN_FLIGHT,
+                 timeout: float = BATCH_TIMEOUT):
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queues: Dict[str, _PeerQueue] = {}
+        self._no_batch = set()   # أقران قديمة بلا /run_batch
+        self._sender = ThreadPoolExecutor(max_workers=32, thread_name_prefix="batch-send")
+
+    def submit(self, peer: str, payload: Dict) -> Future:
+        """يُرجع Future تُحلّ بنفس شكل رد /run: {"result", "host", "took"}."""
+        future = Future()
+        base = peer_base_url(peer)
+        path = LOCAL.path_for(base)
+        if path:
+            self._sender.submit(self._send_local, base, path, payload, future)
+            return future
+        with self._lock:
+            q = self._queues.setdefault(base, _PeerQueue())
+            q.pending.append((payload, future))
+            batch = self._take_batch(q)
+        if batch:
+            self._sender.submit(self._send, base, batch)
+        return future
+
+    def _take_batch(self, q: _PeerQueue) -> List:
+        """يُستدعى تحت القفل: يأخذ دفعة إن كان هناك متّسع للإرسال.
+        الاستدعاءات الملغاة (مثل الطلب الاحتياطي الخاسر) تُسقط هنا قبل إرسالها."""
+        if q.in_flight >= self.max_in_flight:
+            return []
+        batch = []
+        while q.pending and len(batch) < self.max_batch:
+            payload, future = q.pending.popleft()
+            if future.set_running_or_notify_cancel():
+                batch.append((payload, future))
+        if not batch:
+            return []
+        q.in_flight += 1
+        return batch
+
+    def _send(self, base: str, batch: List):
+        try:
+            if base in self._no_batch or len(batch) == 1:
+                self._send_single(base, batch)
+            else:
+                self._send_batch(base, batch)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                q = self._queues[base]
+                q.in_flight -= 1
+                nxt = self._take_batch(q)
+            if nxt:
+                self._sender.submit(self._send, base, nxt)
+
+    def _send_local(self, base: str, path: str, payload: Dict, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            _resolve(future, LOCAL.call(path, payload, self.timeout))
+        except (ConnectionRefusedError, FileNotFoundError):
+            # مقبس متبقٍّ من خدمة توقفت: الخدمة الحالية (إن وُجدت) على HTTP
+            self._send_single(base, [(payload, future)])
+        except Exception as e:
+            future.set_exception(e)
+
+    def _send_single(self, base: str, batch: List):
+        for payload, future in batch:
+            try:
+                body, content_type = encode_request(payload)
+                body, headers = COMPRESSOR.request_body(base, body)
+                headers.update({"Content-Type": content_type, "Accept": ACCEPT})
+                response = POOL.post(f"{base}/run", data=body, timeout=self.timeout, headers=headers)
+                COMPRESSOR.note_peer(base, response.headers)
+                response.raise_for_status()
+                _resolve(future, read_response(response))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _send_batch(self, base: str, batch: List):
+        body = json.dumps({"tasks": [payload for payload, _ in batch], "stream": True},
+                          default=json_default).encode()
+        body, headers = COMPRESSOR.request_body(base, body)
+        headers.update({"Accept": NDJSON, "Content-Type": "application/json"})
+        # الرد المتدفق يُغلق في كل المسارات (وإلا بقي اتصاله محجوزاً من المجمّع)
+        with POOL.post(
+            f"{base}/run_batch",
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            stream=True,
+        ) as response:
+            unsupported = response.status_code == 404
+            if not unsupported:
+                response.raise_for_status()
+                # النتائج تصل تدفّقاً حسب اكتمالها، فنحلّ كل Future فور وصول سطره
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    _resolve(batch[item.pop("index")][1], item)
+        if unsupported:
+            logging.info(f"ℹ️ {base} لا يدعم /run_batch - إرسال فردي")
+            self._no_batch.add(base)
+            self._send_single(base, batch)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(BatchItemError("لم يُرجع القرين نتيجة لهذه المهمة"))
+
+
+def _resolve(future: Future, item: Dict):
+    if "error" in item:
+        future.set_exception(BatchItemError(item["error"]))
+    else:
+        future.set_result(item)
+
+
+# ------------------------------------------------------------
+# جهة الخادم
+# ------------------------------------------------------------
+_BATCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch-exec")
+
+
+def iter_batch(tasks: List[Dict], execute: Callable[[Dict], Dict]) -> Iterator[Dict]:
+    """ينفّذ مهام الدفعة ويُرجع كل نتيجة فور اكتمالها مع index موقعها."""
+    futures = {_BATCH_POOL.submit(execute, task): i for i, task in enumerate(tasks)}
+    for future in as_completed(futures):
+        try:
+            item = dict(future.result())
+        except Exception as e:
+            item = {"error": str(e)}
+        item["index"] = futures[future]
+        yield item
+
+
+def execute_batch(tasks: List[Dict], execute: Callable[[Dict], Dict]) -> List[Dict]:
+    """نفس iter_batch لكن النتائج بترتيب المهام الأصلي."""
+    results = [None] * len(tasks)
+    for item in iter_batch(tasks, execute):
+        results[item.pop("index")] = item
+    return results
+
+
+def ndjson_lines(items: Iterator[Dict]) -> Iterator[str]:
+    for item in items:
+        yield json.dumps(item, default=json_default) + "\n"
+
+
+# مجمّع مشترك لكل مرسلات المهام في العملية
+BATCHER = MicroBatcher()
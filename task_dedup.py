@@ -0,0 +1,106 @@
+# task_dedup.py
+# ============================================================
+# إزالة تكرار المهام على الخادم حسب task_id:
+#   • الطلب الاحتياطي أو إعادة المحاولة بعد رد بطيء يحمل نفس task_id،
+#     فلا يُحسب مرتين: المكرر أثناء التنفيذ ينضم للحساب الجاري وينتظر
+#     نتيجته، والمكرر بعده يأخذ النتيجة المحفوظة.
+#   • الجدول محدود بعدد المدخلات وبمدة حفظ للنتائج المكتملة.
+#   • الردود العابرة (ازدحام، انتهاء الموعد، إلغاء) لا تُحفظ ولا تُعاد
+#     حتى لمن انضم أثناء التنفيذ: إعادة المحاولة بعدها تُنفَّذ فعلاً.
+#   • المكرر لا ينتظر بعد موعده النهائي (المرسل تخلّى عنه): يُرجع 504.
+#   • نتائج المهام المولِّدة لا تُشارك (المولِّد يُستهلك مرة واحدة).
+# ============================================================
+
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+MAX_ENTRIES = 1024          # مهام جارية + حديثة
+RECENT_TTL = 60             # ثواني حفظ نتيجة المهمة المكتملة
+JOIN_TIMEOUT = 300          # أقصى انتظار للحساب الجاري قبل التنفيذ المستقل
+TRANSIENT = {409, 503, 504}
+
+
+class _Entry:
+    def __init__(self):
+        self.done = threading.Event()
+        self.reply: Optional[Tuple[Dict, int]] = None
+        self.finished = 0.0
+        self.shareable = True
+
+
+class TaskDedup:
+    """جدول task_id → حساب جارٍ أو نتيجة حديثة."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = RECENT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.joined = 0
+        self.replayed = 0
+
+    def _evict(self, now: float):
+        """يُستدعى تحت القفل: يحذف المنتهية صلاحيتها ثم الأقدم المكتملة فوق الحد."""
+        for task_id in [k for k, e in self._entries.items() if e.finished and now - e.finished > self.ttl]:
+            del self._entries[task_id]
+        if len(self._entries) <= self.max_entries:
+            return
+        for task_id in [k for k, e in self._entries.items() if e.done.is_set()]:
+            del self._entries[task_id]
+            if len(self._entries) <= self.max_entries:
+                return
+
+    def run(self, task_id: Optional[str], execute: Callable[[], Tuple[Dict, int]],
+            deadline: Optional[float] = None) -> Tuple[Dict, int]:
+        """execute() → (الرد، كود HTTP)؛ يُنفَّذ مرة واحدة لكل task_id.
+        deadline: زمن مطلق لطلب هذا المكرر؛ انتظاره للحساب الجاري لا يتجاوزه."""
+        if not task_id:
+            return execute()
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(task_id)
+            owner = entry is None
+            if owner:
+                entry = self._entries[task_id] = _Entry()
+        if not owner:
+            running = not entry.done.is_set()
+            wait = JOIN_TIMEOUT if deadline is None else min(JOIN_TIMEOUT, max(deadline - now, 0.0))
+            if not entry.done.wait(wait) and deadline is not None and time.time() >= deadline:
+                return {"error": "deadline-exceeded", "expired": True}, 504
+            if (entry.done.is_set() and entry.shareable and entry.reply is not None
+                    and entry.reply[1] not in TRANSIENT):
+                with self._lock:
+                    if running:
+                        self.joined += 1
+                    else:
+                        self.replayed += 1
+                body, status = entry.reply
+                return dict(body, duplicate=True), status
+            return execute()
+
+        reply = None
+        try:
+            reply = execute()
+            return reply
+        finally:
+            body, status = reply if reply is not None else ({}, 500)
+            entry.shareable = reply is not None and not inspect.isgenerator(body.get("result"))
+            entry.reply = reply
+            with self._lock:
+                if not entry.shareable or status in TRANSIENT:
+                    self._entries.pop(task_id, None)
+                else:
+                    entry.finished = time.time()
+            entry.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "joined": self.joined, "replayed": self.replayed}
+
+
+# جدول مشترك للخادم
+DEDUP = TaskDedup()
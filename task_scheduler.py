@@ -0,0 +1,156 @@
+# task_scheduler.py
+# ============================================================
+# مُجدوِل محلي بأولويات ومواعيد نهائية:
+#   • كل مهمة تدخل PriorityQueue بالترتيب (الأولوية، الموعد النهائي، التسلسل)،
+#     أي الأولوية أولاً ثم الأقرب موعداً (EDF) داخل نفس الأولوية.
+#   • عدد محدود من العمّال يفرّغ الطابور، والطابور محدود الحجم فيطبّق
+#     ضغطاً عكسياً (queue.Full) عند الامتلاء.
+#   • مسار منفصل بعمّال محجوزين لمهام الزمن الحقيقي (البث المباشر)
+#     كي لا تنتظر خلف مهمة ثقيلة مثل matrix_multiply(500).
+#   • عمق الطابور وزمن الانتظار متاحان لقرار التوزيع.
+# ============================================================
+
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from offload_controller import get_controller
+
+PRIORITY_REALTIME = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+DEFAULT_QUEUE_SIZE = 1024
+REALTIME_WORKERS = 1
+WAIT_WINDOW = 200            # عدد أزمنة الانتظار المحفوظة لحساب p95
+EWMA_ALPHA = 0.2
+
+
+class DeadlineExceeded(Exception):
+    """انتهى الموعد النهائي للمهمة قبل أن تبدأ."""
+
+
+class _Lane:
+    """طابور أولويات + عمّال يفرّغونه + إحصاءات الانتظار."""
+
+    def __init__(self, name: str, workers: int, maxsize: int):
+        self.name = name
+        self.queue = queue.PriorityQueue(maxsize=maxsize)
+        self.workers = workers
+        self.busy = 0
+        self.avg_wait = 0.0
+        self.avg_service = 0.0
+        self.waits = deque(maxlen=WAIT_WINDOW)
+        self._lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True).start()
+
+    def _work(self):
+        while True:
+            _, deadline, _, enqueued, future, fn, args, kwargs = self.queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                started = time.time()
+                wait = started - enqueued
+                with self._lock:
+                    self.waits.append(wait)
+                    self.avg_wait += EWMA_ALPHA * (wait - self.avg_wait)
+                if started > deadline:
+                    future.set_exception(DeadlineExceeded(f"انتظرت المهمة {wait:.2f}s وتجاوزت موعدها"))
+                    continue
+                with self._lock:
+                    self.busy += 1
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    with self._lock:
+                        self.busy -= 1
+                        self.avg_service += EWMA_ALPHA * (time.time() - started - self.avg_service)
+            finally:
+                self.queue.task_done()
+
+    def p95_wait(self) -> float:
+        with self._lock:
+            waits = sorted(self.waits)
+        return waits[int(len(waits) * 0.95)] if waits else 0.0
+
+    def expected_wait(self) -> float:
+        """تقدير زمن انتظار مهمة جديدة: (العمق + المشغول) × متوسط الخدمة ÷ العمّال."""
+        backlog = self.queue.qsize() + self.busy - self.workers + 1
+        return max(backlog, 0) * self.avg_service / self.workers
+
+
+class TaskScheduler:
+    """مُجدوِل المهام المحلية."""
+
+    def __init__(self, workers: Optional[int] = None, maxsize: int = DEFAULT_QUEUE_SIZE,
+                 realtime_workers: int = REALTIME_WORKERS):
+        self._seq = itertools.count()
+        self.general = _Lane("sched", workers or os.cpu_count() or 4, maxsize)
+        self.realtime = _Lane("sched-rt", realtime_workers, maxsize)
+        # زمن انتظار الطابور أحد مدخلات متحكم عتبات التوزيع
+        get_controller().watch_queue(self.expected_wait)
+
+    @property
+    def queue(self) -> queue.PriorityQueue:
+        return self.general.queue
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_NORMAL,
+               deadline: Optional[float] = None, block: bool = True,
+               timeout: Optional[float] = None, **kwargs) -> Future:
+        """يضع المهمة في الطابور ويُرجع Future.
+        deadline: زمن مطلق (time.time()) لا تبدأ المهمة بعده.
+        عند امتلاء الطابور: ينتظر حتى timeout ثم يرفع queue.Full (ضغط عكسي)."""
+        lane = self.realtime if priority <= PRIORITY_REALTIME else self.general
+        future = Future()
+        item = (priority, deadline if deadline is not None else float("inf"),
+                next(self._seq), time.time(), future, fn, args, kwargs)
+        try:
+            lane.queue.put(item, block=block, timeout=timeout)
+        except queue.Full:
+            logging.warning(f"⚠️ طابور {lane.name} ممتلئ ({lane.queue.maxsize}) - رفض المهمة")
+            raise
+        return future
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                "depth": lane.queue.qsize(),
+                "busy": lane.busy,
+                "workers": lane.workers,
+                "avg_wait": lane.avg_wait,
+                "p95_wait": lane.p95_wait(),
+                "expected_wait": lane.expected_wait(),
+            }
+            for name, lane in (("general", self.general), ("realtime", self.realtime))
+        }
+
+    def queue_depth(self) -> int:
+        return self.general.queue.qsize()
+
+    def expected_wait(self) -> float:
+        return self.general.expected_wait()
+
+
+_SCHEDULER = None
+_START_LOCK = threading.Lock()
+
+
+def get_scheduler() -> TaskScheduler:
+    """المُجدوِل المشترك في العملية."""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _START_LOCK:
+            if _SCHEDULER is None:
+                _SCHEDULER = TaskScheduler()
+    return _SCHEDULER
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# test_benchmark_security.py - تشغيل سريع لمجموعتي benchmark_security
+# ============================================================
+# لا يقيس شيئاً: يتأكد فقط أن startup و crypto يعملان حتى النهاية
+# (فك الجلسة والتدفق المختوم يمر بفحص التكرار في Session).
+# ============================================================
+
+import benchmark_security
+from key_store import KeyStore
+
+
+def test_startup_suite_runs():
+    results = benchmark_security.run(1)
+    assert all(len(samples) == 1 for samples in results.values())
+
+
+def test_crypto_suite_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark_security, "MIN_SECONDS", 0.01)
+    monkeypatch.setattr(benchmark_security, "PAYLOAD_SIZES", (256, 70 * 1024))
+    rows = benchmark_security.run_crypto(KeyStore(str(tmp_path)))
+    assert {row["alg"] for row in rows["sign"]} == set(benchmark_security.SIGNATURE_BACKENDS)
+    assert {row["mode"] for row in rows["cipher"]} == {"fernet", "session", "stream"}
+    assert all(row["decrypt_per_s"] > 0 for row in rows["cipher"])
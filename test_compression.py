@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# test_compression.py - تفاوض الضغط وقراراته
+# ============================================================
+
+import os
+
+import pytest
+
+import compression
+from compression import Compressor
+
+
+def test_small_and_incompressible_skipped():
+    compressor = Compressor()
+    data, encoding = compressor.compress(b"x" * 100, ["gzip"])
+    assert encoding is None and data == b"x" * 100
+    data, encoding = compressor.compress(os.urandom(64 * 1024), ["gzip"])
+    assert encoding is None
+    assert compressor.stats()["skipped"] == {"small": 1, "link": 0, "incompressible": 1}
+
+
+def test_round_trip_best_accepted_codec():
+    compressor = Compressor()
+    payload = b"distributed " * 4096
+    data, encoding = compressor.compress(payload, compression.SUPPORTED)
+    assert encoding == compression.SUPPORTED[0] and len(data) < len(payload)
+    assert compressor.decompress(data, encoding) == payload
+    assert compressor.decompress(payload, "identity") == payload
+    with pytest.raises(ValueError):
+        compressor.decompress(payload, "br")
+
+
+def test_client_compresses_only_after_peer_announces(monkeypatch):
+    compressor = Compressor()
+    monkeypatch.setattr(compressor, "worth_it", lambda codec, peer: True)
+    peer = "http://10.0.0.1:7520/run"
+    payload = b"a" * (64 * 1024)
+    data, headers = compressor.request_body(peer, payload)
+    assert data == payload and "Content-Encoding" not in headers
+    compressor.note_peer(peer, {"Accept-Encoding": "gzip;q=1, zstd;q=0"})
+    data, headers = compressor.request_body(peer, payload)
+    assert headers["Content-Encoding"] == "gzip"
+    assert compressor.decompress(data, "gzip") == payload
+
+
+def test_server_announces_and_honours_accept():
+    compressor = Compressor()
+    payload = b"b" * (64 * 1024)
+    data, headers = compressor.response_body(payload, "identity")
+    assert data == payload and headers["Accept-Encoding"] == compression.SERVER_ACCEPT_ENCODING
+    data, headers = compressor.response_body(payload, "gzip")
+    assert headers["Content-Encoding"] == "gzip" and headers["Vary"] == "Accept-Encoding"
+
+
+def test_slow_link_check_uses_bandwidth(monkeypatch):
+    compressor = Compressor()
+    peer = "10.0.0.2:7520"
+    monkeypatch.setattr(compression.MODEL, "link_estimate", lambda key: (0.001, 1e12))
+    assert not compressor.worth_it("gzip", peer)
+    monkeypatch.setattr(compression.MODEL, "link_estimate", lambda key: (0.001, 1e5))
+    assert compressor.worth_it("gzip", peer)
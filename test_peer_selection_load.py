@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# test_peer_selection_load.py - اختبار حمل لاختيار القرين في central_manager
+# ============================================================
+# محاكاة أحداث (بلا شبكة) لعملاء كثيرين يوجّهون مهام عبر المدير:
+#   • scan: السلوك القديم - أقل حمل مُعلن، والحمل لا يتحدث إلا عند التسجيل.
+#   • p2c : PeerSelector - قوة خيارين مع عدّ المهام الجارية محلياً.
+# كل عقدة عامل واحد بطابور FIFO؛ نقيس التأخير (انتظار + تنفيذ) وتفاوت
+# الطوابير بين العقد لحظة وصول كل مهمة.
+# ============================================================
+
+import heapq
+import random
+import threading
+from concurrent.futures import Future
+
+from hedging import HedgedCaller
+from peer_selection import PeerSelector
+from rpc_client import RpcClient, make_task
+
+PEERS = [f"http://10.0.0.{i}:7520/run" for i in range(16)]
+TASKS = 20000
+UTILIZATION = 0.85          # من سعة كل العقد
+SERVICE_MEAN = 1.0          # زمن تنفيذ المهمة (وحدات زمن)
+REGISTER_EVERY = 5.0        # كل كم تعيد العقد تسجيل حملها
+
+
+def scan_choice(loads):
+    """ما كان dispatch_task يفعله: مسح الكل وأخذ أقل حمل مُعلن."""
+    return min(loads, key=lambda url: loads[url] or 0.0)
+
+
+def simulate(policy: str, seed: int = 7):
+    rng = random.Random(seed)
+    selector = PeerSelector(rng=random.Random(seed + 1))
+    free_at = {peer: 0.0 for peer in PEERS}
+    queued = {peer: 0 for peer in PEERS}
+    reported = {peer: 0.0 for peer in PEERS}
+    finishing = []
+    latencies, spreads = [], []
+    now, next_register = 0.0, REGISTER_EVERY
+    rate = UTILIZATION * len(PEERS) / SERVICE_MEAN
+
+    for _ in range(TASKS):
+        now += rng.expovariate(rate)
+        while finishing and finishing[0][0] <= now:
+            _, peer = heapq.heappop(finishing)
+            queued[peer] -= 1
+            selector.release(peer)
+        if now >= next_register:
+            # الحمل المعلن: طول الطابور نسبةً لـ 4 مهام (0.0 - 1.0)
+            reported = {peer: min(queued[peer] / 4, 1.0) for peer in PEERS}
+            next_register = now + REGISTER_EVERY
+
+        peer = scan_choice(reported) if policy == "scan" else selector.choose(reported)
+        spreads.append(max(queued.values()) - min(queued.values()))
+        selector.acquire(peer)
+        queued[peer] += 1
+        start = max(now, free_at[peer])
+        free_at[peer] = start + rng.expovariate(1 / SERVICE_MEAN)
+        heapq.heappush(finishing, (free_at[peer], peer))
+        latencies.append(free_at[peer] - now)
+
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "spread": sum(spreads) / len(spreads),
+    }
+
+
+def test_p2c_flatter_and_lower_p99_than_scan():
+    scan = simulate("scan")
+    p2c = simulate("p2c")
+    print(f"\n📊 scan: p50={scan['p50']:.2f} p99={scan['p99']:.2f} تفاوت الطوابير={scan['spread']:.2f}")
+    print(f"📊 p2c : p50={p2c['p50']:.2f} p99={p2c['p99']:.2f} تفاوت الطوابير={p2c['spread']:.2f}")
+    assert p2c["p99"] < scan["p99"] / 2
+    assert p2c["spread"] < scan["spread"] / 2
+
+
+def test_in_flight_accounting_under_concurrent_clients():
+    selector = PeerSelector()
+    loads = {peer: 0.0 for peer in PEERS}
+    chosen = []
+
+    def client():
+        for _ in range(500):
+            ranked = selector.rank(loads)
+            with selector.track(ranked[0]):
+                chosen.append(ranked[0])
+
+    threads = [threading.Thread(target=client) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(chosen) == 32 * 500
+    assert all(selector.in_flight(peer) == 0 for peer in PEERS)
+    assert set(chosen) == set(PEERS)
+
+
+def test_in_flight_charged_to_peers_actually_sent():
+    selector = PeerSelector()
+    down, up = PEERS[0], PEERS[1]
+    charged = []
+
+    class Transport:
+        def submit(self, peer, payload):
+            charged.append((peer, selector.in_flight(peer)))
+            future = Future()
+            if peer == down:
+                future.set_exception(ConnectionError("down"))
+            else:
+                future.set_result({"result": 1})
+            return future
+
+    client = RpcClient(hedger=HedgedCaller(Transport()))
+    response = client.send([down, up], make_task("noop"), tracker=selector)
+
+    assert response["peer"] == up
+    assert charged == [(down, 1), (up, 1)]
+    assert selector.stats() == {"in_flight": {}}
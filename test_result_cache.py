@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# test_result_cache.py - مفاتيح ذاكرة النتائج وسلوك LRU/TTL
+# ============================================================
+#   • smart_tasks (الخادم) و your_tasks (العميل) يصلان لنفس المفتاح.
+#   • النسخة المختلفة أو الدالة غير الحتمية لا تشارك المفتاح.
+#   • LRU يطرد الأقدم، و TTL يُسقط المنتهية.
+# ============================================================
+
+import smart_tasks
+import your_tasks
+from result_cache import ResultCache, cache_key, deterministic, is_cacheable
+
+
+def test_client_and_server_share_key():
+    key = cache_key(smart_tasks.prime_calculation, (50,))
+    assert key is not None
+    assert key == cache_key(your_tasks.prime_calculation, (50,))
+    assert key != cache_key(smart_tasks.prime_calculation, (51,))
+
+
+def test_version_separates_keys():
+    def scale(x):
+        return x * 2
+    deterministic("1")(scale)
+    old = cache_key(scale, (3,))
+    deterministic("2")(scale)
+    assert cache_key(scale, (3,)) != old
+
+
+def test_non_deterministic_not_cached():
+    def noisy(x):
+        return x
+    assert not is_cacheable(noisy)
+    assert cache_key(noisy, (1,)) is None
+    assert cache_key(smart_tasks.prime_calculation, (object(),)) is None
+
+
+def test_call_stores_result():
+    calls = []
+
+    def square(x):
+        calls.append(x)
+        return x * x
+    deterministic("1")(square)
+    cache = ResultCache()
+    assert cache.call(square, 4) == 16
+    assert cache.call(square, 4) == 16
+    assert calls == [4]
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_and_ttl():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    cache.put("d", 4, ttl=-1)
+    assert cache.get("d") == (False, None)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# test_security_session.py - ختم الجلسة والتدفق المختوم
+# ============================================================
+#   • Session: الختم/الفك، رفض التكرار والوقت خارج النافذة.
+#   • open_stream: رفض التلاعب والقطع والاتجاه الخاطئ.
+#   • encrypt_stream/decrypt_stream بالسر المشترك بنفس القواعد.
+# ============================================================
+
+import os
+import time
+
+import pytest
+
+from key_store import KeyStore
+from security_layer import MAX_SKEW, SecurityManager, Session
+
+
+def _pair():
+    key = os.urandom(32)
+    return Session("k1", key, "server"), Session("k1", key, "client")
+
+
+def _now() -> str:
+    return str(time.time())
+
+
+def test_seal_open_and_replay():
+    client, server = _pair()
+    stamp = _now()
+    sealed = client.seal(b"payload", stamp)
+    assert server.open(sealed, stamp) == b"payload"
+    with pytest.raises(ValueError):
+        server.open(sealed, stamp)
+
+
+def test_open_checks_time_and_aad():
+    client, server = _pair()
+    old = str(time.time() - MAX_SKEW - 5)
+    with pytest.raises(ValueError):
+        server.open(client.seal(b"x", old), old)
+    stamp = _now()
+    with pytest.raises(ValueError):
+        server.open(client.seal(b"x", stamp), str(float(stamp) + 1))
+
+
+def _stream(session, stamp, label="request"):
+    return b"".join(session.seal_stream([b"a" * 100_000, b"b" * 10], stamp, label))
+
+
+def test_stream_round_trip_and_replay():
+    client, server = _pair()
+    stamp = _now()
+    sealed = _stream(client, stamp)
+    pieces = [sealed[i:i + 777] for i in range(0, len(sealed), 777)]
+    assert b"".join(server.open_stream(pieces, stamp)) == b"a" * 100_000 + b"b" * 10
+    with pytest.raises(ValueError):
+        b"".join(server.open_stream([sealed], stamp))
+
+
+def test_stream_rejects_tamper_truncation_and_direction():
+    client, server = _pair()
+    stamp = _now()
+    sealed = _stream(client, stamp)
+    tampered = bytearray(sealed)
+    tampered[len(sealed) // 2] ^= 1
+    for bad in (bytes(tampered), sealed[:-5], sealed + b"extra"):
+        with pytest.raises(ValueError):
+            b"".join(server.open_stream([bad], stamp))
+    with pytest.raises(ValueError):
+        b"".join(server.open_stream([sealed], stamp, "response|json"))
+
+
+def test_shared_secret_stream(tmp_path):
+    sender = SecurityManager("secret", KeyStore(str(tmp_path / "a")))
+    receiver = SecurityManager("secret", KeyStore(str(tmp_path / "b")))
+    stamp = _now()
+    sealed = b"".join(sender.encrypt_stream([b"task"], stamp))
+    assert b"".join(receiver.decrypt_stream([sealed], stamp)) == b"task"
+    with pytest.raises(ValueError):
+        b"".join(receiver.decrypt_stream([sealed], stamp))
+    reply = b"".join(receiver.encrypt_stream([b"done"], stamp, "response|json"))
+    with pytest.raises(ValueError):
+        b"".join(sender.decrypt_stream([reply], stamp))
+    assert b"".join(sender.decrypt_stream([reply], stamp, "response|json")) == b"done"
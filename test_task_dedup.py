@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# test_task_dedup.py - إزالة تكرار المهام حسب task_id
+# ============================================================
+#   • المكرر أثناء التنفيذ ينضم، وبعده يأخذ النتيجة المحفوظة.
+#   • الردود العابرة لا تُعاد: المكرر يُنفَّذ فعلاً.
+#   • انتظار المكرر لا يتجاوز موعده النهائي.
+# ============================================================
+
+import threading
+import time
+
+from task_dedup import TaskDedup
+
+
+def test_joins_running_task():
+    dedup = TaskDedup()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def execute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"result": 42}, 200
+
+    owner = threading.Thread(target=dedup.run, args=("t1", execute))
+    owner.start()
+    started.wait(5)
+    threading.Timer(0.05, release.set).start()
+    body, status = dedup.run("t1", execute)
+    owner.join()
+    assert (body["result"], body["duplicate"], status) == (42, True, 200)
+    assert calls == [1]
+    assert dedup.stats()["joined"] == 1
+
+
+def test_replays_finished_task():
+    dedup = TaskDedup()
+    dedup.run("t2", lambda: ({"result": 1}, 200))
+    body, status = dedup.run("t2", lambda: ({"result": 2}, 200))
+    assert (body["result"], status) == (1, 200)
+    assert dedup.stats()["replayed"] == 1
+
+
+def test_transient_reply_not_replayed():
+    dedup = TaskDedup()
+    assert dedup.run("t3", lambda: ({"error": "busy"}, 503))[1] == 503
+    body, status = dedup.run("t3", lambda: ({"result": 3}, 200))
+    assert (body, status) == ({"result": 3}, 200)
+
+
+def test_wait_capped_by_deadline():
+    dedup = TaskDedup()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {"result": 0}, 200
+
+    owner = threading.Thread(target=dedup.run, args=("t4", slow))
+    owner.start()
+    started.wait(5)
+    begin = time.time()
+    body, status = dedup.run("t4", slow, deadline=time.time() + 0.1)
+    release.set()
+    owner.join()
+    assert status == 504 and body["expired"]
+    assert time.time() - begin < 2
+
+
+def test_no_task_id_always_executes():
+    dedup = TaskDedup()
+    calls = []
+    for _ in range(2):
+        dedup.run(None, lambda: (calls.append(1) or {}, 200))
+    assert len(calls) == 2
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# test_wire_codec.py - الإطار الثنائي والتفاوض مع JSON
+# ============================================================
+
+import numpy as np
+import pytest
+
+import wire_codec
+from wire_codec import BINARY, JSON, CodecError
+
+
+def test_round_trip_arrays_and_bytes():
+    body = {"result": {"m": np.arange(12, dtype=np.float32).reshape(3, 4),
+                       "raw": b"\x00\x01xyz", "items": [np.int64(5), "s", None]}}
+    decoded = wire_codec.decode(wire_codec.encode(body))["result"]
+    assert decoded["m"].dtype == np.float32 and decoded["m"].shape == (3, 4)
+    np.testing.assert_array_equal(decoded["m"], body["result"]["m"])
+    assert decoded["raw"] == b"\x00\x01xyz"
+    assert decoded["items"] == [5, "s", None]
+
+
+def test_decode_is_read_only_and_aligned():
+    frame = wire_codec.encode({"a": np.ones(100, dtype=np.float64), "b": np.zeros(3, dtype=np.uint8)})
+    decoded = wire_codec.decode(frame)
+    assert not decoded["a"].flags.writeable
+    assert frame.find(np.ones(100).tobytes()) % wire_codec.ALIGN == 0
+
+
+def test_rejects_foreign_frame():
+    with pytest.raises(CodecError):
+        wire_codec.decode(b"JSON{}")
+
+
+def test_request_negotiation():
+    payload, content_type = wire_codec.encode_request({"func": "f", "args": [1], "kwargs": {}})
+    assert content_type == JSON
+    assert wire_codec.decode_request(content_type, payload)["args"] == [1]
+    payload, content_type = wire_codec.encode_request({"func": "f", "args": [np.arange(3)]})
+    assert content_type == BINARY
+    np.testing.assert_array_equal(wire_codec.decode_request(content_type, payload)["args"][0], [0, 1, 2])
+    assert wire_codec.decode_request("text/plain", b"x") is None
+
+
+def test_response_follows_accept():
+    body = {"result": np.arange(3)}
+    assert wire_codec.encode_response(body, wire_codec.ACCEPT)[1] == BINARY
+    data, content_type = wire_codec.encode_response(body, "application/json")
+    assert content_type == JSON and data == b'{"result": [0, 1, 2]}'
@@ -6,7 +6,10 @@ import time
 import logging
 from functools import wraps
 from processor_manager import should_offload
+from offload_controller import get_thresholds
 from remote_executor import execute_remotely
+from load_sampler import get_snapshot
+from cost_model import MODEL, LOCAL, ANY_PEER, timed_call
 from peer_discovery import PORT, PORT
 
 logging.basicConfig(level=logging.INFO)
@@ -16,17 +19,22 @@ def video_offload(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         complexity = estimate_video_complexity(func, args, kwargs)
+        choice = MODEL.choose(func.__name__, args, kwargs, cpu_load=get_snapshot().cpu)
         
-        if complexity > 80 or should_offload(complexity):
+        if (complexity > 80 * get_thresholds().complexity_scale or should_offload(complexity)) if choice is None else choice != LOCAL:
             logging.info(f"📹 إرسال مهمة الفيديو {func.__name__} للمعالجة الموزعة")
-            return execute_remotely(func.__name__, args, kwargs)
+            start = time.time()
+            result = execute_remotely(func.__name__, args, kwargs)
+            if not (isinstance(result, str) and result.startswith("❌")):
+                MODEL.record_remote(func.__name__, ANY_PEER, args, kwargs, time.time() - start, None, result)
+            return result
         
         logging.info(f"📹 معالجة الفيديو محلياً: {func.__name__}")
-        return func(*args, **kwargs)
+        return timed_call(func, *args, **kwargs)
     return wrapper
 
 def estimate_video_complexity(func, args, kwargs):
-    """تقدير تعقيد معالجة الفيديو"""
+    """تقدير أولي لتعقيد معالجة الفيديو - يُستخدم قبل أن يجمع cost_model قياسات للدالة"""
     if func.__name__ == "video_format_conversion":
         return args[0] * args[1] / 1000  # الطول × الجودة
     elif func.__name__ == "video_effects_processing":
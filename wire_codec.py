@@ -0,0 +1,158 @@
+# wire_codec.py
+# ============================================================
+# صيغة نقل ثنائية للمصفوفات (ndarray) بدل ‎.tolist()‎ في JSON:
+#   • الإطار: ‎DTS1‎ + طول الترويسة (4 بايت) + ترويسة JSON + مخازن خام.
+#   • الترويسة هي نفس الرد مع استبدال كل ndarray/bytes بمرجع
+#     {"__nd__": i, "dtype", "shape"} إلى مخزنها في آخر الإطار.
+#   • فك الترميز بلا نسخ: np.frombuffer فوق بايتات الرد مباشرة
+#     (المصفوفة الناتجة للقراءة فقط).
+#   • التفاوض عبر Content-Type / Accept، و JSON يبقى الافتراضي.
+# ============================================================
+
+import json
+import struct
+from typing import Any, List, Tuple
+
+import numpy as np
+
+BINARY = "application/x-dts-frame"
+JSON = "application/json"
+ACCEPT = f"{BINARY}, {JSON};q=0.5"   # ترويسة Accept للعملاء الذين يفهمون الصيغة الثنائية
+
+MAGIC = b"DTS1"
+ALIGN = 64                           # محاذاة بداية كل مخزن داخل الإطار
+_HEADER_LEN = struct.Struct("<I")
+
+
+class CodecError(ValueError):
+    """إطار ثنائي تالف أو بصيغة غير معروفة."""
+
+
+# ------------------------------------------------------------
+# JSON (الاحتياطي)
+# ------------------------------------------------------------
+def json_default(obj):
+    """لـ json.dumps(default=...): يحوّل أنواع numpy إلى أنواع JSON."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode("latin-1")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(obj) -> bytes:
+    return json.dumps(obj, default=json_default).encode()
+
+
+# ------------------------------------------------------------
+# الإطار الثنائي
+# ------------------------------------------------------------
+def _pack(obj, buffers: List):
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        array = np.ascontiguousarray(obj)
+        buffers.append(memoryview(array.reshape(-1).view(np.uint8)))
+        return {"__nd__": len(buffers) - 1, "dtype": array.dtype.str, "shape": list(array.shape)}
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        buffers.append(memoryview(obj).cast("B"))
+        return {"__bytes__": len(buffers) - 1}
+    if isinstance(obj, dict):
+        return {k: _pack(v, buffers) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_pack(v, buffers) for v in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def encode(obj) -> bytes:
+    """يرمّز الكائن في إطار واحد (نسخة واحدة للمخازن داخل الإطار)."""
+    buffers: List[memoryview] = []
+    header = _pack(obj, buffers)
+    spans, offset = [], 0
+    for buf in buffers:
+        offset += -offset % ALIGN
+        spans.append([offset, buf.nbytes])
+        offset += buf.nbytes
+    head = json.dumps({"body": header, "buffers": spans}, default=json_default).encode()
+    prefix = MAGIC + _HEADER_LEN.pack(len(head)) + head
+    base = len(prefix) + (-len(prefix) % ALIGN)
+    parts = [prefix, b"\0" * (base - len(prefix))]
+    position = 0
+    for (start, _), buf in zip(spans, buffers):
+        parts.append(b"\0" * (start - position))
+        parts.append(buf)
+        position = start + buf.nbytes
+    return b"".join(parts)
+
+
+def _unpack(obj, data: memoryview, spans):
+    if isinstance(obj, dict):
+        if "__nd__" in obj:
+            start, length = spans[obj["__nd__"]]
+            array = np.frombuffer(data[start:start + length], dtype=np.dtype(obj["dtype"]))
+            return array.reshape(obj["shape"])
+        if "__bytes__" in obj:
+            start, length = spans[obj["__bytes__"]]
+            return data[start:start + length].tobytes()
+        return {k: _unpack(v, data, spans) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_unpack(v, data, spans) for v in obj]
+    return obj
+
+
+def decode(payload) -> Any:
+    """يفك الإطار؛ المصفوفات views فوق payload بدون نسخ."""
+    view = memoryview(payload)
+    if view[:4].tobytes() != MAGIC:
+        raise CodecError("ليس إطار DTS ثنائياً")
+    (head_len,) = _HEADER_LEN.unpack_from(view, 4)
+    head_end = 8 + head_len
+    head = json.loads(view[8:head_end].tobytes())
+    base = head_end + (-head_end % ALIGN)
+    return _unpack(head["body"], view[base:], head["buffers"])
+
+
+# ------------------------------------------------------------
+# التفاوض
+# ------------------------------------------------------------
+def has_arrays(args=(), kwargs=None) -> bool:
+    """هل في الوسائط (المستوى الأول) ما يستحق الإرسال ثنائياً؟"""
+    values = list(args) + list((kwargs or {}).values())
+    return any(isinstance(v, (np.ndarray, bytes, bytearray)) for v in values)
+
+
+def encode_request(payload) -> Tuple[bytes, str]:
+    """جسم الطلب: ثنائي فقط إن احتوت الوسائط مصفوفات، وإلا JSON ليفهمه أي قرين."""
+    if has_arrays(payload.get("args", ()), payload.get("kwargs")):
+        return encode(payload), BINARY
+    return dumps_json(payload), JSON
+
+
+def accepts_binary(accept_header: str) -> bool:
+    return BINARY in (accept_header or "")
+
+
+def encode_response(body, accept_header: str) -> Tuple[bytes, str]:
+    """(البايتات، نوع المحتوى) حسب ما يقبله العميل؛ JSON هو الافتراضي."""
+    if accepts_binary(accept_header):
+        return encode(body), BINARY
+    return dumps_json(body), JSON
+
+
+def decode_request(content_type: str, payload: bytes):
+    """جسم الطلب حسب Content-Type؛ None إن لم يكن ثنائياً ولا JSON."""
+    content_type = (content_type or "").split(";")[0].strip()
+    if content_type == BINARY:
+        return decode(payload)
+    if content_type == JSON:
+        return json.loads(payload)
+    return None
+
+
+def read_response(response):
+    """جسم رد requests سواء كان ثنائياً أو JSON."""
+    if response.headers.get("Content-Type", "").startswith(BINARY):
+        return decode(response.content)
+    return response.json()
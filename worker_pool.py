@@ -0,0 +1,262 @@
+# worker_pool.py
+# ============================================================
+# تنفيذ المهام الثقيلة على المعالج في عمليات منفصلة:
+#   • ProcessPoolExecutor بعدد الأنوية، مُسخَّن مسبقاً: كل عامل
+#     يستورد numpy و smart_tasks عند بدئه لا عند أول مهمة.
+#   • خيوط Flask لا تنفّذ الدالة بنفسها، بل تنتظر Future (بدون GIL)،
+#     فتتوزع المهام على كل الأنوية بدل مهمة Python واحدة في كل لحظة.
+#   • حد للمهام المتزامنة: ما زاد عنه يُرفض فوراً (503) ليذهب لقرين آخر
+#     بدل التكدّس.
+#   • موعد نهائي وإلغاء: المهمة تُقطع داخل العامل عند موعدها (SIGALRM)
+#     أو عند cancel(task_id) (SIGUSR1 + علم مشترك لكل خانة)، فيبقى العامل
+#     حياً ويتحرر لمهمة أخرى بدل إكمال عمل تخلّى عنه صاحبه.
+# ============================================================
+
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Optional, Tuple
+
+PRELOAD = ("numpy", "smart_tasks")
+IN_FLIGHT_PER_WORKER = 2       # مهام متزامنة لكل عامل (واحدة تُنفَّذ وواحدة تنتظر)
+ADMIT_TIMEOUT = 0.05           # ثواني انتظار مكان قبل رفض المهمة
+RECENT_CANCELS = 1024          # إلغاءات وصلت قبل مهامها (تُرفض عند وصولها)
+
+# المقاطعة بالإشارات متاحة على أنظمة POSIX فقط؛ غيرها: فحص عند البدء فقط
+_CAN_INTERRUPT = hasattr(signal, "setitimer") and hasattr(signal, "SIGUSR1")
+
+
+class Overloaded(Exception):
+    """العقدة وصلت حد المهام المتزامنة."""
+
+
+class DeadlineExceeded(Exception):
+    """انتهى الموعد النهائي للمهمة قبل اكتمالها."""
+
+
+class Cancelled(Exception):
+    """ألغى المرسل المهمة."""
+
+
+# ------------------------------------------------------------
+# داخل العامل
+# ------------------------------------------------------------
+_FLAGS = None       # علم إلغاء لكل خانة (مشترك مع العملية الأم)
+_PIDS = None        # رقم العامل الذي يشغّل كل خانة
+_SLOT = None        # خانة المهمة الجارية في هذا العامل
+_DEADLINE = None
+
+
+def _on_alarm(signum, frame):
+    if _SLOT is not None:
+        raise DeadlineExceeded("انتهى الموعد النهائي أثناء التنفيذ")
+
+
+def _on_cancel(signum, frame):
+    # إشارة متأخرة من مهمة سابقة لا تقطع المهمة الحالية: العلم لكل خانة
+    if _SLOT is not None and _FLAGS[_SLOT]:
+        raise Cancelled("ألغى المرسل المهمة")
+
+
+def _warm(modules: Iterable[str], flags=None, pids=None):
+    global _FLAGS, _PIDS
+    _FLAGS, _PIDS = flags, pids
+    if _CAN_INTERRUPT:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.signal(signal.SIGUSR1, _on_cancel)
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logging.warning(f"⚠️ تعذّر تحميل {name} مسبقاً في العامل: {e}")
+
+
+def _ping():
+    return os.getpid()
+
+
+def check_deadline():
+    """للمهام الطويلة داخل العامل: فحص تعاوني بين الخطوات."""
+    if _SLOT is not None and _FLAGS[_SLOT]:
+        raise Cancelled("ألغى المرسل المهمة")
+    if _DEADLINE is not None and time.time() >= _DEADLINE:
+        raise DeadlineExceeded("انتهى الموعد النهائي أثناء التنفيذ")
+
+
+def _call(module: str, func_name: str, args, kwargs,
+          slot: Optional[int] = None, deadline: Optional[float] = None) -> Tuple[object, float]:
+    """يُنفَّذ داخل العامل: (النتيجة، زمن التنفيذ الصافي)."""
+    global _SLOT, _DEADLINE
+    fn = getattr(importlib.import_module(module), func_name)
+    if slot is not None:
+        _PIDS[slot] = os.getpid()
+    _SLOT, _DEADLINE = slot, deadline
+    try:
+        check_deadline()   # انتظرت في طابور المجمّع: ربما انتهى وقتها أو أُلغيت
+        if deadline is not None and _CAN_INTERRUPT:
+            signal.setitimer(signal.ITIMER_REAL, max(deadline - time.time(), 0.001))
+        start = time.time()
+        result = fn(*args, **kwargs)
+        return result, time.time() - start
+    finally:
+        if _CAN_INTERRUPT:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        _SLOT = _DEADLINE = None
+        if slot is not None:
+            _PIDS[slot] = 0
+
+
+class WorkerPool:
+    """مجمّع عمليات مسخَّن مع حد للمهام المتزامنة."""
+
+    def __init__(self, workers: Optional[int] = None, preload: Iterable[str] = PRELOAD,
+                 max_in_flight: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.preload = tuple(preload)
+        self.max_in_flight = max_in_flight or self.workers * IN_FLIGHT_PER_WORKER
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        ctx = multiprocessing.get_context("spawn")
+        # خانة لكل مهمة متزامنة (عددها = حد السيمافور)
+        self._flags = ctx.RawArray("b", self.max_in_flight)
+        self._pids = ctx.RawArray("q", self.max_in_flight)
+        self._free = list(range(self.max_in_flight))
+        self._tasks: Dict[str, Tuple[int, object]] = {}     # task_id → (الخانة، Future)
+        self._early_cancels = deque(maxlen=RECENT_CANCELS)
+        self._executor = self._new_executor()
+        self.in_flight = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: آمن مع الخيوط الموجودة في الخادم ويعمل على كل الأنظمة
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm,
+            initargs=(self.preload, self._flags, self._pids),
+        )
+
+    def warm(self):
+        """تشغيل كل العمال الآن (قبل أول طلب)."""
+        pids = {f.result() for f in [self._executor.submit(_ping) for _ in range(self.workers)]}
+        logging.info(f"🔥 {len(pids)} عامل جاهز (من {self.workers})")
+        return self
+
+    def run(self, module: str, func_name: str, args=(), kwargs=None,
+            task_id: Optional[str] = None, deadline: Optional[float] = None) -> Tuple[object, float]:
+        """ينفّذ module.func_name في عامل ويُرجع (النتيجة، الزمن).
+        يرفع Overloaded عند الامتلاء، DeadlineExceeded بعد deadline (زمن مطلق)،
+        و Cancelled إن أُلغيت task_id."""
+        if deadline is not None and time.time() >= deadline:
+            self._note("expired")
+            raise DeadlineExceeded("انتهى الموعد النهائي قبل بدء التنفيذ")
+        if not self._slots.acquire(timeout=ADMIT_TIMEOUT):
+            self._note("rejected")
+            raise Overloaded(f"الحد الأقصى للمهام المتزامنة ({self.max_in_flight})")
+        with self._lock:
+            self.in_flight += 1
+            slot = self._free.pop()
+            self._flags[slot] = 0
+            self._pids[slot] = 0
+            early = task_id is not None and task_id in self._early_cancels
+        try:
+            if early:
+                raise Cancelled("أُلغيت المهمة قبل وصولها")
+            with self._lock:
+                future = self._executor.submit(_call, module, func_name, list(args), kwargs or {},
+                                               slot, deadline)
+                if task_id is not None:
+                    self._tasks[task_id] = (slot, future)
+            try:
+                return future.result()
+            except CancelledError:
+                # أُلغيت وهي في طابور المجمّع قبل أن يلتقطها عامل
+                raise Cancelled("ألغى المرسل المهمة") from None
+        except BrokenProcessPool:
+            # عامل مات (نفاد ذاكرة مثلاً): نبني مجمّعاً جديداً للطلبات التالية
+            logging.error("❌ انهار مجمّع العمليات - إعادة إنشائه")
+            with self._lock:
+                self._executor = self._new_executor()
+            raise
+        except DeadlineExceeded:
+            self._note("expired")
+            raise
+        except Cancelled:
+            self._note("cancelled")
+            raise
+        finally:
+            with self._lock:
+                if task_id is not None:
+                    self._tasks.pop(task_id, None)
+                self._free.append(slot)
+                self.in_flight -= 1
+            self._slots.release()
+
+    def cancel(self, task_id: str) -> bool:
+        """يلغي المهمة: من طابور المجمّع إن لم تبدأ، أو يقطعها داخل عاملها.
+        إلغاء مهمة لم تصل بعد يُحفظ لتُرفض عند وصولها. يُرجع True إن كانت جارية."""
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                self._early_cancels.append(task_id)
+                return False
+            slot, future = entry
+            self._flags[slot] = 1
+            pid = self._pids[slot]
+        if future.cancel():
+            return True
+        if pid and _CAN_INTERRUPT:
+            try:
+                os.kill(pid, signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+        return True
+
+    def _note(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+        }
+
+    def shutdown(self):
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            return
+        # cancel_futures غير موجود قبل 3.9: نلغي المهام المنتظرة بأنفسنا
+        with self._lock:
+            futures = [future for _, future in self._tasks.values()]
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+
+_POOL = None
+_START_LOCK = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    """مجمّع العمليات المشترك للخادم."""
+    global _POOL
+    if _POOL is None:
+        with _START_LOCK:
+            if _POOL is None:
+                _POOL = WorkerPool()
+    return _POOL
@@ -2,8 +2,11 @@ import math
 import numpy as np
 from offload_lib import offload
 from peer_discovery import PORT, PORT
+from result_cache import deterministic
 
 # الدوال الأساسية (محليّة)
+# نفس تطبيق smart_tasks ونفس النسخة: نتائجها تُتشارك مع ذاكرة الأقران
+@deterministic("1")
 def prime_calculation(n: int):
     """ترجع قائمة الأعداد الأوليّة حتى n مع عددها"""
     primes = [num for num in range(2, n + 1)
@@ -14,7 +17,7 @@ def matrix_multiply(size: int):
     """ضرب مصفوفات عشوائيّة (size × size)"""
     A = np.random.rand(size, size)
     B = np.random.rand(size, size)
-    return {"result": (A @ B).tolist()}
+    return {"result": A @ B}
 
 def data_processing(data_size: int):
     """تنفيذ معالجة بيانات بسيطة كتجربة"""
@@ -27,8 +30,9 @@ def distributed_matrix_multiply(size):
     """ضرب المصفوفات (قابل للتوزيع)"""
     A = np.random.rand(size, size)
     B = np.random.rand(size, size)
-    return {"result": (A @ B).tolist()}
+    return {"result": A @ B}
 
+@deterministic("1")
 @offload
 def distributed_prime_calculation(n):
     """حساب الأعداد الأولية (قابل للتوزيع)"""
@@ -42,6 +46,7 @@ def distributed_data_processing(size):
     data = np.random.rand(size)
     return {"mean": float(np.mean(data)), "std_dev": float(np.std(data))}
 
+@deterministic("1")
 @offload
 def complex_operation(x):
     """مهمة معقدة قابلة للتوزيع"""